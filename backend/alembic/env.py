@@ -18,6 +18,7 @@ from models.post import Post
 from models.like import Like
 from models.bookmark import Bookmark
 from models.url_bookmark import UrlBookmark
+from models.s3_object import S3Object
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
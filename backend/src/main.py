@@ -1,17 +1,43 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.datastructures import UploadFile as StarletteUploadFile
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from pydantic import BaseModel
-from typing import Dict, Any, List
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
+from botocore.exceptions import ClientError
+import asyncio
+import json
 import os
+import re
+from urllib.parse import quote
 
 from .utils.logging_manager import LoggingManager
 from .utils.auth import create_access_token, verify_token, authenticate_user
-from .utils.s3_manager import S3Manager, upload_data_file, list_data_files, download_data_file
+from .utils.s3_manager import S3Manager, S3ClientRegistry, build_data_key, PREVIEW_MAX_BYTES
+from .utils.s3_multipart import upload_stream, DEFAULT_PART_SIZE, DEFAULT_CONCURRENCY, MIN_PART_SIZE
+from .utils.s3_dedup import upload_stream_dedup, build_content_key
+from .utils.s3_codec import (
+    available_codecs, codec_metadata, compress_stream, decompress_stream, object_codec, uncompressed_size
+)
+from .utils.async_s3_manager import (
+    AsyncS3Manager, get_async_s3_manager, iter_object_body, run_in_s3_executor, shutdown_s3_executor,
+    listing_cache, s3_flight
+)
+from .utils.s3_manifest import (
+    MANIFEST_ENABLED, RECONCILE_INTERVAL, manifest_ready, run_reconciler, record_upload, forget_objects, refresh_prefix
+)
+from .utils.s3_health import PROBE_INTERVAL, S3HealthProber, default_canary_key
+from .utils.s3_resilience import S3UnavailableError, S3OperationTimeout
+from .utils.s3_pipeline import (
+    DEFAULT_CHUNK_SIZE as PIPELINE_CHUNK_SIZE, DEFAULT_WORKERS as PIPELINE_WORKERS, STAGES as PIPELINE_STAGES,
+    start_job, get_job, list_jobs, cancel_jobs, shutdown_process_pool
+)
 from .utils.database import get_db_session, init_db, close_db, test_connection
-from .repositories.message_repository import MessageRepository
+from .repositories.message_repository import MessageRepository, message_cache, message_flight
 from .repositories.user_repository import UserRepository
+from .repositories.s3_object_repository import S3ObjectRepository, SORT_COLUMNS
 from .models.message import Message as MessageModel
 from .models.user import User as UserModel
 
@@ -30,6 +56,9 @@ LoggingManager.add_file_handler(
 
 logger = LoggingManager.get_logger("main")
 
+# Single byte range as supported by S3 GetObject: "bytes=start-end", "bytes=start-" or "bytes=-suffix"
+RANGE_HEADER_RE = re.compile(r"^bytes=(\d+-\d*|-\d+)$")
+
 # Configure OAuth2 scheme for Swagger
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -47,6 +76,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(S3UnavailableError)
+async def s3_unavailable_handler(request: Request, exc: S3UnavailableError):
+    """Answer fast with 503 (circuit open) or 504 (deadline passed) instead of a generic 500"""
+    logger.warning(f"S3 unavailable for {request.method} {request.url.path}: {exc}")
+    status_code = 504 if isinstance(exc, S3OperationTimeout) else 503
+    headers = {"Retry-After": str(max(int(exc.retry_after), 1))} if status_code == 503 else None
+    return JSONResponse(status_code=status_code, content={"detail": str(exc)}, headers=headers)
+
+
 # Pydantic models
 class MessageRequest(BaseModel):
     message: str
@@ -61,6 +100,32 @@ class MessageResponse(BaseModel):
     processed: bool = True
 
 
+class MessageUpdateRequest(BaseModel):
+    message: Optional[str] = None
+    user_id: Optional[str] = None
+    processed: Optional[bool] = None
+
+
+class MessageBatchRequest(BaseModel):
+    messages: List[MessageRequest] = Field(..., min_length=1, max_length=50000)
+
+
+class MessageBatchItem(BaseModel):
+    id: int
+    timestamp: datetime
+
+
+class MessageBatchResponse(BaseModel):
+    count: int
+    messages: List[MessageBatchItem]
+
+
+class MessageListResponse(BaseModel):
+    count: int
+    messages: List[MessageResponse]
+    next_cursor: Optional[str] = None
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -77,6 +142,87 @@ class S3UploadResponse(BaseModel):
     success: bool
     s3_key: str
     message: str
+    deduplicated: bool = False
+
+
+class S3BulkDeleteRequest(BaseModel):
+    keys: Optional[List[str]] = Field(None, min_length=1, max_length=100000)
+    prefix: Optional[str] = Field(None, min_length=1)
+
+
+class S3DeleteError(BaseModel):
+    key: str
+    code: str
+    message: str
+
+
+class S3BulkDeleteResponse(BaseModel):
+    deleted: int
+    errors: List[S3DeleteError]
+
+
+class S3CopyPrefixRequest(BaseModel):
+    source_prefix: str
+    dest_prefix: str
+    move: bool = False
+
+
+class S3SelectRequest(BaseModel):
+    s3_key: str
+    expression: str = Field(..., min_length=1, max_length=256 * 1024)
+    input_format: str = Field("csv", pattern="^(csv|json)$")
+    csv_header: bool = True
+    json_lines: bool = True
+
+
+class PipelineStageSpec(BaseModel):
+    name: str
+    options: Dict[str, Any] = Field(default_factory=dict)
+
+
+class PipelineJobRequest(BaseModel):
+    input_key: str
+    output_key: Optional[str] = None
+    stages: List[PipelineStageSpec] = Field(..., min_length=1)
+    chunk_size: int = Field(PIPELINE_CHUNK_SIZE, ge=64 * 1024, le=256 * 1024 * 1024)
+    workers: int = Field(PIPELINE_WORKERS, ge=1, le=64)
+
+
+class PresignUploadRequest(BaseModel):
+    filename: str
+    data_type: str = "input"
+    content_type: Optional[str] = None
+    size: Optional[int] = Field(None, ge=0)
+    method: str = Field("put", pattern="^(put|post)$")
+    expires_in: int = Field(3600, ge=60, le=7 * 24 * 3600)
+
+
+class PresignUploadResponse(BaseModel):
+    s3_key: str
+    method: str
+    url: Optional[str] = None
+    fields: Optional[Dict[str, str]] = None
+    upload_id: Optional[str] = None
+    part_size: Optional[int] = None
+    part_urls: Optional[List[str]] = None
+    expires_in: int
+
+
+class UploadedPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str
+
+
+class PresignCompleteRequest(BaseModel):
+    s3_key: str
+    upload_id: Optional[str] = None
+    parts: Optional[List[UploadedPart]] = None
+
+
+# Largest object accepted through a presigned POST policy
+PRESIGNED_POST_MAX_SIZE = 5 * 1024 ** 3
+# S3 limit on the number of parts in one multipart upload
+MAX_UPLOAD_PARTS = 10000
 
 
 # Database dependency
@@ -88,11 +234,25 @@ async def get_user_repository():
     async with get_db_session() as session:
         yield UserRepository(session)
 
+async def get_s3_object_repository():
+    # Without the manifest there is nothing to read, so don't hold a database session
+    if not MANIFEST_ENABLED:
+        yield None
+        return
+    async with get_db_session() as session:
+        yield S3ObjectRepository(session, get_async_s3_manager().bucket_name)
+
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     logger.info("Starting up application...")
+    if PROBE_INTERVAL > 0:
+        try:
+            app.state.s3_prober = S3HealthProber(get_async_s3_manager().sync, canary_key=default_canary_key())
+            app.state.s3_prober_task = asyncio.create_task(app.state.s3_prober.run())
+        except Exception as e:
+            logger.error(f"Could not start S3 health prober: {e}")
     try:
         # Test database connection
         if await test_connection():
@@ -100,6 +260,10 @@ async def startup_event():
             # Initialize database tables
             await init_db()
             logger.info("Database initialized successfully")
+            if MANIFEST_ENABLED and RECONCILE_INTERVAL > 0:
+                app.state.manifest_reconciler = asyncio.create_task(
+                    run_reconciler(get_async_s3_manager(), RECONCILE_INTERVAL)
+                )
         else:
             logger.error("Database connection failed")
     except Exception as e:
@@ -110,7 +274,17 @@ async def startup_event():
 async def shutdown_event():
     """Clean up on shutdown"""
     logger.info("Shutting down application...")
+    reconciler = getattr(app.state, "manifest_reconciler", None)
+    if reconciler is not None:
+        reconciler.cancel()
+    prober_task = getattr(app.state, "s3_prober_task", None)
+    if prober_task is not None:
+        prober_task.cancel()
+        await run_in_s3_executor(app.state.s3_prober.remove_canary)
+    cancel_jobs()
     await close_db()
+    shutdown_process_pool()
+    shutdown_s3_executor()
 
 
 @app.get("/")
@@ -120,7 +294,7 @@ async def root():
     return {
         "message": "Simple Backend API",
         "version": "0.1.0",
-        "endpoints": ["/", "/health", "/messages", "/messages/{message_id}", "/s3/files", "/s3/upload"],
+        "endpoints": ["/", "/health", "/cache/stats", "/messages", "/messages/batch", "/messages/{message_id}", "/s3/files", "/s3/upload"],
     }
 
 
@@ -129,11 +303,24 @@ async def health_check():
     """Health check endpoint"""
     logger.info("Health check accessed")
     db_status = "healthy" if await test_connection() else "unhealthy"
+    prober = getattr(app.state, "s3_prober", None)
     return {
         "status": "healthy", 
         "timestamp": datetime.now(), 
         "uptime": "OK",
-        "database": db_status
+        "database": db_status,
+        # Last background probe result; never calls S3 itself
+        "s3": prober.snapshot()["status"] if prober is not None else "unknown"
+    }
+
+
+@app.get("/cache/stats")
+async def cache_stats(token_data: dict = Depends(verify_token)):
+    """In-process cache and request coalescing counters (requires authentication)"""
+    return {
+        "messages": message_cache.stats(),
+        "s3_listings": listing_cache.stats(),
+        "single_flight": {"messages": message_flight.stats(), "s3": s3_flight.stats()},
     }
 
 
@@ -184,6 +371,7 @@ async def create_message(
         user_id=request.user_id,
         processed=True
     )
+    await message_repo.commit()
 
     logger.info(f"Message created with ID: {message.id}")
 
@@ -196,6 +384,28 @@ async def create_message(
     )
 
 
+@app.post("/messages/batch", response_model=MessageBatchResponse)
+async def create_messages_batch(
+    request: MessageBatchRequest,
+    token_data: dict = Depends(verify_token),
+    message_repo: MessageRepository = Depends(get_message_repository)
+):
+    """Create many messages in a single database round trip (requires authentication)"""
+    logger.info(f"Creating {len(request.messages)} messages in batch (authenticated as: {token_data['sub']})")
+
+    created = await message_repo.create_many(
+        [{"message": item.message, "user_id": item.user_id, "processed": True} for item in request.messages]
+    )
+    await message_repo.commit()
+
+    logger.info(f"Batch created {len(created)} messages")
+
+    return MessageBatchResponse(
+        count=len(created),
+        messages=[MessageBatchItem(id=message_id, timestamp=timestamp) for message_id, timestamp in created]
+    )
+
+
 @app.get("/messages/{message_id}")
 async def get_message(
     message_id: int, 
@@ -221,16 +431,27 @@ async def get_message(
 
 @app.get("/messages")
 async def list_messages(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False,
     token_data: dict = Depends(verify_token),
     message_repo: MessageRepository = Depends(get_message_repository)
 ):
-    """List all messages (requires authentication)"""
-    logger.info(f"Listing all messages (user: {token_data['sub']})")
-    
-    messages = await message_repo.get_all()
-    return {
-        "count": len(messages), 
-        "messages": [
+    """List messages newest first, one keyset page at a time or as an NDJSON stream (requires authentication)"""
+    if stream:
+        logger.info(f"Streaming all messages (user: {token_data['sub']})")
+        return StreamingResponse(_stream_messages_ndjson(), media_type="application/x-ndjson")
+
+    logger.info(f"Listing messages (limit: {limit}, user: {token_data['sub']})")
+
+    try:
+        messages, next_cursor = await message_repo.list_page(limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return MessageListResponse(
+        count=len(messages),
+        messages=[
             MessageResponse(
                 id=msg.id,
                 message=msg.message,
@@ -238,8 +459,51 @@ async def list_messages(
                 timestamp=msg.timestamp,
                 processed=msg.processed
             ) for msg in messages
-        ]
-    }
+        ],
+        next_cursor=next_cursor
+    )
+
+
+async def _stream_messages_ndjson():
+    """Yield every message as one JSON line, reading from a server-side cursor"""
+    # The request-scoped session may be closed before the body is sent,
+    # so the stream owns its own session for its whole lifetime
+    async with get_db_session() as session:
+        async for row in MessageRepository(session).stream_all():
+            yield MessageResponse(
+                id=row.id,
+                message=row.message,
+                user_id=row.user_id,
+                timestamp=row.timestamp,
+                processed=row.processed
+            ).model_dump_json() + "\n"
+
+
+@app.patch("/messages/{message_id}", response_model=MessageResponse)
+async def update_message(
+    message_id: int,
+    request: MessageUpdateRequest,
+    token_data: dict = Depends(verify_token),
+    message_repo: MessageRepository = Depends(get_message_repository)
+):
+    """Partially update a message (requires authentication)"""
+    logger.info(f"Updating message with ID: {message_id} (user: {token_data['sub']})")
+
+    message = await message_repo.update(message_id, **request.model_dump(exclude_none=True))
+    if not message:
+        logger.warning(f"Message not found for update: {message_id}")
+        raise HTTPException(status_code=404, detail="Message not found")
+    await message_repo.commit()
+
+    logger.info(f"Message updated: {message_id}")
+
+    return MessageResponse(
+        id=message.id,
+        message=message.message,
+        user_id=message.user_id,
+        timestamp=message.timestamp,
+        processed=message.processed
+    )
 
 
 @app.delete("/messages/{message_id}")
@@ -255,6 +519,7 @@ async def delete_message(
     if not success:
         logger.warning(f"Message not found for deletion: {message_id}")
         raise HTTPException(status_code=404, detail="Message not found")
+    await message_repo.commit()
 
     logger.info(f"Message deleted: {message_id}")
     return {"message": "Message deleted successfully"}
@@ -262,12 +527,79 @@ async def delete_message(
 
 # S3 endpoints
 @app.get("/s3/files", response_model=List[S3FileInfo])
-async def list_s3_files(data_type: str = "input", token_data: dict = Depends(verify_token)):
-    """List files in S3 bucket (requires authentication)"""
-    logger.info(f"Listing S3 files for type: {data_type} (user: {token_data['sub']})")
-    
+async def list_s3_files(
+    response: Response,
+    data_type: str = "input",
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = Query("key", pattern=f"^({'|'.join(SORT_COLUMNS)})$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    modified_after: Optional[datetime] = None,
+    modified_before: Optional[datetime] = None,
+    min_size: Optional[int] = Query(None, ge=0),
+    max_size: Optional[int] = Query(None, ge=0),
+    token_data: dict = Depends(verify_token),
+    manifest: Optional[S3ObjectRepository] = Depends(get_s3_object_repository)
+):
+    """
+    List one page of files in S3 bucket (requires authentication)
+
+    With S3_MANIFEST_ENABLED, files are served from the s3_objects manifest
+    table, so filtering by modification time and size and sorting run as
+    indexed SQL instead of a bucket listing. Until the manifest has been
+    reconciled, or if the database fails, plain key-ordered pages fall back
+    to the cached bucket listing. When more files exist, the cursor for the
+    next page is returned in the X-Next-Cursor response header.
+    """
+    logger.info(f"Listing S3 files for type: {data_type} (limit: {limit}, user: {token_data['sub']})")
+
+    plain = sort == "key" and order == "asc" and all(
+        value is None for value in (modified_after, modified_before, min_size, max_size)
+    )
+
+    if manifest is not None and manifest_ready(manifest.bucket):
+        try:
+            objects, next_cursor = await manifest.list_page(
+                data_type=data_type,
+                limit=limit,
+                cursor=cursor,
+                sort=sort,
+                descending=order == "desc",
+                modified_after=modified_after,
+                modified_before=modified_before,
+                min_size=min_size,
+                max_size=max_size
+            )
+        except ValueError:
+            # A plain page may carry a continuation token issued by the listing fallback
+            if not plain:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        except Exception as e:
+            # Clear the failed transaction so the dependency's commit on exit doesn't raise again
+            await manifest.session.rollback()
+            if not plain:
+                logger.error(f"Error reading S3 manifest: {e}")
+                raise HTTPException(status_code=503, detail="S3 manifest is unavailable")
+            logger.warning(f"S3 manifest unavailable, listing bucket instead: {e}")
+        else:
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
+            return [
+                S3FileInfo(key=obj.key, size=obj.size, last_modified=obj.last_modified, etag=obj.etag)
+                for obj in objects
+            ]
+
+    if not plain:
+        if MANIFEST_ENABLED:
+            raise HTTPException(status_code=503, detail="S3 manifest is not ready yet")
+        raise HTTPException(status_code=400, detail="Filtering and sorting require the S3 manifest")
+
     try:
-        files = list_data_files(data_type)
+        files, next_cursor = await get_async_s3_manager().list_page_cached(
+            f"data/{data_type}/", cursor=cursor, limit=limit
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return [
             S3FileInfo(
                 key=file_info["Key"],
@@ -277,6 +609,8 @@ async def list_s3_files(data_type: str = "input", token_data: dict = Depends(ver
             )
             for file_info in files
         ]
+    except S3UnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error listing S3 files: {e}")
         raise HTTPException(status_code=500, detail="Error listing S3 files")
@@ -284,38 +618,264 @@ async def list_s3_files(data_type: str = "input", token_data: dict = Depends(ver
 
 @app.post("/s3/upload", response_model=S3UploadResponse)
 async def upload_file_to_s3(
-    file: UploadFile = File(...),
+    request: Request,
+    filename: Optional[str] = None,
     data_type: str = "input",
+    part_size: int = Query(DEFAULT_PART_SIZE, ge=MIN_PART_SIZE, le=5 * 1024 ** 3),
+    concurrency: int = Query(DEFAULT_CONCURRENCY, ge=1, le=32),
+    dedup: bool = False,
+    sha256: Optional[str] = Query(None, pattern="^[0-9a-f]{64}$"),
+    codec: Optional[str] = Query(None, pattern="^(gzip|zstd)$"),
     token_data: dict = Depends(verify_token)
 ):
-    """Upload file to S3 (requires authentication)"""
-    logger.info(f"Uploading file to S3: {file.filename} (user: {token_data['sub']})")
-    
+    """
+    Upload file to S3 (requires authentication)
+
+    Send the file as the raw request body with ?filename=... to have it
+    streamed into an S3 multipart upload as it arrives. Legacy
+    multipart/form-data uploads (field "file") are still accepted but are
+    spooled by the form parser first.
+
+    With dedup=true the file is stored under a content-addressed key
+    (data/{type}/sha256/{digest}) and nothing new is kept if that content
+    already exists. Passing the file's sha256 lets the server answer from
+    a HEAD request without reading the body at all.
+
+    With codec=gzip|zstd the file is compressed while it streams and the
+    codec is recorded in the object metadata; downloads decompress it
+    transparently.
+    """
+    if codec and dedup:
+        raise HTTPException(status_code=400, detail="codec cannot be combined with dedup")
+    if codec and codec not in available_codecs():
+        raise HTTPException(status_code=400, detail=f"Codec not available: {codec}")
+
+    s3 = get_async_s3_manager()
+    if dedup and sha256:
+        if await s3.head_object(build_content_key(sha256, data_type)) is not None:
+            logger.info(f"Upload skipped, content already stored: {sha256} (user: {token_data['sub']})")
+            return S3UploadResponse(
+                success=True,
+                s3_key=build_content_key(sha256, data_type),
+                message="File already stored",
+                deduplicated=True
+            )
+
+    content_type = request.headers.get("content-type", "application/octet-stream")
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if not isinstance(upload, StarletteUploadFile):
+            raise HTTPException(status_code=400, detail="Missing form field 'file'")
+        filename = filename or upload.filename
+        content_type = upload.content_type or "application/octet-stream"
+        chunks = _iter_upload_file(upload, part_size)
+    else:
+        chunks = request.stream()
+
+    if not filename:
+        raise HTTPException(status_code=400, detail="filename is required")
+    if codec:
+        chunks = compress_stream(chunks, codec)
+
+    logger.info(f"Uploading file to S3: {filename} (user: {token_data['sub']})")
+
     try:
-        s3_key = await upload_data_file(file, data_type)
-        logger.info(f"File uploaded successfully: {s3_key}")
+        if dedup:
+            result = await upload_stream_dedup(
+                s3.sync,
+                chunks,
+                filename,
+                data_type,
+                content_type=content_type,
+                expected_sha256=sha256,
+                part_size=part_size,
+                concurrency=concurrency
+            )
+            s3_key = result["key"]
+        else:
+            s3_key = build_data_key(filename, data_type)
+            result = await upload_stream(
+                s3.sync,
+                chunks,
+                s3_key,
+                content_type=content_type,
+                part_size=part_size,
+                concurrency=concurrency,
+                metadata=codec_metadata(codec) if codec else None
+            )
+        if result.get("deduplicated"):
+            logger.info(f"Upload discarded, content already stored: {s3_key}")
+            return S3UploadResponse(success=True, s3_key=s3_key, message="File already stored", deduplicated=True)
+
+        s3.invalidate_listing(s3_key)
+        await record_upload(s3, s3_key)
+        logger.info(f"File uploaded successfully: {s3_key} ({result['size']} bytes)")
         return S3UploadResponse(
             success=True,
             s3_key=s3_key,
             message="File uploaded successfully"
         )
+    except ValueError as e:
+        logger.warning(f"Rejected upload of {filename}: {e}")
+        raise HTTPException(status_code=400, detail="Uploaded content does not match sha256")
+    except S3UnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error uploading file to S3: {e}")
         raise HTTPException(status_code=500, detail="Error uploading file")
 
 
+async def _iter_upload_file(upload: StarletteUploadFile, chunk_size: int):
+    """Yield the contents of a spooled form upload in chunks"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _content_disposition(filename: str) -> str:
+    """Attachment header for any file name: an ASCII-only fallback plus the exact name per RFC 5987"""
+    fallback = "".join(
+        char if " " <= char <= "~" and char not in '"\\' else "_" for char in filename
+    ) or "download"
+    return f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{quote(filename, safe="")}'
+
+
 @app.get("/s3/download/{s3_key:path}")
-async def download_file_from_s3(s3_key: str, token_data: dict = Depends(verify_token)):
-    """Download file from S3 (requires authentication)"""
-    logger.info(f"Downloading file from S3: {s3_key} (user: {token_data['sub']})")
-    
+async def download_file_from_s3(
+    s3_key: str,
+    raw: bool = False,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    token_data: dict = Depends(verify_token)
+):
+    """
+    Stream a file from S3, honoring single-range Range requests (requires authentication)
+
+    Objects stored compressed are decompressed on the fly unless raw=true;
+    Range is ignored for them, since byte offsets refer to the stored form.
+    """
+    logger.info(f"Downloading file from S3: {s3_key} (range: {range_header}, user: {token_data['sub']})")
+
+    if range_header and not RANGE_HEADER_RE.match(range_header.strip()):
+        raise HTTPException(status_code=416, detail="Unsupported Range header")
+
+    s3 = get_async_s3_manager()
     try:
-        file_data = download_data_file(s3_key)
-        return file_data
+        response = await s3.open_object(s3_key, byte_range=range_header)
+        codec = None if raw else object_codec(response)
+        if codec and response.get("ContentRange"):
+            response["Body"].close()
+            response = await s3.open_object(s3_key)
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("NoSuchKey", "404"):
+            raise HTTPException(status_code=404, detail="File not found")
+        if code == "InvalidRange":
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable")
+        logger.error(f"Error downloading file from S3: {e}")
+        raise HTTPException(status_code=500, detail="Error downloading file")
+    except S3UnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error downloading file from S3: {e}")
         raise HTTPException(status_code=500, detail="Error downloading file")
 
+    if codec:
+        headers = {
+            "ETag": response["ETag"],
+            "Content-Disposition": _content_disposition(os.path.basename(s3_key)),
+        }
+        size = uncompressed_size(response)
+        if size is not None:
+            headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            decompress_stream(iter_object_body(response["Body"]), codec),
+            media_type=response.get("ContentType", "application/octet-stream"),
+            headers=headers
+        )
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(response["ContentLength"]),
+        "ETag": response["ETag"],
+        "Content-Disposition": _content_disposition(os.path.basename(s3_key)),
+    }
+    status_code = 200
+    if response.get("ContentRange"):
+        headers["Content-Range"] = response["ContentRange"]
+        status_code = 206
+
+    return StreamingResponse(
+        iter_object_body(response["Body"]),
+        status_code=status_code,
+        media_type=response.get("ContentType", "application/octet-stream"),
+        headers=headers
+    )
+
+
+@app.get("/s3/preview/{s3_key:path}")
+async def preview_s3_file(
+    s3_key: str,
+    lines: int = Query(20, ge=1, le=10000),
+    max_bytes: int = Query(1024 * 1024, ge=1, le=PREVIEW_MAX_BYTES),
+    token_data: dict = Depends(verify_token)
+):
+    """
+    First lines of a text file, read with ranged GETs (requires authentication)
+
+    Only as much of the object as the requested lines need is fetched (at
+    most max_bytes); compressed objects are decompressed as they are read.
+    For raw leading bytes use /s3/download with a Range header.
+    """
+    logger.info(f"Previewing S3 file: {s3_key} (lines: {lines}, user: {token_data['sub']})")
+
+    try:
+        result = await get_async_s3_manager().read_lines(s3_key, lines, max_bytes)
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("NoSuchKey", "404"):
+            raise HTTPException(status_code=404, detail="File not found")
+        if code in ("PreconditionFailed", "412"):
+            raise HTTPException(status_code=409, detail="File changed while it was being read")
+        logger.error(f"Error previewing S3 file: {e}")
+        raise HTTPException(status_code=500, detail="Error previewing file")
+
+    return {"key": s3_key, **result}
+
+
+@app.post("/s3/select")
+async def select_from_s3_file(request: S3SelectRequest, token_data: dict = Depends(verify_token)):
+    """
+    Filter and project a CSV or JSON file inside S3 with S3 Select (requires authentication)
+
+    Matching records are streamed back as NDJSON; only they leave S3.
+    """
+    logger.info(f"S3 Select on {request.s3_key} (user: {token_data['sub']})")
+
+    try:
+        records = await get_async_s3_manager().select_object(
+            request.s3_key,
+            request.expression,
+            input_format=request.input_format,
+            csv_header=request.csv_header,
+            json_lines=request.json_lines
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("NoSuchKey", "404"):
+            raise HTTPException(status_code=404, detail="File not found")
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 400:
+            raise HTTPException(status_code=400, detail=e.response.get("Error", {}).get("Message", "Invalid query"))
+        logger.error(f"Error running S3 Select: {e}")
+        raise HTTPException(status_code=500, detail="Error querying file")
+
+    return StreamingResponse(records, media_type="application/x-ndjson")
+
 
 @app.delete("/s3/files/{s3_key:path}")
 async def delete_file_from_s3(s3_key: str, token_data: dict = Depends(verify_token)):
@@ -323,27 +883,335 @@ async def delete_file_from_s3(s3_key: str, token_data: dict = Depends(verify_tok
     logger.info(f"Deleting file from S3: {s3_key} (user: {token_data['sub']})")
     
     try:
-        # This would need to be implemented in s3_manager.py
-        # For now, just return success
+        if not await get_async_s3_manager().delete_object(s3_key):
+            raise RuntimeError(f"Delete failed for {s3_key}")
+        await forget_objects(get_async_s3_manager(), keys=[s3_key])
         logger.info(f"File deleted successfully: {s3_key}")
         return {"message": "File deleted successfully"}
+    except S3UnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error deleting file from S3: {e}")
         raise HTTPException(status_code=500, detail="Error deleting file")
 
 
+@app.post("/s3/delete", response_model=S3BulkDeleteResponse)
+async def bulk_delete_from_s3(request: S3BulkDeleteRequest, token_data: dict = Depends(verify_token)):
+    """Delete many files by key list or by prefix with batched DeleteObjects (requires authentication)"""
+    if (request.keys is None) == (request.prefix is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of keys or prefix")
+    if request.prefix is not None and not request.prefix.startswith("data/"):
+        raise HTTPException(status_code=400, detail="prefix must be under data/")
+    if request.keys is not None and any(not key.startswith("data/") for key in request.keys):
+        raise HTTPException(status_code=400, detail="keys must be under data/")
+
+    logger.info(
+        f"Bulk deleting from S3: {len(request.keys) if request.keys is not None else request.prefix} "
+        f"(user: {token_data['sub']})"
+    )
+
+    s3 = get_async_s3_manager()
+    try:
+        result = await s3.delete_objects(keys=request.keys, prefix=request.prefix)
+    except S3UnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error bulk deleting from S3: {e}")
+        raise HTTPException(status_code=500, detail="Error deleting files")
+
+    failed = {error["Key"] for error in result["errors"]}
+    if request.keys is not None:
+        await forget_objects(s3, keys=[key for key in request.keys if key not in failed])
+    else:
+        await forget_objects(s3, prefix=request.prefix, keep=failed)
+
+    return S3BulkDeleteResponse(
+        deleted=result["deleted"],
+        errors=[
+            S3DeleteError(key=error["Key"], code=error["Code"], message=error["Message"])
+            for error in result["errors"]
+        ]
+    )
+
+
+@app.post("/s3/copy")
+async def copy_prefix_in_s3(request: S3CopyPrefixRequest, token_data: dict = Depends(verify_token)):
+    """Copy or move every file under one data/ prefix to another (requires authentication)"""
+    for prefix in (request.source_prefix, request.dest_prefix):
+        if not prefix.startswith("data/") or not prefix.endswith("/"):
+            raise HTTPException(status_code=400, detail="Prefixes must be under data/ and end with '/'")
+    if request.dest_prefix.startswith(request.source_prefix) or request.source_prefix.startswith(request.dest_prefix):
+        # A nested destination would be listed (and copied) again while the copy runs
+        raise HTTPException(status_code=400, detail="source_prefix and dest_prefix must not contain each other")
+
+    action = "Moving" if request.move else "Copying"
+    logger.info(f"{action} S3 prefix {request.source_prefix} -> {request.dest_prefix} (user: {token_data['sub']})")
+
+    s3 = get_async_s3_manager()
+    try:
+        if request.move:
+            result = await s3.move_prefix(request.source_prefix, request.dest_prefix)
+            await refresh_prefix(s3, request.source_prefix)
+            await refresh_prefix(s3, request.dest_prefix)
+            return {
+                "moved": result["moved"],
+                "copy_errors": result["copy_errors"],
+                "delete_errors": [error["Key"] for error in result["delete_errors"]]
+            }
+        result = await s3.copy_prefix(request.source_prefix, request.dest_prefix)
+        await refresh_prefix(s3, request.dest_prefix)
+        return {"copied": len(result["copied"]), "errors": result["errors"]}
+    except S3UnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error copying S3 prefix: {e}")
+        raise HTTPException(status_code=500, detail="Error copying files")
+
+
+@app.get("/s3/presign/download")
+async def presign_download(
+    s3_key: str,
+    expires_in: int = Query(3600, ge=60, le=7 * 24 * 3600),
+    token_data: dict = Depends(verify_token)
+):
+    """Get a presigned GET URL so the client downloads directly from S3 (requires authentication)"""
+    if not s3_key.startswith("data/"):
+        raise HTTPException(status_code=400, detail="s3_key must be under data/")
+    logger.info(f"Presigning download: {s3_key} (user: {token_data['sub']})")
+
+    url = await get_async_s3_manager().get_object_url(s3_key, expires_in)
+    if not url:
+        raise HTTPException(status_code=500, detail="Error generating download URL")
+    return {"s3_key": s3_key, "url": url, "expires_in": expires_in}
+
+
+@app.post("/s3/presign/upload", response_model=PresignUploadResponse)
+async def presign_upload(request: PresignUploadRequest, token_data: dict = Depends(verify_token)):
+    """
+    Get presigned URLs so the client uploads directly to S3 (requires authentication)
+
+    Files larger than one upload part get a multipart upload with one
+    presigned URL per part; the client then PUTs each part and calls
+    /s3/presign/complete with the part ETags. Smaller files get a single
+    presigned PUT URL, or POST form fields when method is "post".
+    """
+    logger.info(f"Presigning upload: {request.filename} (size: {request.size}, user: {token_data['sub']})")
+
+    s3 = get_async_s3_manager()
+    s3_key = build_data_key(request.filename, request.data_type)
+
+    try:
+        if request.size is not None and request.size > DEFAULT_PART_SIZE:
+            part_size = max(DEFAULT_PART_SIZE, -(-request.size // MAX_UPLOAD_PARTS))
+            part_count = -(-request.size // part_size)
+            upload_id = await s3.create_multipart_upload(s3_key, request.content_type)
+            part_urls = await s3.get_upload_part_urls(s3_key, upload_id, part_count, request.expires_in)
+            return PresignUploadResponse(
+                s3_key=s3_key,
+                method="multipart",
+                upload_id=upload_id,
+                part_size=part_size,
+                part_urls=part_urls,
+                expires_in=request.expires_in
+            )
+
+        if request.method == "post":
+            post = await s3.get_upload_post(
+                s3_key, request.size or PRESIGNED_POST_MAX_SIZE, request.content_type, request.expires_in
+            )
+            if not post:
+                raise RuntimeError("presigned POST generation failed")
+            return PresignUploadResponse(
+                s3_key=s3_key, method="post", url=post["url"], fields=post["fields"], expires_in=request.expires_in
+            )
+
+        url = await s3.get_upload_url(s3_key, request.content_type, request.expires_in)
+        if not url:
+            raise RuntimeError("presigned PUT generation failed")
+        return PresignUploadResponse(s3_key=s3_key, method="put", url=url, expires_in=request.expires_in)
+    except S3UnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error presigning upload for {request.filename}: {e}")
+        raise HTTPException(status_code=500, detail="Error generating upload URL")
+
+
+@app.post("/s3/presign/complete", response_model=S3FileInfo)
+async def presign_complete(request: PresignCompleteRequest, token_data: dict = Depends(verify_token)):
+    """Confirm a direct-to-S3 upload, completing it first if it was multipart (requires authentication)"""
+    if not request.s3_key.startswith("data/"):
+        raise HTTPException(status_code=400, detail="s3_key must be under data/")
+    logger.info(f"Completing presigned upload: {request.s3_key} (user: {token_data['sub']})")
+
+    s3 = get_async_s3_manager()
+
+    if request.upload_id:
+        if not request.parts:
+            raise HTTPException(status_code=400, detail="parts are required to complete a multipart upload")
+        try:
+            await s3.complete_multipart_upload(
+                request.s3_key,
+                request.upload_id,
+                [{"PartNumber": part.part_number, "ETag": part.etag} for part in request.parts]
+            )
+        except ClientError as e:
+            logger.error(f"Error completing multipart upload {request.upload_id}: {e}")
+            raise HTTPException(status_code=400, detail="Could not complete multipart upload")
+
+    head = await s3.head_object(request.s3_key)
+    if head is None:
+        raise HTTPException(status_code=404, detail="Uploaded object not found")
+    s3.invalidate_listing(request.s3_key)
+    await record_upload(s3, request.s3_key, head)
+
+    logger.info(f"Presigned upload confirmed: {request.s3_key} ({head['ContentLength']} bytes)")
+    return S3FileInfo(
+        key=request.s3_key,
+        size=head["ContentLength"],
+        last_modified=head["LastModified"],
+        etag=head["ETag"].strip('"')
+    )
+
+
+@app.post("/s3/presign/abort")
+async def presign_abort(s3_key: str, upload_id: str, token_data: dict = Depends(verify_token)):
+    """Abandon a presigned multipart upload and discard its parts (requires authentication)"""
+    if not s3_key.startswith("data/"):
+        raise HTTPException(status_code=400, detail="s3_key must be under data/")
+    logger.info(f"Aborting presigned upload: {s3_key} (user: {token_data['sub']})")
+
+    if not await get_async_s3_manager().abort_multipart_upload(s3_key, upload_id):
+        raise HTTPException(status_code=500, detail="Error aborting upload")
+    return {"message": "Upload aborted"}
+
+
+@app.get("/s3/inventory")
+async def s3_inventory(
+    prefix: str = "data/",
+    bucket: str = Query("app", pattern="^(app|logs)$"),
+    stream: bool = False,
+    workers: int = Query(16, ge=1, le=64),
+    token_data: dict = Depends(verify_token)
+):
+    """
+    Object counts, byte totals and size histograms under a prefix (requires authentication)
+
+    The keyspace is split into partitions that are listed in parallel.
+    With stream=true, a JSON snapshot of the running totals is sent as one
+    NDJSON line each time a partition finishes; the last line has done=true.
+    """
+    logger.info(f"S3 inventory of {bucket}:{prefix} (stream: {stream}, user: {token_data['sub']})")
+
+    if bucket == "logs":
+        logs_bucket = os.getenv("S3_LOGS_BUCKET")
+        if not logs_bucket:
+            raise HTTPException(status_code=400, detail="S3_LOGS_BUCKET is not configured")
+        s3 = AsyncS3Manager(bucket_name=logs_bucket)
+    else:
+        s3 = get_async_s3_manager()
+
+    if stream:
+        async def snapshots():
+            async for snapshot in s3.iter_inventory(prefix, max_workers=workers):
+                yield json.dumps(snapshot) + "\n"
+        return StreamingResponse(snapshots(), media_type="application/x-ndjson")
+
+    try:
+        return await s3.inventory(prefix, workers)
+    except S3UnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Error taking S3 inventory: {e}")
+        raise HTTPException(status_code=500, detail="Error taking inventory")
+
+
+@app.get("/pipeline/stages")
+async def list_pipeline_stages(token_data: dict = Depends(verify_token)):
+    """Registered pipeline transform stages (requires authentication)"""
+    return [stage.to_dict() for stage in PIPELINE_STAGES.values()]
+
+
+@app.post("/pipeline/jobs", status_code=202)
+async def start_pipeline_job(request: PipelineJobRequest, token_data: dict = Depends(verify_token)):
+    """
+    Stream a data/ file through transform stages into data/output/ (requires authentication)
+
+    The job runs in the background; poll GET /pipeline/jobs/{id} for rows
+    and bytes processed and throughput. Without output_key the result is
+    written to a timestamped key under data/output/.
+    """
+    if not request.input_key.startswith("data/"):
+        raise HTTPException(status_code=400, detail="input_key must be under data/")
+    output_key = request.output_key or build_data_key(request.input_key, "output")
+    if not output_key.startswith("data/output/"):
+        raise HTTPException(status_code=400, detail="output_key must be under data/output/")
+
+    s3 = get_async_s3_manager()
+
+    async def on_success(job):
+        s3.invalidate_listing(job.output_key)
+        await record_upload(s3, job.output_key)
+
+    try:
+        job = start_job(
+            s3.sync,
+            request.input_key,
+            output_key,
+            [stage.model_dump() for stage in request.stages],
+            chunk_size=request.chunk_size,
+            workers=request.workers,
+            on_success=on_success
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Pipeline job {job.id} started: {request.input_key} -> {output_key} (user: {token_data['sub']})")
+    return job.to_dict()
+
+
+@app.get("/pipeline/jobs")
+async def list_pipeline_jobs(token_data: dict = Depends(verify_token)):
+    """Recent pipeline jobs, newest first (requires authentication)"""
+    return [job.to_dict() for job in list_jobs()]
+
+
+@app.get("/pipeline/jobs/{job_id}")
+async def get_pipeline_job(job_id: str, token_data: dict = Depends(verify_token)):
+    """Progress and throughput of a pipeline job (requires authentication)"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Pipeline job not found")
+    return job.to_dict()
+
+
+@app.get("/s3/stats")
+async def s3_stats(token_data: dict = Depends(verify_token)):
+    """S3 client connection reuse counters (requires authentication)"""
+    return {"connections": S3ClientRegistry.connection_stats()}
+
+
 @app.get("/s3/health")
 async def s3_health_check(token_data: dict = Depends(verify_token)):
-    """S3 health check (requires authentication)"""
+    """
+    S3 health check (requires authentication)
+
+    Serves the last result of the background prober (HeadBucket plus a
+    canary PUT/GET) with rolling latency percentiles and error rates, so
+    it answers instantly and generates no S3 traffic. Unhealthy is 503.
+    Without the prober only the client circuit breaker is reported.
+    """
     logger.info(f"S3 health check (user: {token_data['sub']})")
-    
-    try:
-        # This would need to be implemented in s3_manager.py
-        # For now, just return success
-        return {"status": "healthy", "service": "S3"}
-    except Exception as e:
-        logger.error(f"S3 health check failed: {e}")
-        raise HTTPException(status_code=500, detail="S3 service unavailable")
+
+    prober = getattr(app.state, "s3_prober", None)
+    if prober is not None:
+        body = prober.snapshot()
+    else:
+        circuit = get_async_s3_manager().sync.breaker.snapshot()
+        status = {"closed": "healthy", "half_open": "degraded"}.get(circuit["state"], "unhealthy")
+        body = {"status": status, "service": "S3", "circuit": circuit}
+    if body["status"] == "unhealthy":
+        return JSONResponse(status_code=503, content=body)
+    return body
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ from .post import Post
 from .like import Like
 from .bookmark import Bookmark
 from .url_bookmark import UrlBookmark
+from .s3_object import S3Object
 
 __all__ = [
     "User",
@@ -14,5 +15,6 @@ __all__ = [
     "Post",
     "Like",
     "Bookmark",
-    "UrlBookmark"
+    "UrlBookmark",
+    "S3Object"
 ] 
\ No newline at end of file
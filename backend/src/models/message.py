@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index
 from sqlalchemy.sql import func
 from .base import Base
 
@@ -11,5 +11,8 @@ class Message(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     processed = Column(Boolean, default=True, nullable=False)
     
+    # Composite index backing keyset pagination on (timestamp, id)
+    __table_args__ = (Index('ix_messages_timestamp_id', 'timestamp', 'id'),)
+    
     def __repr__(self):
         return f"<Message(id={self.id}, user_id='{self.user_id}', message='{self.message[:50]}...')>" 
\ No newline at end of file
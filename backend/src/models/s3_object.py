@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, DateTime, BigInteger, Index
+from sqlalchemy.sql import func
+from .base import Base
+
+class S3Object(Base):
+    """Manifest row mirroring one object in an S3 bucket"""
+    __tablename__ = "s3_objects"
+    
+    bucket = Column(String(255), primary_key=True)
+    key = Column(String(1024), primary_key=True)
+    data_type = Column(String(255), nullable=True)
+    size = Column(BigInteger, nullable=False)
+    etag = Column(String(255), nullable=False)
+    last_modified = Column(DateTime(timezone=True), nullable=False)
+    # When the row was last written from an upload or a reconciliation pass
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # One index per sort order offered by /s3/files, each ending in key for keyset pagination
+    __table_args__ = (
+        Index('ix_s3_objects_type_modified', 'bucket', 'data_type', 'last_modified', 'key'),
+        Index('ix_s3_objects_type_size', 'bucket', 'data_type', 'size', 'key'),
+        Index('ix_s3_objects_type_key', 'bucket', 'data_type', 'key'),
+    )
+    
+    def __repr__(self):
+        return f"<S3Object(bucket='{self.bucket}', key='{self.key}', size={self.size})>"
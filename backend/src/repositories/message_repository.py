@@ -1,41 +1,205 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from sqlalchemy import select, delete, insert, update, text, tuple_
+from sqlalchemy.orm import selectinload, make_transient_to_detached
+from typing import List, Optional, Tuple, AsyncIterator, Any, Dict, Set
 from datetime import datetime
+import base64
+import os
 
 from src.models.message import Message
+from src.utils.cache import TTLCache
+from src.utils.single_flight import SingleFlight
 from src.utils.database import get_db_session
 
+# Process-wide read-through cache for get_by_id, holding column snapshots keyed by id
+message_cache = TTLCache(
+    maxsize=int(os.getenv("MESSAGE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("MESSAGE_CACHE_TTL", "300")),
+)
+
+# Coalesces concurrent cache misses for the same id into one query
+message_flight = SingleFlight()
+
+# Columns callers may change through update()
+UPDATABLE_FIELDS = ("message", "user_id", "processed")
+
+# Batches larger than this are loaded with COPY instead of multi-row INSERT
+COPY_THRESHOLD = 5000
+
+
+def encode_cursor(timestamp: datetime, message_id: int) -> str:
+    """Encode a (timestamp, id) keyset position as an opaque cursor"""
+    raw = f"{timestamp.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
 class MessageRepository:
-    def __init__(self, session: AsyncSession):
+    """
+    Message data access.
+
+    Write methods issue a single statement inside the session's current
+    transaction and never commit; the caller owns the unit of work and
+    commits once via commit() (or by leaving get_db_session).
+    """
+
+    def __init__(self, session: AsyncSession, cache: Optional[TTLCache] = message_cache):
         self.session = session
+        self.cache = cache
+        self._dirty_ids: Set[int] = set()
+    
+    async def commit(self) -> None:
+        """Commit the current unit of work"""
+        await self.session.commit()
+        # Drop again after commit in case a concurrent reader re-cached the old row meanwhile
+        self._invalidate(*self._dirty_ids)
+        self._dirty_ids.clear()
+    
+    def _invalidate(self, *message_ids: int) -> None:
+        """Remove messages from the read cache"""
+        if self.cache is None:
+            return
+        for message_id in message_ids:
+            self.cache.invalidate(message_id)
     
     async def create(self, message: str, user_id: str, processed: bool = True) -> Message:
-        """Create a new message"""
-        db_message = Message(
-            message=message,
-            user_id=user_id,
-            timestamp=datetime.now(),
-            processed=processed
+        """Create a new message with a single INSERT ... RETURNING"""
+        result = await self.session.execute(
+            insert(Message)
+            .values(message=message, user_id=user_id, processed=processed)
+            .returning(Message)
         )
-        self.session.add(db_message)
-        await self.session.commit()
-        await self.session.refresh(db_message)
-        return db_message
+        return result.scalar_one()
     
+    async def create_many(self, messages: List[Dict[str, Any]]) -> List[Tuple[int, datetime]]:
+        """Insert many messages in one round trip and return their (id, timestamp) in input order"""
+        rows = [
+            {
+                "message": item["message"],
+                "user_id": item.get("user_id", "anonymous"),
+                "processed": item.get("processed", True),
+            }
+            for item in messages
+        ]
+        if not rows:
+            return []
+
+        if len(rows) > COPY_THRESHOLD and self.session.bind.dialect.driver == "asyncpg":
+            return await self._copy_many(rows)
+
+        result = await self.session.execute(
+            insert(Message).returning(Message.id, Message.timestamp, sort_by_parameter_order=True),
+            rows,
+        )
+        return [(row.id, row.timestamp) for row in result]
+
+    async def _copy_many(self, rows: List[Dict[str, Any]]) -> List[Tuple[int, datetime]]:
+        """Load a large batch through COPY into a staging table, then insert it with RETURNING"""
+        conn = await self.session.connection()
+        # Executing through SQLAlchemy first opens the transaction the COPY must run in
+        await conn.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS messages_ingest "
+            "(ord integer, message text, user_id varchar(255), processed boolean) "
+            "ON COMMIT DELETE ROWS"
+        ))
+        raw_conn = await conn.get_raw_connection()
+        await raw_conn.driver_connection.copy_records_to_table(
+            "messages_ingest",
+            records=[(i, r["message"], r["user_id"], r["processed"]) for i, r in enumerate(rows)],
+            columns=["ord", "message", "user_id", "processed"],
+        )
+        result = await conn.execute(text(
+            "INSERT INTO messages (message, user_id, processed) "
+            "SELECT message, user_id, processed FROM messages_ingest ORDER BY ord "
+            "RETURNING id, timestamp"
+        ))
+        return [(row.id, row.timestamp) for row in result]
+
     async def get_by_id(self, message_id: int) -> Optional[Message]:
-        """Get message by ID"""
+        """Get message by ID, served from the read cache when possible"""
+        # Rows changed in this unit of work must be read through our own transaction
+        if self.cache is None or message_id in self._dirty_ids:
+            return await self._select_by_id(message_id)
+
+        snapshot = self.cache.get(message_id)
+        if snapshot is None:
+            snapshot = await message_flight.do(
+                ("message", message_id), lambda: self._load_snapshot(message_id)
+            )
+            if snapshot is None:
+                return None
+
+        # Attach a copy to this session without touching the database
+        cached = Message(**snapshot)
+        make_transient_to_detached(cached)
+        return await self.session.merge(cached, load=False)
+
+    async def _select_by_id(self, message_id: int) -> Optional[Message]:
+        """Query a message by ID"""
         result = await self.session.execute(
             select(Message).where(Message.id == message_id)
         )
         return result.scalar_one_or_none()
-    
+
+    async def _load_snapshot(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """Query a message and store its column snapshot in the read cache"""
+        message = await self._select_by_id(message_id)
+        if message is None:
+            return None
+        snapshot = {column.key: getattr(message, column.key) for column in Message.__table__.columns}
+        self.cache.set(message_id, snapshot)
+        return snapshot
+
     async def get_all(self) -> List[Message]:
         """Get all messages"""
         result = await self.session.execute(select(Message).order_by(Message.timestamp.desc()))
         return result.scalars().all()
-    
+
+    async def list_page(
+        self, limit: int = 100, cursor: Optional[str] = None
+    ) -> Tuple[List[Message], Optional[str]]:
+        """Get one page of messages (newest first) using keyset pagination on (timestamp, id)"""
+        query = select(Message).order_by(Message.timestamp.desc(), Message.id.desc())
+        if cursor:
+            timestamp, message_id = decode_cursor(cursor)
+            query = query.where(tuple_(Message.timestamp, Message.id) < (timestamp, message_id))
+
+        # Fetch one extra row to know whether another page exists
+        result = await self.session.execute(query.limit(limit + 1))
+        messages = list(result.scalars().all())
+
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            last = messages[-1]
+            next_cursor = encode_cursor(last.timestamp, last.id)
+        return messages, next_cursor
+
+    async def stream_all(self, batch_size: int = 1000) -> AsyncIterator[Any]:
+        """Stream all messages (newest first) from a server-side cursor, batch_size rows at a time"""
+        result = await self.session.stream(
+            select(
+                Message.id,
+                Message.message,
+                Message.user_id,
+                Message.timestamp,
+                Message.processed,
+            )
+            .order_by(Message.timestamp.desc(), Message.id.desc())
+            .execution_options(yield_per=batch_size)
+        )
+        async for row in result:
+            yield row
+
     async def get_by_user_id(self, user_id: str) -> List[Message]:
         """Get messages by user ID"""
         result = await self.session.execute(
@@ -45,22 +209,26 @@ class MessageRepository:
     
     async def delete(self, message_id: int) -> bool:
         """Delete message by ID"""
+        self._invalidate(message_id)
+        self._dirty_ids.add(message_id)
         result = await self.session.execute(
             delete(Message).where(Message.id == message_id)
         )
-        await self.session.commit()
         return result.rowcount > 0
     
     async def update(self, message_id: int, **kwargs) -> Optional[Message]:
-        """Update message"""
-        message = await self.get_by_id(message_id)
-        if not message:
-            return None
-        
-        for key, value in kwargs.items():
-            if hasattr(message, key):
-                setattr(message, key, value)
+        """Update message with a single UPDATE ... RETURNING, or None if it doesn't exist"""
+        values = {key: value for key, value in kwargs.items() if key in UPDATABLE_FIELDS}
+        if not values:
+            return await self.get_by_id(message_id)
         
-        await self.session.commit()
-        await self.session.refresh(message)
-        return message 
\ No newline at end of file
+        self._invalidate(message_id)
+        self._dirty_ids.add(message_id)
+        result = await self.session.execute(
+            update(Message)
+            .where(Message.id == message_id)
+            .values(**values)
+            .returning(Message)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none() 
\ No newline at end of file
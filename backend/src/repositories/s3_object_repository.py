@@ -0,0 +1,192 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from typing import List, Optional, Tuple, Any, Dict, Iterable
+from datetime import datetime
+import base64
+import json
+
+from src.models.s3_object import S3Object
+
+# Sort orders offered by list_page, each backed by an index ending in key
+SORT_COLUMNS = {
+    "last_modified": S3Object.last_modified,
+    "size": S3Object.size,
+    "key": S3Object.key,
+}
+
+
+def data_type_for_key(s3_key: str) -> Optional[str]:
+    """Data type of a data/{type}/... key, or None for keys outside that layout"""
+    parts = s3_key.split("/")
+    if len(parts) > 2 and parts[0] == "data":
+        return parts[1]
+    return None
+
+
+def encode_object_cursor(sort: str, value: Any, s3_key: str) -> str:
+    """Encode a (sort value, key) keyset position as an opaque cursor"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, s3_key])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_object_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    """Decode a cursor produced by encode_object_cursor for the same sort, raising ValueError if malformed"""
+    try:
+        cursor_sort, value, s3_key = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if cursor_sort != sort:
+            raise ValueError("cursor was issued for a different sort")
+        if sort == "last_modified":
+            value = datetime.fromisoformat(value)
+        elif sort == "size":
+            value = int(value)
+        return value, str(s3_key)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class S3ObjectRepository:
+    """
+    Object manifest data access for one bucket.
+
+    Like MessageRepository, write methods never commit; the caller owns
+    the unit of work and commits once via commit().
+    """
+
+    def __init__(self, session: AsyncSession, bucket: str):
+        self.session = session
+        self.bucket = bucket
+
+    async def commit(self) -> None:
+        """Commit the current unit of work"""
+        await self.session.commit()
+
+    async def upsert_many(self, objects: Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert or refresh manifest rows from S3 listing/HEAD entries.
+
+        Args:
+            objects: Dicts with Key, Size, ETag and LastModified (as returned by ListObjectsV2)
+
+        Returns:
+            int: Number of rows written
+        """
+        rows = [
+            {
+                "bucket": self.bucket,
+                "key": obj["Key"],
+                "data_type": data_type_for_key(obj["Key"]),
+                "size": obj["Size"],
+                "etag": obj["ETag"].strip('"'),
+                "last_modified": obj["LastModified"],
+            }
+            for obj in objects
+        ]
+        if not rows:
+            return 0
+
+        statement = insert(S3Object)
+        await self.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[S3Object.bucket, S3Object.key],
+                set_={
+                    "data_type": statement.excluded.data_type,
+                    "size": statement.excluded.size,
+                    "etag": statement.excluded.etag,
+                    "last_modified": statement.excluded.last_modified,
+                    "synced_at": func.now(),
+                },
+            ),
+            rows,
+        )
+        return len(rows)
+
+    async def delete_keys(self, keys: Iterable[str]) -> int:
+        """Remove manifest rows for the given keys"""
+        keys = list(keys)
+        if not keys:
+            return 0
+        result = await self.session.execute(
+            delete(S3Object).where(S3Object.bucket == self.bucket, S3Object.key.in_(keys))
+        )
+        return result.rowcount
+
+    async def delete_prefix(self, prefix: str, keep: Iterable[str] = ()) -> int:
+        """Remove manifest rows under a prefix, except the keys in keep"""
+        query = delete(S3Object).where(
+            S3Object.bucket == self.bucket, S3Object.key.startswith(prefix, autoescape=True)
+        )
+        keep = list(keep)
+        if keep:
+            query = query.where(S3Object.key.not_in(keep))
+        result = await self.session.execute(query)
+        return result.rowcount
+
+    async def delete_stale(self, prefix: str, synced_before: datetime) -> int:
+        """Remove rows under a prefix that a reconciliation pass started at synced_before did not see"""
+        result = await self.session.execute(
+            delete(S3Object).where(
+                S3Object.bucket == self.bucket,
+                S3Object.key.startswith(prefix, autoescape=True),
+                S3Object.synced_at < synced_before,
+            )
+        )
+        return result.rowcount
+
+    async def db_now(self) -> datetime:
+        """Current database time, the clock synced_at is written with"""
+        return await self.session.scalar(select(func.now()))
+
+    async def list_page(
+        self,
+        data_type: Optional[str] = None,
+        limit: int = 1000,
+        cursor: Optional[str] = None,
+        sort: str = "key",
+        descending: bool = False,
+        modified_after: Optional[datetime] = None,
+        modified_before: Optional[datetime] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+    ) -> Tuple[List[S3Object], Optional[str]]:
+        """Get one filtered, sorted page of objects using keyset pagination on (sort column, key)"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {sorted(SORT_COLUMNS)}")
+        column = SORT_COLUMNS[sort]
+
+        query = select(S3Object).where(S3Object.bucket == self.bucket)
+        if data_type is not None:
+            query = query.where(S3Object.data_type == data_type)
+        if modified_after is not None:
+            query = query.where(S3Object.last_modified > modified_after)
+        if modified_before is not None:
+            query = query.where(S3Object.last_modified < modified_before)
+        if min_size is not None:
+            query = query.where(S3Object.size >= min_size)
+        if max_size is not None:
+            query = query.where(S3Object.size <= max_size)
+
+        if sort == "key":
+            position = S3Object.key
+            order = [S3Object.key.desc() if descending else S3Object.key.asc()]
+        else:
+            position = tuple_(column, S3Object.key)
+            order = [column.desc(), S3Object.key.desc()] if descending else [column.asc(), S3Object.key.asc()]
+
+        if cursor:
+            value, last_key = decode_object_cursor(cursor, sort)
+            bound = last_key if sort == "key" else (value, last_key)
+            query = query.where(position < bound if descending else position > bound)
+
+        # Fetch one extra row to know whether another page exists
+        result = await self.session.execute(query.order_by(*order).limit(limit + 1))
+        objects = list(result.scalars().all())
+
+        next_cursor = None
+        if len(objects) > limit:
+            objects = objects[:limit]
+            last = objects[-1]
+            next_cursor = encode_object_cursor(sort, getattr(last, sort), last.key)
+        return objects, next_cursor
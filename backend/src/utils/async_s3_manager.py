@@ -0,0 +1,417 @@
+"""
+Async facade over S3Manager for use from the FastAPI event loop.
+
+boto3 is blocking, so every call is dispatched to a dedicated, bounded
+thread pool. The pool is separate from the event loop's default executor
+and is sized with S3_THREAD_POOL_SIZE, so slow S3 calls queue up there
+instead of stalling unrelated requests.
+"""
+
+import asyncio
+import functools
+import os
+import posixpath
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from .cache import TTLCache
+from .logging_manager import LoggingManager
+from .s3_manager import PREVIEW_MAX_BYTES, S3Manager
+from .s3_resilience import OperationScope, S3OperationTimeout, operation_timeout, run_in_scope
+from .s3_transfer import DEFAULT_MAX_FILES, download_many, upload_many
+from .single_flight import SingleFlight
+
+logger = LoggingManager.get_logger("async_s3_manager")
+
+T = TypeVar("T")
+
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("S3_DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Short-lived cache of listing pages keyed by (bucket, prefix, cursor, limit);
+# our own writes invalidate every cached page whose prefix covers the key
+listing_cache = TTLCache(
+    maxsize=int(os.getenv("S3_LIST_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("S3_LIST_CACHE_TTL", "30")),
+)
+
+# Coalesces identical concurrent S3 reads (e.g. listings of the same prefix)
+s3_flight = SingleFlight()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_s3_executor() -> ThreadPoolExecutor:
+    """Get the process-wide thread pool that runs blocking S3 calls."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = int(os.getenv("S3_THREAD_POOL_SIZE", "16"))
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3")
+                logger.info(f"S3 thread pool started with {max_workers} workers")
+    return _executor
+
+
+def shutdown_s3_executor() -> None:
+    """Stop the S3 thread pool, waiting for running calls to finish."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+            logger.info("S3 thread pool stopped")
+
+
+async def run_in_s3_executor(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking function on the S3 thread pool.
+
+    Args:
+        fn: Blocking callable (typically an S3Manager method)
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The return value of fn
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_s3_executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def iter_object_body(body: Any, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Read a StreamingBody chunk by chunk without blocking the event loop.
+
+    Only one chunk is held at a time and the next one is read only when
+    the consumer asks for it, so memory stays flat and a slow client
+    slows down the S3 read instead of buffering it.
+
+    Args:
+        body: botocore StreamingBody from get_object/open_object
+        chunk_size: Bytes per read
+
+    Yields:
+        Chunks of the object body
+    """
+    try:
+        while True:
+            chunk = await run_in_s3_executor(body.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        body.close()
+
+
+async def iter_in_s3_executor(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """
+    Drive a blocking iterator from the event loop, one item per S3 pool call.
+
+    The iterator is closed on the pool when the consumer stops early, so
+    generator cleanup (closing streams, stopping worker pools) still runs.
+
+    Args:
+        iterator: Blocking iterator (e.g. a generator returned by S3Manager)
+
+    Yields:
+        Items of the iterator
+    """
+    done = object()
+    try:
+        while True:
+            item = await run_in_s3_executor(next, iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await run_in_s3_executor(close)
+
+
+def _release_late_result(future: Future) -> None:
+    """Close the stream held by the result of an operation whose caller already gave up"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if isinstance(result, dict):
+        stream = result.get("Body") or result.get("Payload")
+        if stream is not None:
+            stream.close()
+    elif hasattr(result, "close"):
+        result.close()
+
+
+class AsyncS3Manager:
+    """Awaitable mirror of S3Manager; each method runs on the S3 thread pool."""
+
+    def __init__(self, s3_manager: Optional[S3Manager] = None, **kwargs: Any):
+        """
+        Initialize async S3 manager.
+
+        Args:
+            s3_manager: Existing S3Manager to wrap (a new one is created if omitted)
+            **kwargs: Arguments for S3Manager when creating one
+        """
+        self.sync = s3_manager or S3Manager(**kwargs)
+        self.bucket_name = self.sync.bucket_name
+        self.region = self.sync.region
+        self._listing_generation = 0
+
+    async def _call(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Run an S3Manager method on the S3 pool within its operation deadline.
+
+        Raises:
+            S3OperationTimeout: If the deadline for the operation passes first
+        """
+        operation = fn.__name__
+        timeout = operation_timeout(operation)
+        if timeout is None:
+            return await run_in_s3_executor(fn, *args)
+        scope = OperationScope()
+        future = get_s3_executor().submit(run_in_scope, scope, fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            # The blocking call itself is bounded by the client timeouts and finishes on the pool;
+            # count it here once and release whatever it returns when nobody is waiting anymore
+            scope.timed_out = True
+            future.add_done_callback(_release_late_result)
+            self.sync.breaker.record_failure()
+            logger.warning(f"S3 {operation} timed out after {timeout:g}s (bucket: {self.bucket_name})")
+            raise S3OperationTimeout(operation, timeout)
+
+    def invalidate_listing(self, s3_key: str) -> None:
+        """
+        Drop cached listing pages that could contain a key we just wrote or deleted.
+
+        Args:
+            s3_key: S3 object key (or prefix) that changed
+        """
+        self._listing_generation += 1
+        listing_cache.invalidate_where(
+            lambda key: key[0] == self.bucket_name and (s3_key.startswith(key[1]) or key[1].startswith(s3_key))
+        )
+
+    async def upload_file(self, file_path: str, s3_key: str, content_type: Optional[str] = None) -> bool:
+        """Async version of S3Manager.upload_file."""
+        uploaded = await self._call(self.sync.upload_file, file_path, s3_key, content_type)
+        self.invalidate_listing(s3_key)
+        return uploaded
+
+    async def upload_fileobj(self, file_obj: BinaryIO, s3_key: str, content_type: Optional[str] = None) -> bool:
+        """Async version of S3Manager.upload_fileobj."""
+        uploaded = await self._call(self.sync.upload_fileobj, file_obj, s3_key, content_type)
+        self.invalidate_listing(s3_key)
+        return uploaded
+
+    async def upload_many(self, files: List[Tuple[str, str]], max_files: int = DEFAULT_MAX_FILES,
+                          on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Async version of s3_transfer.upload_many."""
+        result = await run_in_s3_executor(upload_many, self.sync, files, max_files, on_progress)
+        for _, s3_key in files:
+            self.invalidate_listing(s3_key)
+        return result
+
+    async def download_many(self, objects: List[Tuple[str, str]], max_files: int = DEFAULT_MAX_FILES,
+                            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Async version of s3_transfer.download_many."""
+        return await run_in_s3_executor(download_many, self.sync, objects, max_files, on_progress)
+
+    async def download_file(self, s3_key: str, local_path: str) -> bool:
+        """Async version of S3Manager.download_file."""
+        return await self._call(self.sync.download_file, s3_key, local_path)
+
+    async def get_object(self, s3_key: str) -> Optional[Dict[str, Any]]:
+        """Async version of S3Manager.get_object."""
+        return await self._call(self.sync.get_object, s3_key)
+
+    async def open_object(self, s3_key: str, byte_range: Optional[str] = None) -> Dict[str, Any]:
+        """Async version of S3Manager.open_object."""
+        return await self._call(self.sync.open_object, s3_key, byte_range)
+
+    async def delete_object(self, s3_key: str) -> bool:
+        """Async version of S3Manager.delete_object."""
+        deleted = await self._call(self.sync.delete_object, s3_key)
+        self.invalidate_listing(s3_key)
+        return deleted
+
+    async def delete_objects(self, keys: Optional[List[str]] = None, prefix: Optional[str] = None,
+                             max_workers: int = 8) -> Dict[str, Any]:
+        """Async version of S3Manager.delete_objects."""
+        result = await self._call(self.sync.delete_objects, keys, prefix, max_workers)
+        self.invalidate_listing(prefix if prefix else posixpath.commonprefix(keys or []))
+        return result
+
+    async def list_objects(self, prefix: str = "", max_keys: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Async version of S3Manager.list_objects."""
+        return await self._call(self.sync.list_objects, prefix, max_keys)
+
+    async def list_objects_page(self, prefix: str = "", continuation_token: Optional[str] = None,
+                                max_keys: int = 1000) -> Dict[str, Any]:
+        """Async version of S3Manager.list_objects_page."""
+        return await self._call(self.sync.list_objects_page, prefix, continuation_token, max_keys)
+
+    async def list_objects_sharded(self, prefix: str, max_workers: int = 16) -> List[Dict[str, Any]]:
+        """Async version of S3Manager.list_objects_sharded."""
+        return await self._call(self.sync.list_objects_sharded, prefix, max_workers)
+
+    async def iter_objects(self, prefix: str = "", page_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Iterate over every object under a prefix, fetching pages on the S3 pool.
+
+        Args:
+            prefix: Object key prefix
+            page_size: Keys requested per ListObjectsV2 call
+
+        Yields:
+            Object dictionaries
+        """
+        token = None
+        while True:
+            page = await self.list_objects_page(prefix, token, page_size)
+            for obj in page["objects"]:
+                yield obj
+            token = page["next_token"]
+            if not token:
+                break
+
+    async def iter_inventory(self, prefix: str = "", max_workers: int = 16,
+                             target_partitions: int = 64) -> AsyncIterator[Dict[str, Any]]:
+        """Async version of S3Manager.iter_inventory; each snapshot is awaited on the S3 pool."""
+        async for snapshot in iter_in_s3_executor(self.sync.iter_inventory(prefix, max_workers, target_partitions)):
+            yield snapshot
+
+    async def read_bytes(self, s3_key: str, max_bytes: int) -> bytes:
+        """Async version of S3Manager.read_bytes."""
+        return await self._call(self.sync.read_bytes, s3_key, max_bytes)
+
+    async def read_lines(self, s3_key: str, max_lines: int, max_bytes: int = PREVIEW_MAX_BYTES) -> Dict[str, Any]:
+        """Async version of S3Manager.read_lines."""
+        return await self._call(self.sync.read_lines, s3_key, max_lines, max_bytes)
+
+    async def select_object(self, s3_key: str, expression: str, input_format: str = "csv",
+                            csv_header: bool = True, json_lines: bool = True) -> AsyncIterator[bytes]:
+        """
+        Async version of S3Manager.select_object.
+
+        The query is started (and rejected, if invalid) before this returns;
+        iterate the result to stream the records.
+        """
+        records = await self._call(
+            self.sync.select_object, s3_key, expression, input_format, csv_header, json_lines
+        )
+        return iter_in_s3_executor(records)
+
+    async def list_page_cached(self, prefix: str, cursor: Optional[str] = None,
+                               limit: int = 1000) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get one listing page through the listing cache and single-flight layer.
+
+        Args:
+            prefix: Object key prefix
+            cursor: Continuation token from the previous page
+            limit: Page size
+
+        Returns:
+            Tuple of (objects, next cursor or None)
+        """
+        key = (self.bucket_name, prefix, cursor, limit)
+        cached = listing_cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def load():
+            generation = self._listing_generation
+            page = await self.list_objects_page(prefix, cursor, limit)
+            result = (page["objects"], page["next_token"])
+            # Don't cache a page that raced with one of our own writes
+            if generation == self._listing_generation:
+                listing_cache.set(key, result)
+            return result
+
+        return await s3_flight.do(("list", key), load)
+
+    async def object_exists(self, s3_key: str) -> bool:
+        """Async version of S3Manager.object_exists."""
+        return await self._call(self.sync.object_exists, s3_key)
+
+    async def get_object_url(self, s3_key: str, expires_in: int = 3600) -> Optional[str]:
+        """Async version of S3Manager.get_object_url."""
+        return await self._call(self.sync.get_object_url, s3_key, expires_in)
+
+    async def head_object(self, s3_key: str) -> Optional[Dict[str, Any]]:
+        """Async version of S3Manager.head_object."""
+        return await self._call(self.sync.head_object, s3_key)
+
+    async def copy_object(self, source_key: str, dest_key: str) -> bool:
+        """Async version of S3Manager.copy_object."""
+        copied = await self._call(self.sync.copy_object, source_key, dest_key)
+        self.invalidate_listing(dest_key)
+        return copied
+
+    async def copy_prefix(self, source_prefix: str, dest_prefix: str, max_workers: int = 8) -> Dict[str, Any]:
+        """Async version of S3Manager.copy_prefix."""
+        result = await self._call(self.sync.copy_prefix, source_prefix, dest_prefix, max_workers)
+        self.invalidate_listing(dest_prefix)
+        return result
+
+    async def move_prefix(self, source_prefix: str, dest_prefix: str, max_workers: int = 8) -> Dict[str, Any]:
+        """Async version of S3Manager.move_prefix."""
+        result = await self._call(self.sync.move_prefix, source_prefix, dest_prefix, max_workers)
+        self.invalidate_listing(source_prefix)
+        self.invalidate_listing(dest_prefix)
+        return result
+
+    async def get_bucket_info(self) -> Dict[str, Any]:
+        """Async version of S3Manager.get_bucket_info."""
+        return await self._call(self.sync.get_bucket_info)
+
+    async def inventory(self, prefix: str = "", max_workers: int = 16, target_partitions: int = 64) -> Dict[str, Any]:
+        """Async version of S3Manager.inventory."""
+        return await self._call(self.sync.inventory, prefix, max_workers, target_partitions)
+
+    async def create_multipart_upload(self, s3_key: str, content_type: Optional[str] = None,
+                                      metadata: Optional[Dict[str, str]] = None) -> str:
+        """Async version of S3Manager.create_multipart_upload."""
+        return await self._call(self.sync.create_multipart_upload, s3_key, content_type, metadata)
+
+    async def complete_multipart_upload(self, s3_key: str, upload_id: str,
+                                        parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Async version of S3Manager.complete_multipart_upload."""
+        result = await self._call(self.sync.complete_multipart_upload, s3_key, upload_id, parts)
+        self.invalidate_listing(s3_key)
+        return result
+
+    async def abort_multipart_upload(self, s3_key: str, upload_id: str) -> bool:
+        """Async version of S3Manager.abort_multipart_upload."""
+        return await self._call(self.sync.abort_multipart_upload, s3_key, upload_id)
+
+    async def get_upload_url(self, s3_key: str, content_type: Optional[str] = None,
+                             expires_in: int = 3600) -> Optional[str]:
+        """Async version of S3Manager.get_upload_url."""
+        return await self._call(self.sync.get_upload_url, s3_key, content_type, expires_in)
+
+    async def get_upload_post(self, s3_key: str, max_size: int, content_type: Optional[str] = None,
+                              expires_in: int = 3600) -> Optional[Dict[str, Any]]:
+        """Async version of S3Manager.get_upload_post."""
+        return await self._call(self.sync.get_upload_post, s3_key, max_size, content_type, expires_in)
+
+    async def get_upload_part_urls(self, s3_key: str, upload_id: str, part_count: int,
+                                   expires_in: int = 3600) -> List[str]:
+        """Async version of S3Manager.get_upload_part_urls."""
+        return await self._call(self.sync.get_upload_part_urls, s3_key, upload_id, part_count, expires_in)
+
+
+_default_manager: Optional[AsyncS3Manager] = None
+
+
+def get_async_s3_manager() -> AsyncS3Manager:
+    """Get the shared AsyncS3Manager for the default application bucket."""
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = AsyncS3Manager()
+    return _default_manager
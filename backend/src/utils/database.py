@@ -64,12 +64,12 @@ AsyncSessionLocal = async_sessionmaker(
 
 def import_models():
     """Import all models to ensure they are registered with SQLAlchemy"""
-    from src.models import User, Message, Feedback, Post, Like, Bookmark, UrlBookmark
-    return User, Message, Feedback, Post, Like, Bookmark, UrlBookmark
+    from src.models import User, Message, Feedback, Post, Like, Bookmark, UrlBookmark, S3Object
+    return User, Message, Feedback, Post, Like, Bookmark, UrlBookmark, S3Object
 
 @asynccontextmanager
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
-    """Get database session with automatic cleanup"""
+    """Get database session that commits the unit of work on exit (or rolls it back on error)"""
     async with AsyncSessionLocal() as session:
         try:
             yield session
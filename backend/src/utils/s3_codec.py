@@ -0,0 +1,301 @@
+"""
+Opt-in compression of S3 objects with gzip or zstd.
+
+Compressed objects carry their codec in user metadata (x-amz-meta-codec),
+so readers decide per object whether to decompress and objects stored
+before compression was enabled keep working unchanged. Compression and
+decompression run chunk by chunk, never holding a whole object in memory.
+
+zstd needs the optional ``zstandard`` package; gzip is always available.
+"""
+
+import asyncio
+import os
+import tempfile
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, BinaryIO, Dict, List, Optional
+
+from .logging_manager import LoggingManager
+from .s3_manager import S3Manager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = LoggingManager.get_logger("s3_codec")
+
+CODECS = ("gzip", "zstd")
+CODEC_METADATA_KEY = "codec"
+# Size of the original content, when known before compressing
+SIZE_METADATA_KEY = "uncompressed-size"
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def available_codecs() -> List[str]:
+    """Codecs usable in this environment."""
+    return [codec for codec in CODECS if codec != "zstd" or zstandard is not None]
+
+
+def _check_codec(codec: str) -> None:
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {CODECS}")
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("zstd compression requires the 'zstandard' package")
+
+
+def make_compressor(codec: str, level: Optional[int] = None):
+    """
+    Create a streaming compressor with compress(data) and flush() methods.
+
+    Args:
+        codec: "gzip" or "zstd"
+        level: Compression level (codec default if omitted)
+    """
+    _check_codec(codec)
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+def make_decompressor(codec: str):
+    """Create a streaming decompressor with decompress(data) and flush() methods."""
+    _check_codec(codec)
+    if codec == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def codec_metadata(codec: str, size: Optional[int] = None) -> Dict[str, str]:
+    """User metadata recording how an object is encoded."""
+    metadata = {CODEC_METADATA_KEY: codec}
+    if size is not None:
+        metadata[SIZE_METADATA_KEY] = str(size)
+    return metadata
+
+
+def object_codec(response: Dict[str, Any]) -> Optional[str]:
+    """
+    Codec of an object from its HeadObject/GetObject response.
+
+    Returns:
+        "gzip", "zstd" or None for objects stored uncompressed
+    """
+    return (response.get("Metadata") or {}).get(CODEC_METADATA_KEY)
+
+
+def uncompressed_size(response: Dict[str, Any]) -> Optional[int]:
+    """Original size recorded for a compressed object, if any."""
+    size = (response.get("Metadata") or {}).get(SIZE_METADATA_KEY)
+    return int(size) if size is not None else None
+
+
+class CompressingReader:
+    """Read-only file object yielding the compressed form of another file object."""
+
+    def __init__(self, source: BinaryIO, codec: str, level: Optional[int] = None):
+        self.source = source
+        self._compressor = make_compressor(codec, level)
+        self._buffer = bytearray()
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self.source.read(CHUNK_SIZE)
+            if chunk:
+                self._buffer.extend(self._compressor.compress(chunk))
+            else:
+                self._buffer.extend(self._compressor.flush())
+                self._eof = True
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+class DecompressingReader:
+    """
+    Read-only file object yielding the decompressed form of another file object.
+
+    read(size) never produces more than size bytes, however well the input
+    compresses, and pulls only as much input as that takes.
+    """
+
+    def __init__(self, source: BinaryIO, codec: str):
+        _check_codec(codec)
+        self.source = source
+        if codec == "zstd":
+            self._reader = zstandard.ZstdDecompressor().stream_reader(
+                source, read_size=CHUNK_SIZE, read_across_frames=True
+            )
+        else:
+            self._reader = None
+            self._decompressor = make_decompressor(codec)
+            self._input = b""
+            self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if self._reader is not None:
+            return self._reader.read(size)
+        if size < 0:
+            return b"".join(iter(lambda: self.read(CHUNK_SIZE), b""))
+        while not self._eof:
+            if not self._input:
+                self._input = self.source.read(CHUNK_SIZE)
+                if not self._input:
+                    self._eof = True
+                    return self._decompressor.flush()
+            data = self._decompressor.decompress(self._input, size)
+            self._input = self._decompressor.unconsumed_tail
+            if data:
+                return data
+        return b""
+
+
+def decompress_fileobj(source: BinaryIO, dest: BinaryIO, codec: str) -> None:
+    """Decompress one file object into another, chunk by chunk."""
+    decompressor = make_decompressor(codec)
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+        dest.write(decompressor.decompress(chunk))
+    dest.write(decompressor.flush())
+
+
+async def compress_stream(chunks: AsyncIterable[bytes], codec: str,
+                          level: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Compress an async byte stream, running the codec off the event loop.
+
+    Args:
+        chunks: Async iterable of bytes (e.g. Request.stream())
+        codec: "gzip" or "zstd"
+        level: Compression level (codec default if omitted)
+
+    Yields:
+        Compressed chunks
+    """
+    compressor = make_compressor(codec, level)
+    async for chunk in chunks:
+        if chunk:
+            compressed = await asyncio.to_thread(compressor.compress, chunk)
+            if compressed:
+                yield compressed
+    tail = compressor.flush()
+    if tail:
+        yield tail
+
+
+class _AsyncChunkSource:
+    """Blocking read() over an async byte iterator, for use from a worker thread while the loop runs."""
+
+    def __init__(self, chunks: AsyncIterable[bytes], loop: asyncio.AbstractEventLoop):
+        self._chunks = chunks.__aiter__()
+        self._loop = loop
+        self._done = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._done:
+            try:
+                chunk = asyncio.run_coroutine_threadsafe(self._chunks.__anext__(), self._loop).result()
+            except StopAsyncIteration:
+                self._done = True
+                break
+            if chunk:
+                return chunk
+        return b""
+
+
+async def decompress_stream(chunks: AsyncIterable[bytes], codec: str) -> AsyncIterator[bytes]:
+    """
+    Decompress an async byte stream, running the codec off the event loop.
+
+    Output is produced CHUNK_SIZE bytes at a time through DecompressingReader,
+    which pulls compressed chunks only as it needs them, so a small object
+    that expands enormously never sits in memory all at once.
+
+    Args:
+        chunks: Async iterable of compressed bytes (e.g. iter_object_body())
+        codec: "gzip" or "zstd"
+
+    Yields:
+        Decompressed chunks of at most CHUNK_SIZE bytes
+    """
+    reader = DecompressingReader(_AsyncChunkSource(chunks, asyncio.get_running_loop()), codec)
+    while True:
+        data = await asyncio.to_thread(reader.read, CHUNK_SIZE)
+        if not data:
+            break
+        yield data
+
+
+def upload_file_compressed(s3_manager: S3Manager, file_path: str, s3_key: str, codec: str,
+                           content_type: Optional[str] = None, level: Optional[int] = None) -> bool:
+    """
+    Upload a local file compressed on the fly.
+
+    Args:
+        s3_manager: S3Manager for the bucket
+        file_path: Local file path
+        s3_key: S3 object key
+        codec: "gzip" or "zstd"
+        content_type: Content type of the original content
+        level: Compression level (codec default if omitted)
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    with open(file_path, "rb") as f:
+        return s3_manager.upload_fileobj(
+            CompressingReader(f, codec, level), s3_key, content_type,
+            metadata=codec_metadata(codec, os.path.getsize(file_path))
+        )
+
+
+def download_file_decoded(s3_manager: S3Manager, s3_key: str, local_path: str) -> bool:
+    """
+    Download an object to a local file, decompressing it if it was stored compressed.
+
+    Uncompressed objects go through the regular managed (parallel) download.
+
+    Args:
+        s3_manager: S3Manager for the bucket
+        s3_key: S3 object key
+        local_path: Local file path
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    head = s3_manager.head_object(s3_key)
+    if head is None:
+        return False
+    codec = object_codec(head)
+    if codec is None:
+        return s3_manager.download_file(s3_key, local_path)
+
+    directory = os.path.dirname(local_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        response = s3_manager.open_object(s3_key)
+        with os.fdopen(fd, "wb") as f:
+            try:
+                decompress_fileobj(response["Body"], f, codec)
+            finally:
+                response["Body"].close()
+        os.replace(tmp_path, local_path)
+    except Exception as e:
+        logger.error(f"Failed to download and decode {s3_key}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    logger.info(f"File downloaded and decoded ({codec}): s3://{s3_manager.bucket_name}/{s3_key} -> {local_path}")
+    return True
@@ -0,0 +1,172 @@
+"""
+Content-addressed, deduplicating uploads.
+
+Objects are stored under data/{type}/sha256/{digest}, so identical
+content always maps to the same key and a HEAD request is enough to know
+whether it is already in the bucket. When it is, the transfer is skipped
+and the existing key is returned.
+"""
+
+import hashlib
+import os
+import uuid
+from typing import Any, AsyncIterable, Dict, Optional
+
+from .async_s3_manager import run_in_s3_executor
+from .logging_manager import LoggingManager
+from .s3_manager import S3Manager
+from .s3_multipart import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE, MultipartUploader
+
+logger = LoggingManager.get_logger("s3_dedup")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Streams of unknown content land here until their digest is known
+STAGING_PREFIX = "data/temp/uploads/"
+
+
+def build_content_key(digest: str, data_type: str = "input") -> str:
+    """
+    Build the content-addressed S3 key for a SHA-256 digest.
+
+    Args:
+        digest: Hex SHA-256 of the content
+        data_type: Type of data (input, output, temp)
+
+    Returns:
+        str: S3 key under data/{data_type}/sha256/
+    """
+    return f"data/{data_type}/sha256/{digest}"
+
+
+def file_sha256(file_path: str) -> str:
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_content(s3_manager: S3Manager, digest: str, data_type: str = "input") -> Optional[Dict[str, Any]]:
+    """
+    Look up already stored content.
+
+    Args:
+        s3_manager: S3Manager for the bucket
+        digest: Hex SHA-256 of the content
+        data_type: Type of data (input, output, temp)
+
+    Returns:
+        HEAD response of the content-addressed object, or None if it is not stored
+    """
+    return s3_manager.head_object(build_content_key(digest, data_type))
+
+
+def upload_file_dedup(s3_manager: S3Manager, file_path: str, data_type: str = "input",
+                      content_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Upload a local file under its content-addressed key unless that content is already stored.
+
+    Args:
+        s3_manager: S3Manager for the bucket
+        file_path: Local file path
+        data_type: Type of data (input, output, temp)
+        content_type: Content type of the file
+
+    Returns:
+        Dict with 'key', 'sha256', 'size' and 'deduplicated', or None if the upload failed
+    """
+    digest = file_sha256(file_path)
+    s3_key = build_content_key(digest, data_type)
+    result = {"key": s3_key, "sha256": digest, "size": os.path.getsize(file_path), "deduplicated": True}
+
+    if find_content(s3_manager, digest, data_type) is not None:
+        logger.info(f"Content already stored, skipping upload: {file_path} -> {s3_key}")
+        return result
+
+    metadata = {"original-filename": os.path.basename(file_path)}
+    if not s3_manager.upload_file(file_path, s3_key, content_type, metadata=metadata):
+        return None
+    result["deduplicated"] = False
+    return result
+
+
+async def upload_stream_dedup(
+    s3_manager: S3Manager,
+    chunks: AsyncIterable[bytes],
+    filename: str,
+    data_type: str = "input",
+    content_type: Optional[str] = None,
+    expected_sha256: Optional[str] = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, Any]:
+    """
+    Upload an async byte stream under its content-addressed key, hashing it on the way.
+
+    With expected_sha256 the stream goes straight to its final key and the
+    digest is verified before the upload is completed (callers should check
+    find_content first and not send anything if it exists). Without it the
+    key is only known at the end: payloads smaller than one part are simply
+    stored under it, larger ones are staged under data/temp/uploads/ and then
+    copied server-side. Either way, if the content turns out to be stored
+    already, the pending upload is aborted and nothing new is kept.
+
+    Args:
+        s3_manager: S3Manager for the target bucket
+        chunks: Async iterable of bytes (e.g. Request.stream())
+        filename: Original file name (kept as object metadata)
+        data_type: Type of data (input, output, temp)
+        content_type: Content type of the object
+        expected_sha256: Digest announced by the client, if any
+        part_size: Bytes per part
+        concurrency: Maximum parts uploaded at once
+
+    Returns:
+        Dict with 'key', 'sha256', 'size' and 'deduplicated'
+
+    Raises:
+        ValueError: If the content does not match expected_sha256
+    """
+    target = build_content_key(expected_sha256, data_type) if expected_sha256 else (
+        f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+    )
+    uploader = MultipartUploader(
+        s3_manager, target, content_type, part_size, concurrency,
+        metadata={"original-filename": os.path.basename(filename)}
+    )
+    digest = hashlib.sha256()
+    try:
+        async for chunk in chunks:
+            if chunk:
+                digest.update(chunk)
+                await uploader.write(chunk)
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 and sha256 != expected_sha256:
+            raise ValueError(f"Content SHA-256 {sha256} does not match {expected_sha256}")
+
+        s3_key = build_content_key(sha256, data_type)
+        result = {"key": s3_key, "sha256": sha256, "size": uploader.bytes_received, "deduplicated": True}
+        if not expected_sha256 and await run_in_s3_executor(find_content, s3_manager, sha256, data_type):
+            logger.info(f"Content already stored, discarding upload of {filename}: {s3_key}")
+            await uploader.abort()
+            return result
+
+        if not uploader.started:
+            uploader.s3_key = s3_key
+        await uploader.complete()
+    except BaseException:
+        logger.error(f"Deduplicating upload failed, aborting: s3://{s3_manager.bucket_name}/{target}")
+        await uploader.abort()
+        raise
+
+    if uploader.s3_key != s3_key:
+        copied = await run_in_s3_executor(s3_manager.copy_object, uploader.s3_key, s3_key)
+        await run_in_s3_executor(s3_manager.delete_object, uploader.s3_key)
+        if not copied:
+            raise RuntimeError(f"Could not move staged upload to {s3_key}")
+
+    logger.info(f"Content-addressed upload finished: s3://{s3_manager.bucket_name}/{s3_key} ({result['size']} bytes)")
+    result["deduplicated"] = False
+    return result
@@ -0,0 +1,357 @@
+"""
+Local on-disk cache of S3 objects shared by all workers on a host.
+
+Entries are keyed by bucket and key and remember the ETag they were
+downloaded at. A cached entry is revalidated with a conditional GET
+(If-None-Match), so an unchanged object costs one empty 304 response
+instead of a full download. Total size is bounded with LRU eviction.
+
+Several processes may use the same cache directory: downloads go to a
+temporary file that is atomically renamed into place, and a per-entry
+file lock keeps two workers from fetching the same object at once.
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from .logging_manager import LoggingManager
+from .s3_manager import S3Manager
+
+logger = LoggingManager.get_logger("s3_disk_cache")
+
+DEFAULT_CACHE_DIR = os.getenv("S3_CACHE_DIR", "data/temp/s3-cache")
+DEFAULT_MAX_BYTES = int(os.getenv("S3_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+# Entries validated more recently than this are served without asking S3
+DEFAULT_REVALIDATE_AFTER = float(os.getenv("S3_CACHE_REVALIDATE_SECONDS", "60"))
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class S3DiskCache:
+    """Content cache for S3 objects on local disk with conditional revalidation."""
+
+    def __init__(self, s3_manager: Optional[S3Manager] = None, cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES, revalidate_after: float = DEFAULT_REVALIDATE_AFTER):
+        """
+        Initialize the cache.
+
+        Args:
+            s3_manager: S3Manager for the source bucket (a default one is created if omitted)
+            cache_dir: Directory holding cached objects
+            max_bytes: Total size of cached data before LRU eviction kicks in
+            revalidate_after: Seconds an entry is trusted before a conditional GET is issued
+        """
+        self.s3 = s3_manager or S3Manager()
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def open(self, s3_key: str) -> BinaryIO:
+        """
+        Open the current contents of an object, downloading them if needed.
+
+        The file is opened while the entry lock is held, so no other
+        worker's eviction or refresh can remove it first; once open, the
+        handle stays readable even if the entry is evicted or replaced later.
+
+        Args:
+            s3_key: S3 object key
+
+        Returns:
+            Binary file object positioned at the start; the caller must close it
+
+        Raises:
+            ClientError: If the object cannot be fetched
+        """
+        f, _ = self._open_entry(s3_key)
+        return f
+
+    def _open_entry(self, s3_key: str) -> Tuple[BinaryIO, Dict[str, Any]]:
+        """Open an entry (fetching or revalidating it first) and return it with its metadata"""
+        data_path, meta_path = self._entry_paths(s3_key)
+
+        with self._locked(data_path + ".lock"):
+            meta = self._read_meta(meta_path)
+            if meta is not None and os.path.exists(data_path):
+                if time.time() - meta["validated_at"] < self.revalidate_after:
+                    self._count(hits=1)
+                    return self._open_pinned(data_path, meta)
+
+                try:
+                    response = self.s3.open_object(s3_key, if_none_match=meta["etag"])
+                except ClientError as e:
+                    if e.response.get("Error", {}).get("Code") not in ("304", "NotModified"):
+                        raise
+                    self._count(hits=1, revalidations=1)
+                    meta["validated_at"] = time.time()
+                    self._write_meta(meta_path, meta)
+                    return self._open_pinned(data_path, meta)
+                logger.info(f"Cached object changed upstream, refreshing: {s3_key}")
+            else:
+                response = self.s3.open_object(s3_key)
+
+            self._count(misses=1)
+            self._store(response, data_path)
+            meta = {
+                "bucket": self.s3.bucket_name,
+                "key": s3_key,
+                "etag": response["ETag"],
+                "size": response["ContentLength"],
+                "codec": (response.get("Metadata") or {}).get("codec"),
+                "validated_at": time.time(),
+            }
+            self._write_meta(meta_path, meta)
+            f = open(data_path, "rb")
+
+        try:
+            # Never evict the entry we are about to hand out
+            self.evict(pinned=(data_path,))
+        except BaseException:
+            f.close()
+            raise
+        return f, meta
+
+    def _open_pinned(self, data_path: str, meta: Dict[str, Any]) -> Tuple[BinaryIO, Dict[str, Any]]:
+        """Open an entry the caller holds the lock of and mark it as recently used"""
+        f = open(data_path, "rb")
+        self._touch(data_path)
+        return f, meta
+
+    def open_mmap(self, s3_key: str) -> mmap.mmap:
+        """
+        Memory-map the cached contents of an object (fetching it if needed).
+
+        The mapping stays valid even if the entry is later refreshed or
+        evicted, because replaced files are renamed over, not rewritten.
+
+        Args:
+            s3_key: S3 object key
+
+        Returns:
+            Read-only mmap of the object; the caller must close it
+        """
+        with self.open(s3_key) as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap cannot map empty files
+                return mmap.mmap(-1, 1, access=mmap.ACCESS_READ)
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def copy_to(self, s3_key: str, local_path: str, decode: bool = True) -> None:
+        """
+        Copy the cached contents of an object to a caller-owned path.
+
+        The cache keeps objects as stored; with decode, objects stored
+        compressed (see s3_codec) are decompressed into local_path.
+
+        Args:
+            s3_key: S3 object key
+            local_path: Destination file path
+            decode: Decompress objects stored with a codec
+        """
+        directory = os.path.dirname(local_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        source, meta = self._open_entry(s3_key)
+        codec = meta.get("codec") if decode else None
+        with source, open(local_path, "wb") as dest:
+            if codec is None:
+                shutil.copyfileobj(source, dest, COPY_CHUNK_SIZE)
+                return
+            from .s3_codec import decompress_fileobj
+            decompress_fileobj(source, dest, codec)
+
+    def evict(self, pinned: Iterable[str] = ()) -> int:
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+
+        Only one process evicts at a time; others skip the pass. Entries
+        another worker is fetching or revalidating (their entry lock is
+        held) are skipped, as are pinned ones.
+
+        Args:
+            pinned: Data paths that must be kept, e.g. the one just opened for a caller
+
+        Returns:
+            int: Number of entries removed
+        """
+        lock_path = os.path.join(self.cache_dir, ".evict.lock")
+        with open(lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            pinned = set(pinned)
+            entries = self._scan()
+            total = sum(entry["size"] for entry in entries)
+            removed = 0
+            for entry in sorted(entries, key=lambda entry: entry["last_used"]):
+                if total <= self.max_bytes:
+                    break
+                if entry["data_path"] in pinned or not self._remove_entry(entry["data_path"]):
+                    continue
+                total -= entry["size"]
+                removed += 1
+
+        if removed:
+            self._count(evictions=removed)
+            logger.info(f"Evicted {removed} cached objects from {self.cache_dir}")
+        return removed
+
+    def _remove_entry(self, data_path: str) -> bool:
+        """Delete an entry and its lock file unless another worker holds the entry lock"""
+        lock_path = data_path + ".lock"
+        try:
+            lock_file = open(lock_path, "a")
+        except FileNotFoundError:
+            return False
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            # Unlink the lock file while still holding it; _locked notices and retries on a fresh one
+            for path in (data_path, data_path[:-len(".data")] + ".meta", lock_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters and current size.
+
+        Returns:
+            Dict with hits, misses, revalidations, evictions, entries and bytes
+        """
+        entries = self._scan()
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "bytes": sum(entry["size"] for entry in entries),
+                "max_bytes": self.max_bytes,
+            }
+
+    def _entry_paths(self, s3_key: str):
+        digest = hashlib.sha256(f"{self.s3.bucket_name}/{s3_key}".encode()).hexdigest()
+        directory = os.path.join(self.cache_dir, digest[:2])
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, digest)
+        return base + ".data", base + ".meta"
+
+    def _store(self, response: Dict[str, Any], data_path: str) -> None:
+        """Stream a GetObject body to a temp file and rename it into place."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(data_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                body = response["Body"]
+                try:
+                    for chunk in iter(lambda: body.read(COPY_CHUNK_SIZE), b""):
+                        f.write(chunk)
+                finally:
+                    body.close()
+            os.replace(tmp_path, data_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".data"):
+                    continue
+                data_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(data_path)
+                except FileNotFoundError:
+                    continue
+                entries.append({
+                    "data_path": data_path,
+                    "meta_path": data_path[:-len(".data")] + ".meta",
+                    "size": stat.st_size,
+                    "last_used": stat.st_mtime,
+                })
+        return entries
+
+    @staticmethod
+    def _read_meta(meta_path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: Dict[str, Any]) -> None:
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    @staticmethod
+    def _touch(data_path: str) -> None:
+        # mtime doubles as the LRU timestamp (atime is often disabled)
+        os.utime(data_path)
+
+    @staticmethod
+    @contextmanager
+    def _locked(lock_path: str) -> Iterator[None]:
+        while True:
+            with open(lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    stat = os.stat(lock_path)
+                except FileNotFoundError:
+                    stat = None
+                # Eviction may have unlinked the file we locked; only the current one counts
+                if stat is None or stat.st_ino != os.fstat(lock_file.fileno()).st_ino:
+                    continue
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                return
+
+    def _count(self, **increments: int) -> None:
+        with self._stats_lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+_default_cache: Optional[S3DiskCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_disk_cache() -> S3DiskCache:
+    """Get the process-wide disk cache for the default application bucket."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = S3DiskCache()
+    return _default_cache
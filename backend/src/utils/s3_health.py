@@ -0,0 +1,210 @@
+"""
+Background S3 health probe with rolling latency and error statistics.
+
+A prober task checks the bucket at a fixed interval: HeadBucket, then a
+PUT and a GET of a tiny canary object whose content is verified. Each
+check keeps a rolling window of latencies and outcomes. Health endpoints
+serve the last result from memory, so however often a load balancer
+polls them, S3 only sees the prober's own requests.
+
+Probe calls go through the shared client and its circuit breaker: while
+the circuit is open they fail fast, and once it is half-open the probe
+is the trial call that can close it again.
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from .async_s3_manager import run_in_s3_executor
+from .logging_manager import LoggingManager
+from .s3_manager import S3Manager
+
+logger = LoggingManager.get_logger("s3_health")
+
+# Seconds between probes (0 disables the prober)
+PROBE_INTERVAL = float(os.getenv("S3_HEALTH_INTERVAL", "15"))
+# Probes kept for percentiles and error rates
+PROBE_WINDOW = int(os.getenv("S3_HEALTH_WINDOW", "120"))
+CANARY_ENABLED = os.getenv("S3_HEALTH_CANARY", "true").lower() == "true"
+# Prefix of the canary keys, outside data/ so listings and the manifest never see them
+CANARY_KEY_PREFIX = os.getenv("S3_HEALTH_CANARY_KEY", f".health/canary-{socket.gethostname()}")
+# Error rate over the window above which S3 is reported as degraded
+DEGRADED_ERROR_RATE = float(os.getenv("S3_HEALTH_DEGRADED_ERROR_RATE", "0.05"))
+
+PERCENTILES = (50, 90, 99)
+
+
+def default_canary_key() -> Optional[str]:
+    """
+    Canary key for the calling process, or None when the canary is disabled.
+
+    Every worker probes on its own, so each writes its own key; with a
+    shared key one worker could read another's token and report a mismatch.
+    """
+    if not CANARY_ENABLED:
+        return None
+    return f"{CANARY_KEY_PREFIX}-{os.getpid()}"
+
+
+class LatencyWindow:
+    """Rolling window of check outcomes and latencies."""
+
+    def __init__(self, size: int = PROBE_WINDOW):
+        self.samples: deque = deque(maxlen=max(size, 1))
+
+    def add(self, ok: bool, latency: float) -> None:
+        self.samples.append((ok, latency))
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(latency for ok, latency in self.samples if ok)
+        errors = sum(1 for ok, _ in self.samples if not ok)
+        stats = {
+            "samples": len(self.samples),
+            "error_rate": round(errors / len(self.samples), 4) if self.samples else 0.0,
+        }
+        for p in PERCENTILES:
+            # Nearest-rank percentile of successful checks
+            index = max(int(len(latencies) * p / 100 + 0.5) - 1, 0)
+            stats[f"p{p}_ms"] = round(latencies[min(index, len(latencies) - 1)] * 1000, 1) if latencies else None
+        return stats
+
+
+class S3HealthProber:
+    """Periodically probes a bucket and keeps the latest result and rolling statistics."""
+
+    CHECKS = ("head_bucket", "put", "get")
+
+    def __init__(self, s3_manager: S3Manager, interval: float = PROBE_INTERVAL,
+                 window: int = PROBE_WINDOW, canary_key: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the prober.
+
+        Args:
+            s3_manager: S3Manager for the bucket to probe
+            interval: Seconds between probes
+            window: Probes kept for percentiles and error rates
+            canary_key: Key of the PUT/GET canary object, unique to this prober
+                (see default_canary_key; None to only run HeadBucket)
+            clock: Monotonic time source (overridable for tests)
+        """
+        self.s3 = s3_manager
+        self.interval = interval
+        self.canary_key = canary_key
+        self._clock = clock
+        self.windows = {check: LatencyWindow(window) for check in self.CHECKS}
+        self.last: Optional[Dict[str, Any]] = None
+        self._last_at: Optional[float] = None
+
+    def probe(self) -> Dict[str, Any]:
+        """
+        Run one round of checks (blocking) and store the result.
+
+        Returns:
+            Dict with 'ok', 'checked_at' and per-check 'ok', 'latency_ms' and 'error'
+        """
+        checks = {"head_bucket": self._check(
+            "head_bucket", lambda: self.s3.s3_client.head_bucket(Bucket=self.s3.bucket_name)
+        )}
+        if self.canary_key:
+            token = uuid.uuid4().hex.encode()
+            checks["put"] = self._check(
+                "put", lambda: self.s3.s3_client.put_object(Bucket=self.s3.bucket_name, Key=self.canary_key, Body=token)
+            )
+            if checks["put"]["ok"]:
+                checks["get"] = self._check("get", lambda: self._read_canary(token))
+
+        result = {
+            "ok": all(check["ok"] for check in checks.values()),
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "checks": checks,
+        }
+        if not result["ok"]:
+            failed = {name: check["error"] for name, check in checks.items() if not check["ok"]}
+            logger.warning(f"S3 health probe failed for {self.s3.bucket_name}: {failed}")
+        self.last = result
+        self._last_at = self._clock()
+        return result
+
+    async def run(self) -> None:
+        """Probe now and then every interval seconds until cancelled"""
+        while True:
+            try:
+                await run_in_s3_executor(self.probe)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"S3 health probe crashed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def remove_canary(self) -> None:
+        """Delete this prober's canary object (blocking), logging instead of raising"""
+        if not self.canary_key:
+            return
+        try:
+            self.s3.s3_client.delete_object(Bucket=self.s3.bucket_name, Key=self.canary_key)
+        except Exception as e:
+            logger.warning(f"Could not remove S3 health canary {self.canary_key}: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Cached health of the bucket; never calls S3.
+
+        Status is unknown before the first probe, unhealthy if the last probe
+        failed or the circuit is open, degraded if results are stale, the
+        error rate over the window is above S3_HEALTH_DEGRADED_ERROR_RATE or
+        the circuit is half-open, and healthy otherwise.
+        """
+        circuit = self.s3.breaker.snapshot()
+        stats = {check: window.to_dict() for check, window in self.windows.items() if window.samples}
+        age = self._clock() - self._last_at if self._last_at is not None else None
+
+        if self.last is None:
+            status = "unknown"
+        elif not self.last["ok"] or circuit["state"] == "open":
+            status = "unhealthy"
+        elif (
+            age > 3 * self.interval
+            or circuit["state"] == "half_open"
+            or any(check["error_rate"] > DEGRADED_ERROR_RATE for check in stats.values())
+        ):
+            status = "degraded"
+        else:
+            status = "healthy"
+
+        return {
+            "status": status,
+            "service": "S3",
+            "bucket": self.s3.bucket_name,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "interval_seconds": self.interval,
+            "last": self.last,
+            "stats": stats,
+            "circuit": circuit,
+        }
+
+    def _check(self, name: str, call: Callable[[], Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception as e:
+            latency = time.perf_counter() - start
+            self.windows[name].add(False, latency)
+            return {"ok": False, "latency_ms": round(latency * 1000, 1), "error": str(e)}
+        latency = time.perf_counter() - start
+        self.windows[name].add(True, latency)
+        return {"ok": True, "latency_ms": round(latency * 1000, 1), "error": None}
+
+    def _read_canary(self, expected: bytes) -> None:
+        response = self.s3.s3_client.get_object(Bucket=self.s3.bucket_name, Key=self.canary_key)
+        with closing(response["Body"]) as body:
+            data = body.read()
+        if data != expected:
+            raise ValueError("Canary object content does not match what was written")
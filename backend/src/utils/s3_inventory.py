@@ -0,0 +1,46 @@
+"""
+Command-line bucket inventory built on S3Manager.iter_inventory.
+
+Usage:
+    python -m src.utils.s3_inventory [--prefix data/] [--bucket NAME | --logs] [--workers 16] [--progress]
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List, Optional
+
+from .s3_manager import S3Manager
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point: print the final inventory as JSON."""
+    parser = argparse.ArgumentParser(description="Count objects and bytes under an S3 prefix in parallel")
+    parser.add_argument("--prefix", default="", help="Key prefix to inventory (default: whole bucket)")
+    parser.add_argument("--bucket", help="Bucket name (default: S3_APP_BUCKET)")
+    parser.add_argument("--logs", action="store_true", help="Inventory the logs bucket (S3_LOGS_BUCKET)")
+    parser.add_argument("--workers", type=int, default=16, help="Partitions listed at once")
+    parser.add_argument("--partitions", type=int, default=64, help="Approximate number of partitions")
+    parser.add_argument("--progress", action="store_true", help="Print running totals to stderr")
+    args = parser.parse_args(argv)
+
+    bucket = args.bucket or (os.getenv("S3_LOGS_BUCKET") if args.logs else None)
+    if args.logs and not bucket:
+        parser.error("S3_LOGS_BUCKET is not set")
+
+    result = {}
+    for result in S3Manager(bucket_name=bucket).iter_inventory(args.prefix, args.workers, args.partitions):
+        if args.progress and not result["done"]:
+            totals = result["totals"]
+            sys.stderr.write(
+                f"{result['partitions_done']}/{result['partitions_total']} partitions: "
+                f"{totals['count']} objects, {totals['bytes']} bytes\n"
+            )
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,44 +2,347 @@
 S3 Manager for handling S3 operations in the backend application.
 """
 
+import hashlib
+import heapq
 import os
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
-from typing import Optional, List, Dict, Any, BinaryIO
+from typing import Optional, List, Dict, Any, BinaryIO, Iterator, Callable, Tuple
 import logging
 from datetime import datetime
 
 from .logging_manager import LoggingManager
+from .s3_resilience import CircuitBreaker, client_config_options, install_breaker
 
 logger = LoggingManager.get_logger("s3_manager")
 
+# Maximum keys accepted by a single DeleteObjects request
+DELETE_BATCH_SIZE = 1000
+
+# Objects above this size are copied with parallel UploadPartCopy instead of CopyObject
+# (CopyObject itself is limited to 5 GB)
+COPY_MULTIPART_THRESHOLD = int(os.getenv("S3_COPY_MULTIPART_THRESHOLD", str(128 * 1024 * 1024)))
+# UploadPartCopy limits: 5 MiB to 5 GiB per part (except the last), at most 10,000 parts
+MIN_COPY_PART_SIZE = 5 * 1024 * 1024
+MAX_COPY_PART_SIZE = 5 * 1024 ** 3
+MAX_COPY_PARTS = 10000
+COPY_PART_SIZE = min(max(int(os.getenv("S3_COPY_PART_SIZE", str(64 * 1024 * 1024))), MIN_COPY_PART_SIZE),
+                     MAX_COPY_PART_SIZE)
+COPY_CONCURRENCY = int(os.getenv("S3_COPY_CONCURRENCY", "8"))
+
+# Upper bounds (bytes) of the inventory size histogram buckets; a last, open-ended bucket follows
+INVENTORY_SIZE_BUCKETS = [1024, 64 * 1024, 1024 ** 2, 16 * 1024 ** 2, 128 * 1024 ** 2, 1024 ** 3]
+# Sorts after every other character, so prefix + char + KEY_MAX_CHAR is past all keys starting with prefix + char
+KEY_MAX_CHAR = "\U0010ffff"
+
+# Hashed sub-prefixes data files are spread over (0 or 1 keeps the flat data/{type}/ layout)
+KEY_SHARDS = int(os.getenv("S3_KEY_SHARDS", "0"))
+
+# Ranged reads for previews: first range size and upper bound on bytes fetched
+PREVIEW_CHUNK_SIZE = 64 * 1024
+PREVIEW_MAX_BYTES = int(os.getenv("S3_PREVIEW_MAX_BYTES", str(8 * 1024 * 1024)))
+# Upper bound on decompressed bytes a preview produces, whatever the compression ratio
+PREVIEW_MAX_DECODED_BYTES = int(os.getenv("S3_PREVIEW_MAX_DECODED_BYTES", str(32 * 1024 * 1024)))
+
+
+def build_transfer_config(**overrides: Any) -> TransferConfig:
+    """
+    Build the managed-transfer settings used by upload_file/upload_fileobj/download_file.
+    
+    Defaults come from the environment so they can be tuned per instance type:
+    S3_TRANSFER_MULTIPART_THRESHOLD, S3_TRANSFER_CHUNK_SIZE (bytes),
+    S3_TRANSFER_MAX_CONCURRENCY (threads per transfer) and
+    S3_TRANSFER_MAX_BANDWIDTH (bytes/s per transfer, unset for unlimited).
+    
+    Args:
+        **overrides: TransferConfig arguments that take precedence over the environment
+        
+    Returns:
+        TransferConfig
+    """
+    max_bandwidth = os.getenv("S3_TRANSFER_MAX_BANDWIDTH")
+    settings = {
+        'multipart_threshold': int(os.getenv("S3_TRANSFER_MULTIPART_THRESHOLD", str(16 * 1024 * 1024))),
+        'multipart_chunksize': int(os.getenv("S3_TRANSFER_CHUNK_SIZE", str(16 * 1024 * 1024))),
+        'max_concurrency': int(os.getenv("S3_TRANSFER_MAX_CONCURRENCY", "10")),
+        'max_bandwidth': int(max_bandwidth) if max_bandwidth else None,
+        'use_threads': True,
+    }
+    settings.update(overrides)
+    return TransferConfig(**settings)
+
+
+class InventoryStats:
+    """Object count, byte total and size histogram for part of a bucket."""
+    
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.histogram = [0] * (len(INVENTORY_SIZE_BUCKETS) + 1)
+        self.newest: Optional[datetime] = None
+    
+    def add(self, obj: Dict[str, Any]) -> None:
+        """Account for one ListObjectsV2 entry"""
+        size = obj['Size']
+        self.count += 1
+        self.bytes += size
+        self.histogram[next(
+            (i for i, bound in enumerate(INVENTORY_SIZE_BUCKETS) if size <= bound), len(INVENTORY_SIZE_BUCKETS)
+        )] += 1
+        modified = obj.get('LastModified')
+        if modified is not None and (self.newest is None or modified > self.newest):
+            self.newest = modified
+    
+    def merge(self, other: "InventoryStats") -> None:
+        """Add another set of statistics into this one"""
+        self.count += other.count
+        self.bytes += other.bytes
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        if other.newest is not None and (self.newest is None or other.newest > self.newest):
+            self.newest = other.newest
+    
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in INVENTORY_SIZE_BUCKETS] + [f">{INVENTORY_SIZE_BUCKETS[-1]}"]
+        return {
+            'count': self.count,
+            'bytes': self.bytes,
+            'size_histogram': dict(zip(labels, self.histogram)),
+            'newest': self.newest.isoformat() if self.newest else None,
+        }
+
+
+class _RangeReader:
+    """
+    Sequential reader over the leading bytes of an object.
+    
+    Bytes are fetched on demand with ranged GETs that double in size, up to
+    max_bytes in total; later ranges are pinned to the ETag of the first one.
+    """
+    
+    def __init__(self, s3_manager: "S3Manager", s3_key: str, max_bytes: int, chunk_size: int):
+        self.s3 = s3_manager
+        self.s3_key = s3_key
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.size: Optional[int] = None
+        self.etag: Optional[str] = None
+        self._buffer = b""
+    
+    @property
+    def exhausted(self) -> bool:
+        """Whether the whole object has been fetched"""
+        return self.size is not None and self.offset >= self.size
+    
+    def open(self) -> Optional[Dict[str, Any]]:
+        """Fetch the first range; returns its response (None for an empty object)"""
+        return self._fetch()
+    
+    def read(self, size: int = -1) -> bytes:
+        if not self._buffer:
+            self._fetch()
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+    
+    def _fetch(self) -> Optional[Dict[str, Any]]:
+        end = min(self.offset + self.chunk_size, self.max_bytes) - 1
+        if self.exhausted or end < self.offset:
+            return None
+        try:
+            response = self.s3.open_object(self.s3_key, byte_range=f"bytes={self.offset}-{end}", if_match=self.etag)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                self.size = 0
+                return None
+            raise
+        if self.etag is None:
+            self.etag = response['ETag']
+            self.size = int(response['ContentRange'].rsplit('/', 1)[1])
+        with closing(response['Body']) as body:
+            self._buffer = body.read()
+        self.offset += len(self._buffer)
+        self.chunk_size *= 2
+        return response
+
+
+class _SelectRecords:
+    """
+    Iterator over the record payloads of a SelectObjectContent event stream.
+    
+    Unlike a generator, close() releases the stream even if iteration never started.
+    """
+    
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self._events = iter(payload)
+    
+    def __iter__(self) -> "_SelectRecords":
+        return self
+    
+    def __next__(self) -> bytes:
+        try:
+            for event in self._events:
+                if 'Records' in event:
+                    return event['Records']['Payload']
+        except BaseException:
+            self.close()
+            raise
+        self.close()
+        raise StopIteration
+    
+    def close(self) -> None:
+        self.payload.close()
+
+
+class S3ClientRegistry:
+    """
+    Process-wide registry of boto3 S3 clients, one per region.
+    
+    boto3 clients are thread-safe once built, so a single client (and its
+    HTTP connection pool) is shared by every S3Manager in the process.
+    Clients are created lazily under a lock because building them from the
+    default boto3 session is not thread-safe. Each client calls through a
+    circuit breaker (see s3_resilience) that lives as long as the process.
+    """
+    
+    _clients: Dict[str, Any] = {}
+    _breakers: Dict[str, CircuitBreaker] = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def get_client(cls, region: str):
+        """
+        Get the shared S3 client for a region, creating it on first use.
+        
+        Args:
+            region: AWS region
+            
+        Returns:
+            boto3 S3 client
+        """
+        client = cls._clients.get(region)
+        if client is not None:
+            return client
+        
+        with cls._lock:
+            client = cls._clients.get(region)
+            if client is None:
+                client = boto3.session.Session().client('s3', region_name=region, config=cls._build_config())
+                install_breaker(client, cls._get_breaker_locked(region))
+                cls._clients[region] = client
+                logger.info(f"S3 client created for region: {region}")
+            return client
+    
+    @classmethod
+    def get_breaker(cls, region: str) -> CircuitBreaker:
+        """
+        Get the circuit breaker guarding the client of a region.
+        
+        Args:
+            region: AWS region
+            
+        Returns:
+            CircuitBreaker
+        """
+        breaker = cls._breakers.get(region)
+        if breaker is not None:
+            return breaker
+        with cls._lock:
+            return cls._get_breaker_locked(region)
+    
+    @classmethod
+    def _get_breaker_locked(cls, region: str) -> CircuitBreaker:
+        breaker = cls._breakers.get(region)
+        if breaker is None:
+            breaker = cls._breakers[region] = CircuitBreaker(f"s3-{region}")
+        return breaker
+    
+    @classmethod
+    def _build_config(cls) -> Config:
+        """Build the botocore config shared by all registry clients"""
+        return Config(
+            max_pool_connections=int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32")),
+            tcp_keepalive=os.getenv("S3_TCP_KEEPALIVE", "true").lower() == "true",
+            **client_config_options(),
+        )
+    
+    @classmethod
+    def connection_stats(cls) -> Dict[str, int]:
+        """
+        Count HTTP requests and connections across all registry clients.
+        
+        Returns:
+            Dict with requests sent, connections opened and connections reused
+        """
+        requests = 0
+        opened = 0
+        for client in list(cls._clients.values()):
+            try:
+                pools = client._endpoint.http_session._manager.pools
+                for pool_key in list(pools.keys()):
+                    pool = pools.get(pool_key)
+                    if pool is not None:
+                        requests += pool.num_requests
+                        opened += pool.num_connections
+            except AttributeError:
+                # botocore/urllib3 internals changed; report what we have
+                continue
+        return {
+            "clients": len(cls._clients),
+            "requests": requests,
+            "connections_opened": opened,
+            "connections_reused": max(requests - opened, 0),
+        }
+    
+    @classmethod
+    def reset(cls) -> None:
+        """Drop all cached clients and their breakers (e.g. after credentials rotate)"""
+        with cls._lock:
+            cls._clients.clear()
+            cls._breakers.clear()
+
 
 class S3Manager:
     """Manager class for S3 operations."""
     
-    def __init__(self, bucket_name: Optional[str] = None, region: Optional[str] = None):
+    def __init__(self, bucket_name: Optional[str] = None, region: Optional[str] = None,
+                 transfer_config: Optional[TransferConfig] = None):
         """
         Initialize S3 manager.
         
         Args:
             bucket_name: S3 bucket name (defaults to environment variable)
             region: AWS region (defaults to environment variable)
+            transfer_config: Managed-transfer settings (defaults to build_transfer_config())
         """
         self.bucket_name = bucket_name or os.getenv("S3_APP_BUCKET")
         self.region = region or os.getenv("S3_REGION", "us-east-1")
+        self.transfer_config = transfer_config or build_transfer_config()
         
         if not self.bucket_name:
             raise ValueError("S3 bucket name must be provided or set in S3_APP_BUCKET environment variable")
         
-        # Initialize S3 client
+        # Reuse the shared, pooled S3 client for this region
         try:
-            self.s3_client = boto3.client('s3', region_name=self.region)
-            logger.info(f"S3 client initialized for bucket: {self.bucket_name}")
+            self.s3_client = S3ClientRegistry.get_client(self.region)
+            self.breaker = S3ClientRegistry.get_breaker(self.region)
+            logger.debug(f"S3 manager ready for bucket: {self.bucket_name}")
         except Exception as e:
             logger.error(f"Failed to initialize S3 client: {e}")
             raise
     
-    def upload_file(self, file_path: str, s3_key: str, content_type: Optional[str] = None) -> bool:
+    def upload_file(self, file_path: str, s3_key: str, content_type: Optional[str] = None,
+                    callback: Optional[Callable[[int], None]] = None,
+                    metadata: Optional[Dict[str, str]] = None) -> bool:
         """
         Upload a file to S3.
         
@@ -47,6 +350,8 @@ class S3Manager:
             file_path: Local file path
             s3_key: S3 object key
             content_type: Content type of the file
+            callback: Called with the number of bytes sent as the transfer progresses
+            metadata: User metadata of the object
             
         Returns:
             bool: True if successful, False otherwise
@@ -55,15 +360,22 @@ class S3Manager:
             extra_args = {}
             if content_type:
                 extra_args['ContentType'] = content_type
+            if metadata:
+                extra_args['Metadata'] = metadata
             
-            self.s3_client.upload_file(file_path, self.bucket_name, s3_key, ExtraArgs=extra_args)
+            self.s3_client.upload_file(
+                file_path, self.bucket_name, s3_key,
+                ExtraArgs=extra_args, Config=self.transfer_config, Callback=callback
+            )
             logger.info(f"File uploaded successfully: {file_path} -> s3://{self.bucket_name}/{s3_key}")
             return True
         except (ClientError, NoCredentialsError) as e:
             logger.error(f"Failed to upload file {file_path}: {e}")
             return False
     
-    def upload_fileobj(self, file_obj: BinaryIO, s3_key: str, content_type: Optional[str] = None) -> bool:
+    def upload_fileobj(self, file_obj: BinaryIO, s3_key: str, content_type: Optional[str] = None,
+                       callback: Optional[Callable[[int], None]] = None,
+                       metadata: Optional[Dict[str, str]] = None) -> bool:
         """
         Upload a file object to S3.
         
@@ -71,6 +383,8 @@ class S3Manager:
             file_obj: File-like object
             s3_key: S3 object key
             content_type: Content type of the file
+            callback: Called with the number of bytes sent as the transfer progresses
+            metadata: User metadata of the object
             
         Returns:
             bool: True if successful, False otherwise
@@ -79,27 +393,36 @@ class S3Manager:
             extra_args = {}
             if content_type:
                 extra_args['ContentType'] = content_type
+            if metadata:
+                extra_args['Metadata'] = metadata
             
-            self.s3_client.upload_fileobj(file_obj, self.bucket_name, s3_key, ExtraArgs=extra_args)
+            self.s3_client.upload_fileobj(
+                file_obj, self.bucket_name, s3_key,
+                ExtraArgs=extra_args, Config=self.transfer_config, Callback=callback
+            )
             logger.info(f"File object uploaded successfully: s3://{self.bucket_name}/{s3_key}")
             return True
         except (ClientError, NoCredentialsError) as e:
             logger.error(f"Failed to upload file object: {e}")
             return False
     
-    def download_file(self, s3_key: str, local_path: str) -> bool:
+    def download_file(self, s3_key: str, local_path: str,
+                      callback: Optional[Callable[[int], None]] = None) -> bool:
         """
         Download a file from S3.
         
         Args:
             s3_key: S3 object key
             local_path: Local file path
+            callback: Called with the number of bytes received as the transfer progresses
             
         Returns:
             bool: True if successful, False otherwise
         """
         try:
-            self.s3_client.download_file(self.bucket_name, s3_key, local_path)
+            self.s3_client.download_file(
+                self.bucket_name, s3_key, local_path, Config=self.transfer_config, Callback=callback
+            )
             logger.info(f"File downloaded successfully: s3://{self.bucket_name}/{s3_key} -> {local_path}")
             return True
         except (ClientError, NoCredentialsError) as e:
@@ -124,6 +447,280 @@ class S3Manager:
             logger.error(f"Failed to get object {s3_key}: {e}")
             return None
     
+    def open_object(self, s3_key: str, byte_range: Optional[str] = None,
+                    if_none_match: Optional[str] = None, if_match: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Open an object for streaming, optionally limited to a byte range.
+        
+        Unlike get_object, S3 errors are raised so callers can tell a
+        missing key (NoSuchKey) from an unsatisfiable range (InvalidRange)
+        or an unchanged object (304 when if_none_match matches).
+        
+        Args:
+            s3_key: S3 object key
+            byte_range: HTTP Range header value (e.g. "bytes=0-1023")
+            if_none_match: ETag of a cached copy; S3 answers 304 if it is still current
+            if_match: ETag the object must still have (412 PreconditionFailed otherwise)
+            
+        Returns:
+            get_object response whose 'Body' is an unread StreamingBody
+        """
+        params = {'Bucket': self.bucket_name, 'Key': s3_key}
+        if byte_range:
+            params['Range'] = byte_range
+        if if_none_match:
+            params['IfNoneMatch'] = if_none_match
+        if if_match:
+            params['IfMatch'] = if_match
+        response = self.s3_client.get_object(**params)
+        logger.info(f"Object opened for streaming: s3://{self.bucket_name}/{s3_key} (range: {byte_range or 'full'})")
+        return response
+    
+    def read_bytes(self, s3_key: str, max_bytes: int) -> bytes:
+        """
+        Read the first bytes of an object with a single ranged GET.
+        
+        Args:
+            s3_key: S3 object key
+            max_bytes: Number of bytes to read
+            
+        Returns:
+            bytes: Up to max_bytes of the stored object (empty for an empty object)
+            
+        Raises:
+            ClientError: If the object cannot be read
+        """
+        try:
+            response = self.open_object(s3_key, byte_range=f"bytes=0-{max_bytes - 1}")
+        except ClientError as e:
+            # An empty object has no satisfiable range
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                return b""
+            raise
+        with closing(response['Body']) as body:
+            return body.read()
+    
+    def read_lines(self, s3_key: str, max_lines: int, max_bytes: int = PREVIEW_MAX_BYTES,
+                   chunk_size: int = PREVIEW_CHUNK_SIZE,
+                   max_decoded_bytes: int = PREVIEW_MAX_DECODED_BYTES) -> Dict[str, Any]:
+        """
+        Read the first lines of a text object without downloading all of it.
+        
+        Ranges are fetched one after another, doubling in size, until enough
+        lines are read, the object ends or max_bytes have been fetched. Later
+        ranges are pinned to the ETag of the first one. Objects stored
+        compressed (see s3_codec) are decompressed as the ranges arrive, and
+        reading stops once max_decoded_bytes have been produced, so a highly
+        compressed object cannot blow up memory.
+        
+        Args:
+            s3_key: S3 object key
+            max_lines: Number of lines wanted
+            max_bytes: Upper bound on stored bytes fetched
+            chunk_size: Size of the first range
+            max_decoded_bytes: Upper bound on (decompressed) bytes read
+            
+        Returns:
+            Dict with 'lines' (decoded, without line breaks), 'bytes_read',
+            'size' (stored size) and 'complete' (True if the whole object was read)
+            
+        Raises:
+            ClientError: If the object cannot be read
+        """
+        from .s3_codec import DecompressingReader, object_codec
+        
+        source = _RangeReader(self, s3_key, max_bytes, chunk_size)
+        first = source.open()
+        codec = object_codec(first) if first else None
+        reader = DecompressingReader(source, codec) if codec else source
+        
+        pieces: List[bytes] = []
+        decoded = 0
+        newlines = 0
+        ended = False
+        while newlines < max_lines and decoded < max_decoded_bytes:
+            data = reader.read(min(PREVIEW_CHUNK_SIZE, max_decoded_bytes - decoded))
+            if not data:
+                ended = True
+                break
+            pieces.append(data)
+            decoded += len(data)
+            newlines += data.count(b"\n")
+        
+        complete = ended and source.exhausted
+        lines = b"".join(pieces).split(b"\n")
+        # What follows the last line break is a partial line unless the object ended there
+        tail = lines.pop()
+        if complete and tail:
+            lines.append(tail)
+        return {
+            'lines': [line.rstrip(b"\r").decode('utf-8', errors='replace') for line in lines[:max_lines]],
+            'bytes_read': source.offset,
+            'size': source.size,
+            'complete': complete,
+        }
+    
+    def select_object(self, s3_key: str, expression: str, input_format: str = "csv",
+                      csv_header: bool = True, json_lines: bool = True) -> Iterator[bytes]:
+        """
+        Run an S3 Select query so filtering and projection happen inside S3.
+        
+        The request is sent before this returns, so an invalid expression
+        raises here; the returned iterator then streams the matching records
+        as newline-delimited JSON. gzip objects written by s3_codec are read
+        by S3 Select directly; zstd objects are not supported by the service.
+        
+        Args:
+            s3_key: S3 object key
+            expression: SQL expression (e.g. "SELECT s.id FROM s3object s WHERE s.value > '10' LIMIT 100")
+            input_format: "csv" or "json"
+            csv_header: CSV files start with a header row (columns can be named in the SQL)
+            json_lines: JSON objects are one per line rather than a single document
+            
+        Returns:
+            Iterator over chunks of newline-delimited JSON records; closing it
+            (even before iterating) releases the event stream
+            
+        Raises:
+            ClientError: If the query is rejected
+            ValueError: If the input format or stored codec is not supported
+        """
+        from .s3_codec import object_codec
+        
+        if input_format == "csv":
+            serialization = {'CSV': {'FileHeaderInfo': 'USE' if csv_header else 'NONE'}}
+        elif input_format == "json":
+            serialization = {'JSON': {'Type': 'LINES' if json_lines else 'DOCUMENT'}}
+        else:
+            raise ValueError(f"Unsupported input format: {input_format}")
+        
+        head = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        codec = object_codec(head)
+        if codec not in (None, "gzip"):
+            raise ValueError(f"S3 Select cannot read {codec}-compressed objects")
+        serialization['CompressionType'] = 'GZIP' if codec == "gzip" else 'NONE'
+        
+        response = self.s3_client.select_object_content(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            Expression=expression,
+            ExpressionType='SQL',
+            InputSerialization=serialization,
+            OutputSerialization={'JSON': {'RecordDelimiter': '\n'}},
+        )
+        logger.info(f"S3 Select started on s3://{self.bucket_name}/{s3_key}")
+        return _SelectRecords(response['Payload'])
+    
+    def create_multipart_upload(self, s3_key: str, content_type: Optional[str] = None,
+                                metadata: Optional[Dict[str, str]] = None) -> str:
+        """
+        Start a multipart upload.
+        
+        Multipart primitives raise ClientError instead of returning a
+        sentinel, so callers can abort the upload on any failure.
+        
+        Args:
+            s3_key: S3 object key
+            content_type: Content type of the final object
+            metadata: User metadata of the final object
+            
+        Returns:
+            str: Upload ID
+        """
+        params = {'Bucket': self.bucket_name, 'Key': s3_key}
+        if content_type:
+            params['ContentType'] = content_type
+        if metadata:
+            params['Metadata'] = metadata
+        response = self.s3_client.create_multipart_upload(**params)
+        logger.info(f"Multipart upload started: s3://{self.bucket_name}/{s3_key}")
+        return response['UploadId']
+    
+    def upload_part(self, s3_key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """
+        Upload one part of a multipart upload.
+        
+        Args:
+            s3_key: S3 object key
+            upload_id: Upload ID from create_multipart_upload
+            part_number: 1-based part number
+            data: Part bytes (at least 5 MiB except for the last part)
+            
+        Returns:
+            str: ETag of the uploaded part
+        """
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=data
+        )
+        return response['ETag']
+    
+    def complete_multipart_upload(self, s3_key: str, upload_id: str, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Complete a multipart upload.
+        
+        Args:
+            s3_key: S3 object key
+            upload_id: Upload ID from create_multipart_upload
+            parts: List of {'PartNumber': int, 'ETag': str}
+            
+        Returns:
+            Dict containing the CompleteMultipartUpload response
+        """
+        response = self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': sorted(parts, key=lambda part: part['PartNumber'])}
+        )
+        logger.info(f"Multipart upload completed: s3://{self.bucket_name}/{s3_key} ({len(parts)} parts)")
+        return response
+    
+    def abort_multipart_upload(self, s3_key: str, upload_id: str) -> bool:
+        """
+        Abort a multipart upload and discard its parts.
+        
+        Args:
+            s3_key: S3 object key
+            upload_id: Upload ID from create_multipart_upload
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id)
+            logger.info(f"Multipart upload aborted: s3://{self.bucket_name}/{s3_key}")
+            return True
+        except (ClientError, NoCredentialsError) as e:
+            logger.error(f"Failed to abort multipart upload {upload_id} for {s3_key}: {e}")
+            return False
+    
+    def put_object(self, s3_key: str, data: bytes, content_type: Optional[str] = None,
+                   metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """
+        Store a small in-memory payload in a single request.
+        
+        Args:
+            s3_key: S3 object key
+            data: Object bytes
+            content_type: Content type of the object
+            metadata: User metadata of the object
+            
+        Returns:
+            Dict containing the PutObject response
+        """
+        params = {'Bucket': self.bucket_name, 'Key': s3_key, 'Body': data}
+        if content_type:
+            params['ContentType'] = content_type
+        if metadata:
+            params['Metadata'] = metadata
+        response = self.s3_client.put_object(**params)
+        logger.info(f"Object stored successfully: s3://{self.bucket_name}/{s3_key}")
+        return response
+    
     def delete_object(self, s3_key: str) -> bool:
         """
         Delete an object from S3.
@@ -142,31 +739,180 @@ class S3Manager:
             logger.error(f"Failed to delete object {s3_key}: {e}")
             return False
     
-    def list_objects(self, prefix: str = "", max_keys: int = 1000) -> List[Dict[str, Any]]:
+    def delete_objects(self, keys: Optional[List[str]] = None, prefix: Optional[str] = None,
+                       max_workers: int = 8) -> Dict[str, Any]:
         """
-        List objects in S3 bucket with given prefix.
+        Delete many objects with batched DeleteObjects calls run concurrently.
+        
+        Keys are sent in batches of up to 1000. With a prefix, batches are
+        submitted while the listing is still running.
         
         Args:
-            prefix: Object key prefix
-            max_keys: Maximum number of keys to return
+            keys: Explicit object keys to delete
+            prefix: Delete every object under this prefix (must not be empty)
+            max_workers: Maximum DeleteObjects calls in flight
             
         Returns:
-            List of object dictionaries
+            Dict with 'deleted' (count) and 'errors' (list of {'Key', 'Code', 'Message'})
         """
+        if keys is None and not prefix:
+            raise ValueError("Either keys or a non-empty prefix must be provided")
+        
+        source = keys if keys is not None else (obj['Key'] for obj in self.iter_objects(prefix=prefix))
+        deleted = 0
+        errors: List[Dict[str, str]] = []
+        
+        def collect(done):
+            nonlocal deleted
+            for future in done:
+                batch_deleted, batch_errors = future.result()
+                deleted += batch_deleted
+                errors.extend(batch_errors)
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-delete") as pool:
+            pending = set()
+            batch: List[str] = []
+            for key in source:
+                batch.append(key)
+                if len(batch) == DELETE_BATCH_SIZE:
+                    pending.add(pool.submit(self._delete_batch, batch))
+                    batch = []
+                    # Keep the listing from racing ahead of the deletes
+                    if len(pending) >= max_workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+            if batch:
+                pending.add(pool.submit(self._delete_batch, batch))
+            collect(wait(pending).done)
+        
+        logger.info(f"Deleted {deleted} objects from s3://{self.bucket_name} ({len(errors)} errors)")
+        return {'deleted': deleted, 'errors': errors}
+    
+    def _delete_batch(self, keys: List[str]):
+        """Delete up to 1000 keys in one request, returning (deleted count, errors)"""
         try:
-            response = self.s3_client.list_objects_v2(
+            response = self.s3_client.delete_objects(
                 Bucket=self.bucket_name,
-                Prefix=prefix,
-                MaxKeys=max_keys
+                Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
             )
+            errors = [
+                {'Key': error['Key'], 'Code': error.get('Code', ''), 'Message': error.get('Message', '')}
+                for error in response.get('Errors', [])
+            ]
+        except (ClientError, NoCredentialsError) as e:
+            logger.error(f"Failed to delete batch of {len(keys)} objects: {e}")
+            errors = [{'Key': key, 'Code': 'BatchFailed', 'Message': str(e)} for key in keys]
+        return len(keys) - len(errors), errors
+    
+    def list_objects(self, prefix: str = "", max_keys: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        List objects in S3 bucket with given prefix, following continuation tokens.
+        
+        Args:
+            prefix: Object key prefix
+            max_keys: Maximum number of keys to return (None for all)
             
-            objects = response.get('Contents', [])
+        Returns:
+            List of object dictionaries
+        """
+        try:
+            objects = []
+            for obj in self.iter_objects(prefix=prefix):
+                objects.append(obj)
+                if max_keys is not None and len(objects) >= max_keys:
+                    break
             logger.info(f"Listed {len(objects)} objects with prefix '{prefix}'")
             return objects
         except (ClientError, NoCredentialsError) as e:
             logger.error(f"Failed to list objects with prefix '{prefix}': {e}")
             return []
     
+    def list_objects_page(self, prefix: str = "", continuation_token: Optional[str] = None,
+                          max_keys: int = 1000, start_after: Optional[str] = None) -> Dict[str, Any]:
+        """
+        List a single page of objects.
+        
+        Args:
+            prefix: Object key prefix
+            continuation_token: Token from the previous page (None for the first page)
+            max_keys: Page size (S3 caps it at 1000)
+            start_after: Only list keys after this one (first page only)
+            
+        Returns:
+            Dict with 'objects' and 'next_token' (None on the last page)
+            
+        Raises:
+            ClientError: If the listing fails
+        """
+        params = {'Bucket': self.bucket_name, 'Prefix': prefix, 'MaxKeys': max_keys}
+        if continuation_token:
+            params['ContinuationToken'] = continuation_token
+        elif start_after:
+            params['StartAfter'] = start_after
+        response = self.s3_client.list_objects_v2(**params)
+        return {
+            'objects': response.get('Contents', []),
+            'next_token': response.get('NextContinuationToken') if response.get('IsTruncated') else None
+        }
+    
+    def list_objects_sharded(self, prefix: str, max_workers: int = 16) -> List[Dict[str, Any]]:
+        """
+        List every object under a prefix by listing its sub-prefixes in parallel.
+        
+        Meant for data/{type}/ prefixes whose objects are spread over hashed
+        shard sub-prefixes (see build_data_key). One delimited listing finds
+        the objects stored directly under the prefix (the flat layout) and its
+        sub-prefixes (shards, sha256/, ...); those are listed concurrently and
+        merged back into key order, the order a single listing would return.
+        
+        Args:
+            prefix: Object key prefix ending in '/'
+            max_workers: Sub-prefixes listed at once
+            
+        Returns:
+            List of object dictionaries sorted by key
+            
+        Raises:
+            ClientError: If a listing fails
+        """
+        direct: List[Dict[str, Any]] = []
+        subprefixes: List[str] = []
+        params = {'Bucket': self.bucket_name, 'Prefix': prefix, 'Delimiter': '/', 'MaxKeys': 1000}
+        while True:
+            response = self.s3_client.list_objects_v2(**params)
+            direct.extend(response.get('Contents', []))
+            subprefixes.extend(common['Prefix'] for common in response.get('CommonPrefixes', []))
+            if not response.get('IsTruncated'):
+                break
+            params['ContinuationToken'] = response['NextContinuationToken']
+        
+        if not subprefixes:
+            return direct
+        with ThreadPoolExecutor(max_workers=max(min(max_workers, len(subprefixes)), 1)) as pool:
+            listings = list(pool.map(lambda subprefix: list(self.iter_objects(subprefix)), subprefixes))
+        objects = list(heapq.merge(direct, *listings, key=lambda obj: obj['Key']))
+        logger.info(f"Listed {len(objects)} objects under '{prefix}' across {len(subprefixes)} sub-prefixes")
+        return objects
+    
+    def iter_objects(self, prefix: str = "", page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over every object under a prefix, one page at a time.
+        
+        Args:
+            prefix: Object key prefix
+            page_size: Keys requested per ListObjectsV2 call
+            
+        Yields:
+            Object dictionaries
+        """
+        token = None
+        while True:
+            page = self.list_objects_page(prefix, token, page_size)
+            yield from page['objects']
+            token = page['next_token']
+            if not token:
+                break
+    
     def object_exists(self, s3_key: str) -> bool:
         """
         Check if an object exists in S3.
@@ -209,26 +955,399 @@ class S3Manager:
             logger.error(f"Failed to generate presigned URL for {s3_key}: {e}")
             return None
     
-    def copy_object(self, source_key: str, dest_key: str) -> bool:
+    def get_upload_url(self, s3_key: str, content_type: Optional[str] = None, expires_in: int = 3600) -> Optional[str]:
+        """
+        Generate a presigned PUT URL for uploading an object directly to S3.
+        
+        Args:
+            s3_key: S3 object key
+            content_type: Content type the client must send
+            expires_in: URL expiration time in seconds
+            
+        Returns:
+            str: Presigned URL or None if failed
+        """
+        try:
+            params = {'Bucket': self.bucket_name, 'Key': s3_key}
+            if content_type:
+                params['ContentType'] = content_type
+            url = self.s3_client.generate_presigned_url('put_object', Params=params, ExpiresIn=expires_in)
+            logger.info(f"Generated presigned upload URL for s3://{self.bucket_name}/{s3_key}")
+            return url
+        except (ClientError, NoCredentialsError) as e:
+            logger.error(f"Failed to generate presigned upload URL for {s3_key}: {e}")
+            return None
+    
+    def get_upload_post(self, s3_key: str, max_size: int, content_type: Optional[str] = None,
+                        expires_in: int = 3600) -> Optional[Dict[str, Any]]:
+        """
+        Generate a presigned POST (browser form upload) limited to max_size bytes.
+        
+        Args:
+            s3_key: S3 object key
+            max_size: Largest accepted upload in bytes
+            content_type: Content type the client must send
+            expires_in: Policy expiration time in seconds
+            
+        Returns:
+            Dict with 'url' and form 'fields', or None if failed
+        """
+        try:
+            fields = {}
+            conditions: List[Any] = [['content-length-range', 0, max_size]]
+            if content_type:
+                fields['Content-Type'] = content_type
+                conditions.append({'Content-Type': content_type})
+            post = self.s3_client.generate_presigned_post(
+                self.bucket_name, s3_key, Fields=fields, Conditions=conditions, ExpiresIn=expires_in
+            )
+            logger.info(f"Generated presigned POST for s3://{self.bucket_name}/{s3_key}")
+            return post
+        except (ClientError, NoCredentialsError) as e:
+            logger.error(f"Failed to generate presigned POST for {s3_key}: {e}")
+            return None
+    
+    def get_upload_part_urls(self, s3_key: str, upload_id: str, part_count: int,
+                             expires_in: int = 3600) -> List[str]:
+        """
+        Generate presigned URLs for every part of a multipart upload.
+        
+        Args:
+            s3_key: S3 object key
+            upload_id: Upload ID from create_multipart_upload
+            part_count: Number of parts (part numbers 1..part_count)
+            expires_in: URL expiration time in seconds
+            
+        Returns:
+            List of presigned UploadPart URLs, index 0 being part 1
+        """
+        return [
+            self.s3_client.generate_presigned_url(
+                'upload_part',
+                Params={
+                    'Bucket': self.bucket_name,
+                    'Key': s3_key,
+                    'UploadId': upload_id,
+                    'PartNumber': part_number
+                },
+                ExpiresIn=expires_in
+            )
+            for part_number in range(1, part_count + 1)
+        ]
+    
+    def head_object(self, s3_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get object metadata without downloading it.
+        
+        Args:
+            s3_key: S3 object key
+            
+        Returns:
+            Dict containing the HeadObject response or None if missing/failed
+        """
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+                logger.error(f"Failed to get object metadata {s3_key}: {e}")
+            return None
+    
+    def copy_object(self, source_key: str, dest_key: str, part_size: int = COPY_PART_SIZE,
+                    max_workers: int = COPY_CONCURRENCY) -> bool:
         """
         Copy an object within the same bucket.
         
+        Objects larger than COPY_MULTIPART_THRESHOLD are copied server-side
+        as a multipart upload whose parts are copied in parallel.
+        
         Args:
             source_key: Source S3 object key
             dest_key: Destination S3 object key
+            part_size: Bytes per part for multipart copies
+            max_workers: Parts copied at once for multipart copies
             
         Returns:
             bool: True if successful, False otherwise
         """
         try:
-            copy_source = {'Bucket': self.bucket_name, 'Key': source_key}
-            self.s3_client.copy_object(CopySource=copy_source, Bucket=self.bucket_name, Key=dest_key)
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=source_key)
+            if head['ContentLength'] > COPY_MULTIPART_THRESHOLD:
+                self._multipart_copy(source_key, dest_key, head, part_size, max_workers)
+            else:
+                copy_source = {'Bucket': self.bucket_name, 'Key': source_key}
+                self.s3_client.copy_object(CopySource=copy_source, Bucket=self.bucket_name, Key=dest_key)
             logger.info(f"Object copied successfully: {source_key} -> {dest_key}")
             return True
         except (ClientError, NoCredentialsError) as e:
             logger.error(f"Failed to copy object {source_key} to {dest_key}: {e}")
             return False
     
+    def _multipart_copy(self, source_key: str, dest_key: str, head: Dict[str, Any],
+                        part_size: int, max_workers: int) -> None:
+        """Copy an object with parallel UploadPartCopy calls, aborting on failure"""
+        size = head['ContentLength']
+        part_size = copy_part_size(size, part_size)
+        ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+        
+        upload_id = self.create_multipart_upload(dest_key, head.get('ContentType'), head.get('Metadata'))
+        copy_source = {'Bucket': self.bucket_name, 'Key': source_key}
+        
+        def copy_part(part_number: int, first: int, last: int) -> Dict[str, Any]:
+            response = self.s3_client.upload_part_copy(
+                Bucket=self.bucket_name,
+                Key=dest_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                CopySource=copy_source,
+                CopySourceRange=f"bytes={first}-{last}",
+                CopySourceIfMatch=head['ETag']
+            )
+            return {'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']}
+        
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-copy") as pool:
+                parts = list(pool.map(lambda args: copy_part(*args),
+                                      [(i + 1, first, last) for i, (first, last) in enumerate(ranges)]))
+            self.complete_multipart_upload(dest_key, upload_id, parts)
+        except BaseException:
+            self.abort_multipart_upload(dest_key, upload_id)
+            raise
+        logger.info(f"Multipart copy finished: {source_key} -> {dest_key} ({len(parts)} parts, {size} bytes)")
+    
+    def copy_prefix(self, source_prefix: str, dest_prefix: str, max_workers: int = 8) -> Dict[str, Any]:
+        """
+        Copy every object under one prefix to another, several objects at a time.
+        
+        The prefixes must not contain each other, so the listing of the
+        source never sees keys written by the copy itself. Copies are
+        submitted while the listing runs, with at most 2 * max_workers
+        pending at once.
+        
+        Args:
+            source_prefix: Prefix to copy from (e.g. "data/temp/")
+            dest_prefix: Prefix to copy to (e.g. "data/output/")
+            max_workers: Objects copied at once
+            
+        Returns:
+            Dict with 'copied' (list of source keys) and 'errors' (list of source keys)
+            
+        Raises:
+            ValueError: If a prefix is empty or one prefix contains the other
+        """
+        if not source_prefix or not dest_prefix:
+            raise ValueError("source_prefix and dest_prefix must be non-empty")
+        if dest_prefix.startswith(source_prefix) or source_prefix.startswith(dest_prefix):
+            raise ValueError("source_prefix and dest_prefix must not contain each other")
+        
+        def copy_one(source_key: str):
+            dest_key = dest_prefix + source_key[len(source_prefix):]
+            return source_key, self.copy_object(source_key, dest_key)
+        
+        copied: List[str] = []
+        errors: List[str] = []
+        
+        def collect(futures):
+            for future in futures:
+                source_key, ok = future.result()
+                (copied if ok else errors).append(source_key)
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-copy-prefix") as pool:
+            pending = set()
+            for obj in self.iter_objects(prefix=source_prefix):
+                pending.add(pool.submit(copy_one, obj['Key']))
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(wait(pending).done)
+        
+        logger.info(f"Copied {len(copied)} objects {source_prefix} -> {dest_prefix} ({len(errors)} errors)")
+        return {'copied': copied, 'errors': errors}
+    
+    def move_prefix(self, source_prefix: str, dest_prefix: str, max_workers: int = 8) -> Dict[str, Any]:
+        """
+        Move every object under one prefix to another (copy, then batch-delete the sources).
+        
+        Sources that failed to copy are left in place.
+        
+        Args:
+            source_prefix: Prefix to move from
+            dest_prefix: Prefix to move to
+            max_workers: Objects copied at once
+            
+        Returns:
+            Dict with 'moved' (count), 'copy_errors' and 'delete_errors'
+        """
+        copy_result = self.copy_prefix(source_prefix, dest_prefix, max_workers)
+        delete_result = {'deleted': 0, 'errors': []}
+        if copy_result['copied']:
+            delete_result = self.delete_objects(keys=copy_result['copied'], max_workers=max_workers)
+        return {
+            'moved': delete_result['deleted'],
+            'copy_errors': copy_result['errors'],
+            'delete_errors': delete_result['errors']
+        }
+    
+    def iter_inventory(self, prefix: str = "", max_workers: int = 16,
+                       target_partitions: int = 64) -> Iterator[Dict[str, Any]]:
+        """
+        Count objects and bytes under a prefix, listing partitions of the keyspace in parallel.
+        
+        The keyspace is first split along "/" (CommonPrefixes, breadth first,
+        until about target_partitions prefixes are found); a prefix with more
+        direct children than one delimiter page holds is split on the next
+        key character instead, using only characters that actually occur, so
+        crowded ranges keep being split and partitions stay comparable in
+        size. Partitions are then listed concurrently and their statistics
+        merged as each one finishes, so a caller sees totals grow while a
+        large bucket is still being scanned.
+        
+        Args:
+            prefix: Key prefix to inventory ("" for the whole bucket)
+            max_workers: Partitions listed at once
+            target_partitions: Roughly how many partitions to split the keyspace into
+            
+        Yields:
+            Dict snapshots with overall 'totals', per top-level 'groups' below
+            the prefix, partition progress and 'done' on the final one
+            
+        Raises:
+            ClientError: If a listing fails
+        """
+        started = time.monotonic()
+        partitions, totals, groups = self._plan_inventory(prefix, target_partitions)
+        done = 0
+        
+        def snapshot(finished: bool) -> Dict[str, Any]:
+            return {
+                'bucket': self.bucket_name,
+                'prefix': prefix,
+                'partitions_done': done,
+                'partitions_total': len(partitions),
+                'elapsed_seconds': round(time.monotonic() - started, 3),
+                'totals': totals.to_dict(),
+                'groups': {name: stats.to_dict() for name, stats in sorted(groups.items())},
+                'done': finished,
+            }
+        
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-inventory")
+        try:
+            futures = [pool.submit(self._scan_partition, prefix, partition) for partition in partitions]
+            for future in as_completed(futures):
+                for name, stats in future.result().items():
+                    totals.merge(stats)
+                    groups.setdefault(name, InventoryStats()).merge(stats)
+                done += 1
+                yield snapshot(False)
+        finally:
+            # Stop scheduling partitions if the consumer went away or a listing failed
+            pool.shutdown(wait=True, cancel_futures=True)
+        
+        logger.info(
+            f"Inventory of s3://{self.bucket_name}/{prefix}: {totals.count} objects, {totals.bytes} bytes "
+            f"in {len(partitions)} partitions"
+        )
+        yield snapshot(True)
+    
+    def inventory(self, prefix: str = "", max_workers: int = 16, target_partitions: int = 64) -> Dict[str, Any]:
+        """
+        Run iter_inventory to completion.
+        
+        Returns:
+            The final inventory snapshot
+        """
+        result: Dict[str, Any] = {}
+        for result in self.iter_inventory(prefix, max_workers, target_partitions):
+            pass
+        return result
+    
+    def _plan_inventory(self, prefix: str, target_partitions: int):
+        """
+        Split a prefix into disjoint partition prefixes.
+        
+        Objects found directly on the levels walked while planning are counted
+        here, so partitions never overlap them.
+        
+        Returns:
+            Tuple of (partitions, totals, per-group stats) for the objects already counted
+        """
+        totals = InventoryStats()
+        groups: Dict[str, InventoryStats] = {}
+        partitions: List[str] = []
+        pending = deque([prefix])
+        
+        def count(obj: Dict[str, Any]) -> None:
+            totals.add(obj)
+            groups.setdefault(self._inventory_group(prefix, obj['Key']), InventoryStats()).add(obj)
+        
+        while pending:
+            current = pending.popleft()
+            if current != prefix and len(partitions) + len(pending) + 1 >= target_partitions:
+                partitions.append(current)
+                continue
+            
+            response = self.s3_client.list_objects_v2(
+                Bucket=self.bucket_name, Prefix=current, Delimiter='/', MaxKeys=1000
+            )
+            if response.get('IsTruncated'):
+                # Too many direct children to walk page by page: split on the next key character
+                for obj in response.get('Contents', []):
+                    if obj['Key'] == current:
+                        count(obj)
+                pending.extend(self._next_char_prefixes(current, response))
+                continue
+            
+            for obj in response.get('Contents', []):
+                count(obj)
+            pending.extend(common['Prefix'] for common in response.get('CommonPrefixes', []))
+        
+        return partitions, totals, groups
+    
+    def _next_char_prefixes(self, current: str, first_page: Dict[str, Any]) -> List[str]:
+        """
+        Get current + c for every character c that follows current in some key.
+        
+        Characters on the first delimiter page are taken from it; the rest
+        are found by skipping past each character found so far with a
+        one-key listing, so this costs one request per further character.
+        """
+        names = [obj['Key'] for obj in first_page.get('Contents', [])]
+        names += [common['Prefix'] for common in first_page.get('CommonPrefixes', [])]
+        chars = sorted({name[len(current)] for name in names if len(name) > len(current)})
+        start_after = current + chars[-1] + KEY_MAX_CHAR
+        while True:
+            response = self.s3_client.list_objects_v2(
+                Bucket=self.bucket_name, Prefix=current, StartAfter=start_after, MaxKeys=1
+            )
+            contents = response.get('Contents', [])
+            if not contents:
+                return [current + char for char in chars]
+            key = contents[0]['Key']
+            char = key[len(current)]
+            if char == chars[-1]:
+                # The key itself contains KEY_MAX_CHAR; step over it
+                start_after = key
+                continue
+            chars.append(char)
+            start_after = current + char + KEY_MAX_CHAR
+    
+    def _scan_partition(self, root: str, prefix: str) -> Dict[str, InventoryStats]:
+        """List every key under one partition prefix"""
+        groups: Dict[str, InventoryStats] = {}
+        token = None
+        while True:
+            page = self.list_objects_page(prefix, token, 1000)
+            for obj in page['objects']:
+                groups.setdefault(self._inventory_group(root, obj['Key']), InventoryStats()).add(obj)
+            token = page['next_token']
+            if not token:
+                return groups
+    
+    @staticmethod
+    def _inventory_group(root: str, s3_key: str) -> str:
+        """First path component below the inventory root ("" for objects directly under it)"""
+        remainder = s3_key[len(root):]
+        return remainder.split('/', 1)[0] if '/' in remainder else ""
+    
     def get_bucket_info(self) -> Dict[str, Any]:
         """
         Get bucket information.
@@ -255,24 +1374,94 @@ class S3Manager:
 
 
 # Convenience functions for common operations
-def upload_data_file(file_path: str, data_type: str = "input") -> Optional[str]:
+def copy_part_size(size: int, part_size: int) -> int:
+    """
+    Part size for a multipart copy that stays within the UploadPartCopy limits.
+    
+    Args:
+        size: Object size in bytes
+        part_size: Requested bytes per part
+        
+    Returns:
+        int: part_size clamped to [MIN_COPY_PART_SIZE, MAX_COPY_PART_SIZE] and,
+        when size would need more than MAX_COPY_PARTS parts, raised to the
+        next whole MiB that fits
+    """
+    mib = 1024 * 1024
+    needed = -(-size // MAX_COPY_PARTS)
+    needed = -(-needed // mib) * mib
+    return min(max(part_size, needed, MIN_COPY_PART_SIZE), MAX_COPY_PART_SIZE)
+
+
+def key_shard(name: str, shards: int) -> str:
+    """
+    Hashed shard sub-prefix for a key name.
+    
+    Args:
+        name: Last key segment (e.g. "20240101_120000_file.csv")
+        shards: Number of shards
+        
+    Returns:
+        str: Fixed-width hex shard id in [0, shards)
+    """
+    digest = hashlib.md5(name.encode()).digest()
+    width = len(f"{shards - 1:x}")
+    return f"{int.from_bytes(digest[:8], 'big') % shards:0{width}x}"
+
+
+def build_data_key(filename: str, data_type: str = "input", shards: Optional[int] = None) -> str:
+    """
+    Build the S3 key for a data file of the given type.
+    
+    With more than one shard the key gets a hashed sub-prefix,
+    data/{data_type}/{shard}/{timestamp}_{filename}, so bursts of writes
+    are spread over several S3 prefixes instead of one sequential range,
+    each with its own request-rate limit.
+    
+    Args:
+        filename: Original file name
+        data_type: Type of data (input, output, temp)
+        shards: Number of hashed sub-prefixes (defaults to S3_KEY_SHARDS)
+        
+    Returns:
+        str: S3 key under data/{data_type}/
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = f"{timestamp}_{os.path.basename(filename)}"
+    shards = KEY_SHARDS if shards is None else shards
+    if shards > 1:
+        return f"data/{data_type}/{key_shard(name, shards)}/{name}"
+    return f"data/{data_type}/{name}"
+
+
+def upload_data_file(file_path: str, data_type: str = "input", dedup: bool = False,
+                     codec: Optional[str] = None) -> Optional[str]:
     """
     Upload a data file to the appropriate S3 directory.
     
     Args:
         file_path: Local file path
         data_type: Type of data (input, output, temp)
+        dedup: Store under a content-addressed key and skip the upload if that content already exists
+        codec: Compress the file on the way up ("gzip" or "zstd"); ignored with dedup
         
     Returns:
-        str: S3 key of uploaded file or None if failed
+        str: S3 key of uploaded (or already stored) file or None if failed
     """
     try:
         s3_manager = S3Manager()
-        filename = os.path.basename(file_path)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        s3_key = f"data/{data_type}/{timestamp}_{filename}"
+        if dedup:
+            from .s3_dedup import upload_file_dedup
+            result = upload_file_dedup(s3_manager, file_path, data_type)
+            return result['key'] if result else None
+        s3_key = build_data_key(file_path, data_type)
         
-        if s3_manager.upload_file(file_path, s3_key):
+        if codec:
+            from .s3_codec import upload_file_compressed
+            uploaded = upload_file_compressed(s3_manager, file_path, s3_key, codec)
+        else:
+            uploaded = s3_manager.upload_file(file_path, s3_key)
+        if uploaded:
             return s3_key
         return None
     except Exception as e:
@@ -280,20 +1469,25 @@ def upload_data_file(file_path: str, data_type: str = "input") -> Optional[str]:
         return None
 
 
-def download_data_file(s3_key: str, local_path: str) -> bool:
+def download_data_file(s3_key: str, local_path: str, use_cache: bool = False) -> bool:
     """
-    Download a data file from S3.
+    Download a data file from S3, decompressing it if it was stored compressed.
     
     Args:
         s3_key: S3 object key
         local_path: Local file path
+        use_cache: Serve the file through the local disk cache (revalidated by ETag)
         
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        s3_manager = S3Manager()
-        return s3_manager.download_file(s3_key, local_path)
+        if use_cache:
+            from .s3_disk_cache import get_disk_cache
+            get_disk_cache().copy_to(s3_key, local_path)
+            return True
+        from .s3_codec import download_file_decoded
+        return download_file_decoded(S3Manager(), s3_key, local_path)
     except Exception as e:
         logger.error(f"Failed to download data file {s3_key}: {e}")
         return False
@@ -303,6 +1497,9 @@ def list_data_files(data_type: str = "input") -> List[Dict[str, Any]]:
     """
     List data files of a specific type.
     
+    With S3_KEY_SHARDS set, the shard sub-prefixes are listed in parallel
+    and merged; files stored before sharding was enabled are included.
+    
     Args:
         data_type: Type of data (input, output, temp)
         
@@ -312,6 +1509,8 @@ def list_data_files(data_type: str = "input") -> List[Dict[str, Any]]:
     try:
         s3_manager = S3Manager()
         prefix = f"data/{data_type}/"
+        if KEY_SHARDS > 1:
+            return s3_manager.list_objects_sharded(prefix)
         return s3_manager.list_objects(prefix=prefix)
     except Exception as e:
         logger.error(f"Failed to list data files for type {data_type}: {e}")
@@ -0,0 +1,158 @@
+"""
+Keeps the s3_objects manifest table in step with the bucket.
+
+Our own upload, copy and delete paths record their changes right away.
+A periodic reconciliation pass lists the bucket and fixes whatever those
+paths could not see (objects written by other tools, lifecycle expiry,
+a failed manifest write): every listed object is upserted, then rows the
+pass did not touch are removed.
+
+The manifest is opt-in (S3_MANIFEST_ENABLED). Until the first full pass
+over data/ has finished in this process, readers should treat it as
+incomplete and list the bucket instead.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..repositories.s3_object_repository import S3ObjectRepository
+from .async_s3_manager import AsyncS3Manager
+from .database import get_db_session
+from .logging_manager import LoggingManager
+
+logger = LoggingManager.get_logger("s3_manifest")
+
+MANIFEST_ENABLED = os.getenv("S3_MANIFEST_ENABLED", "false").lower() == "true"
+# Seconds between reconciliation passes (0 disables the background task)
+RECONCILE_INTERVAL = float(os.getenv("S3_MANIFEST_RECONCILE_SECONDS", "600"))
+RECONCILE_BATCH_SIZE = 1000
+
+# Buckets whose data/ prefix has been fully reconciled by this process
+_reconciled_buckets: Set[str] = set()
+
+
+def manifest_ready(bucket: str) -> bool:
+    """Whether the manifest is enabled and has been reconciled for a bucket's data/ prefix"""
+    return MANIFEST_ENABLED and bucket in _reconciled_buckets
+
+
+async def reconcile_manifest(s3: AsyncS3Manager, prefix: str = "data/",
+                             batch_size: int = RECONCILE_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Bring the manifest rows under a prefix in line with a fresh S3 listing.
+
+    Each listing page is upserted and committed on its own, so the pass
+    never holds a long transaction. Rows are only swept once the whole
+    prefix has been listed; a failed listing leaves them untouched.
+
+    Args:
+        s3: AsyncS3Manager for the bucket to reconcile
+        prefix: Key prefix to reconcile
+        batch_size: Objects listed and upserted per round trip
+
+    Returns:
+        Dict with 'upserted' and 'removed' row counts
+    """
+    async with get_db_session() as session:
+        manifest = S3ObjectRepository(session, s3.bucket_name)
+        started = await manifest.db_now()
+        await manifest.commit()
+
+        upserted = 0
+        batch: List[Dict[str, Any]] = []
+        async for obj in s3.iter_objects(prefix, page_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                upserted += await manifest.upsert_many(batch)
+                await manifest.commit()
+                batch = []
+        upserted += await manifest.upsert_many(batch)
+
+        removed = await manifest.delete_stale(prefix, started)
+        await manifest.commit()
+
+    if "data/".startswith(prefix):
+        _reconciled_buckets.add(s3.bucket_name)
+    logger.info(f"Manifest reconciled for s3://{s3.bucket_name}/{prefix}: {upserted} upserted, {removed} removed")
+    return {"upserted": upserted, "removed": removed}
+
+
+async def run_reconciler(s3: AsyncS3Manager, interval: float = RECONCILE_INTERVAL, prefix: str = "data/") -> None:
+    """Reconcile the manifest now and then every interval seconds until cancelled"""
+    while True:
+        try:
+            await reconcile_manifest(s3, prefix)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Manifest reconciliation failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def record_objects(s3: AsyncS3Manager, objects: Iterable[Dict[str, Any]]) -> None:
+    """
+    Record objects we just wrote (HEAD or listing entries with their Key).
+
+    Manifest failures are logged rather than raised: the S3 write already
+    succeeded and the next reconciliation pass will pick it up.
+    """
+    if not MANIFEST_ENABLED:
+        return
+    try:
+        async with get_db_session() as session:
+            manifest = S3ObjectRepository(session, s3.bucket_name)
+            await manifest.upsert_many(objects)
+            await manifest.commit()
+    except Exception as e:
+        logger.error(f"Could not record objects in manifest: {e}")
+
+
+async def record_upload(s3: AsyncS3Manager, s3_key: str, head: Optional[Dict[str, Any]] = None) -> None:
+    """Record a single uploaded object, reading its metadata with HEAD unless given"""
+    if not MANIFEST_ENABLED:
+        return
+    head = head or await s3.head_object(s3_key)
+    if head is None:
+        return
+    await record_objects(s3, [{
+        "Key": s3_key,
+        "Size": head["ContentLength"],
+        "ETag": head["ETag"],
+        "LastModified": head["LastModified"],
+    }])
+
+
+async def forget_objects(s3: AsyncS3Manager, keys: Optional[List[str]] = None, prefix: Optional[str] = None,
+                         keep: Iterable[str] = ()) -> None:
+    """
+    Drop manifest rows for deleted objects, by key list or by prefix.
+
+    Args:
+        s3: AsyncS3Manager the objects were deleted from
+        keys: Deleted keys
+        prefix: Deleted prefix
+        keep: Keys under prefix whose delete failed
+    """
+    if not MANIFEST_ENABLED:
+        return
+    try:
+        async with get_db_session() as session:
+            manifest = S3ObjectRepository(session, s3.bucket_name)
+            if keys is not None:
+                await manifest.delete_keys(keys)
+            if prefix is not None:
+                await manifest.delete_prefix(prefix, keep)
+            await manifest.commit()
+    except Exception as e:
+        logger.error(f"Could not remove objects from manifest: {e}")
+
+
+async def refresh_prefix(s3: AsyncS3Manager, prefix: str) -> None:
+    """Reconcile one prefix after a bulk change (copy/move), logging instead of raising"""
+    if not MANIFEST_ENABLED:
+        return
+    try:
+        await reconcile_manifest(s3, prefix)
+    except Exception as e:
+        logger.error(f"Could not refresh manifest for {prefix}: {e}")
@@ -0,0 +1,198 @@
+"""
+Streaming multipart upload into S3 from an async byte stream.
+"""
+
+import asyncio
+import os
+from typing import Any, AsyncIterable, Dict, List, Optional, Set
+
+from .async_s3_manager import run_in_s3_executor
+from .logging_manager import LoggingManager
+from .s3_manager import S3Manager
+
+logger = LoggingManager.get_logger("s3_multipart")
+
+# S3 rejects non-final parts smaller than 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = int(os.getenv("S3_UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+DEFAULT_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+
+
+class MultipartUploader:
+    """
+    Push bytes into an S3 object as they arrive.
+
+    Data is cut into part_size parts that are uploaded in parallel, with
+    at most `concurrency` parts in flight. write() waits while that limit
+    is reached, so memory is bounded to roughly (concurrency + 1) parts and
+    a slow S3 slows the producer down. Payloads smaller than one part are
+    stored with a single PutObject instead.
+    """
+
+    def __init__(
+        self,
+        s3_manager: S3Manager,
+        s3_key: str,
+        content_type: Optional[str] = None,
+        part_size: int = DEFAULT_PART_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        metadata: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Initialize the uploader.
+
+        Args:
+            s3_manager: S3Manager for the target bucket
+            s3_key: Destination S3 object key
+            content_type: Content type of the object
+            part_size: Bytes per part (raised to the 5 MiB S3 minimum)
+            concurrency: Maximum parts uploaded at once
+            metadata: User metadata of the object
+        """
+        self.s3 = s3_manager
+        self.s3_key = s3_key
+        self.content_type = content_type
+        self.metadata = metadata
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.concurrency = max(concurrency, 1)
+
+        self.upload_id: Optional[str] = None
+        self.bytes_received = 0
+        self._buffer = bytearray()
+        self._next_part = 1
+        self._parts: List[Dict[str, Any]] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(self.concurrency)
+
+    async def write(self, data: bytes) -> None:
+        """
+        Append data, uploading every full part that becomes available.
+
+        Args:
+            data: Next chunk of the object
+        """
+        self._raise_if_failed()
+        self._buffer.extend(data)
+        self.bytes_received += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            await self._start_part(part)
+
+    async def complete(self) -> Dict[str, Any]:
+        """
+        Flush the remaining data and finish the object.
+
+        Returns:
+            Dict with the S3 key, ETag, size and number of parts
+        """
+        if self.upload_id is None:
+            response = await run_in_s3_executor(
+                self.s3.put_object, self.s3_key, bytes(self._buffer), self.content_type, self.metadata
+            )
+            self._buffer.clear()
+            return {"key": self.s3_key, "etag": response["ETag"], "size": self.bytes_received, "parts": 1}
+
+        if self._buffer:
+            await self._start_part(bytes(self._buffer))
+            self._buffer.clear()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+        response = await run_in_s3_executor(
+            self.s3.complete_multipart_upload, self.s3_key, self.upload_id, self._parts
+        )
+        return {
+            "key": self.s3_key,
+            "etag": response["ETag"],
+            "size": self.bytes_received,
+            "parts": len(self._parts),
+        }
+
+    @property
+    def started(self) -> bool:
+        """Whether parts have been sent (the key can no longer change)"""
+        return self.upload_id is not None
+
+    async def abort(self) -> None:
+        """Cancel in-flight parts and discard the multipart upload."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._buffer.clear()
+        if self.upload_id is not None:
+            await run_in_s3_executor(self.s3.abort_multipart_upload, self.s3_key, self.upload_id)
+
+    async def _start_part(self, data: bytes) -> None:
+        """Wait for a free slot, then upload a part in the background."""
+        if self.upload_id is None:
+            self.upload_id = await run_in_s3_executor(
+                self.s3.create_multipart_upload, self.s3_key, self.content_type, self.metadata
+            )
+
+        await self._slots.acquire()
+        self._raise_if_failed()
+        part_number = self._next_part
+        self._next_part += 1
+        task = asyncio.create_task(self._upload_part(part_number, data))
+        self._tasks.add(task)
+        task.add_done_callback(self._part_done)
+
+    async def _upload_part(self, part_number: int, data: bytes) -> None:
+        try:
+            etag = await run_in_s3_executor(self.s3.upload_part, self.s3_key, self.upload_id, part_number, data)
+            self._parts.append({"PartNumber": part_number, "ETag": etag})
+        finally:
+            self._slots.release()
+
+    def _part_done(self, task: asyncio.Task) -> None:
+        # Keep failed tasks around so _raise_if_failed can report them
+        if task.cancelled() or task.exception() is None:
+            self._tasks.discard(task)
+
+    def _raise_if_failed(self) -> None:
+        for task in self._tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+
+async def upload_stream(
+    s3_manager: S3Manager,
+    chunks: AsyncIterable[bytes],
+    s3_key: str,
+    content_type: Optional[str] = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    metadata: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Upload an async byte stream to S3, aborting the upload on any failure.
+
+    Args:
+        s3_manager: S3Manager for the target bucket
+        chunks: Async iterable of bytes (e.g. Request.stream())
+        s3_key: Destination S3 object key
+        content_type: Content type of the object
+        part_size: Bytes per part
+        concurrency: Maximum parts uploaded at once
+        metadata: User metadata of the object
+
+    Returns:
+        Dict with the S3 key, ETag, size and number of parts
+    """
+    uploader = MultipartUploader(s3_manager, s3_key, content_type, part_size, concurrency, metadata)
+    try:
+        async for chunk in chunks:
+            if chunk:
+                await uploader.write(chunk)
+        result = await uploader.complete()
+    except BaseException:
+        logger.error(f"Streaming upload failed, aborting: s3://{s3_manager.bucket_name}/{s3_key}")
+        await uploader.abort()
+        raise
+
+    logger.info(
+        f"Streaming upload finished: s3://{s3_manager.bucket_name}/{s3_key} "
+        f"({result['size']} bytes, {result['parts']} parts)"
+    )
+    return result
@@ -0,0 +1,395 @@
+"""
+Streaming line-oriented transform pipeline from data/input to data/output.
+
+An input object is read chunk by chunk (decompressed if it was stored
+with a codec), cut into lines and passed through a chain of registered
+stages; the result is written back as it is produced with a multipart
+upload. Only a bounded number of chunks is held at any time, so objects
+far larger than memory can be processed.
+
+Stages are plain functions taking and returning a list of lines (bytes,
+without line breaks). Register them with @register_stage; stages marked
+cpu_bound make the whole chain run on a process pool, several chunks at
+once, with output still written in input order. Process pool workers are
+spawned, so such stages must be defined at module level in an importable
+module.
+"""
+
+import asyncio
+import csv
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .async_s3_manager import iter_object_body, run_in_s3_executor
+from .logging_manager import LoggingManager
+from .s3_codec import decompress_stream, object_codec
+from .s3_manager import S3Manager
+from .s3_multipart import DEFAULT_CONCURRENCY, DEFAULT_PART_SIZE, MultipartUploader
+
+logger = LoggingManager.get_logger("s3_pipeline")
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("PIPELINE_CHUNK_SIZE", str(4 * 1024 * 1024)))
+DEFAULT_WORKERS = int(os.getenv("PIPELINE_WORKERS", str(os.cpu_count() or 1)))
+# Finished jobs kept for GET /pipeline/jobs
+MAX_FINISHED_JOBS = 100
+
+StageFn = Callable[..., List[bytes]]
+
+
+class Stage:
+    """A registered transform stage."""
+
+    def __init__(self, name: str, fn: StageFn, cpu_bound: bool):
+        self.name = name
+        self.fn = fn
+        self.cpu_bound = cpu_bound
+        self.description = (fn.__doc__ or "").strip().splitlines()[0] if fn.__doc__ else ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "cpu_bound": self.cpu_bound, "description": self.description}
+
+
+STAGES: Dict[str, Stage] = {}
+
+
+def register_stage(name: str, cpu_bound: bool = False) -> Callable[[StageFn], StageFn]:
+    """
+    Register a function as a pipeline stage.
+
+    The function is called as fn(lines, **options) and returns the lines
+    to pass on; it may drop, change or add lines.
+
+    Args:
+        name: Name jobs refer to the stage by
+        cpu_bound: Run chains using this stage on the process pool
+    """
+    def decorator(fn: StageFn) -> StageFn:
+        STAGES[name] = Stage(name, fn, cpu_bound)
+        return fn
+    return decorator
+
+
+@register_stage("strip")
+def strip_lines(lines: List[bytes]) -> List[bytes]:
+    """Remove leading and trailing whitespace from every line"""
+    return [line.strip() for line in lines]
+
+
+@register_stage("drop_blank")
+def drop_blank_lines(lines: List[bytes]) -> List[bytes]:
+    """Drop lines that are empty or whitespace only"""
+    return [line for line in lines if line.strip()]
+
+
+@register_stage("grep", cpu_bound=True)
+def grep_lines(lines: List[bytes], pattern: str, invert: bool = False) -> List[bytes]:
+    """Keep lines matching a regular expression (or not matching it, with invert)"""
+    regex = re.compile(pattern.encode())
+    return [line for line in lines if (regex.search(line) is None) == invert]
+
+
+@register_stage("csv_columns", cpu_bound=True)
+def select_csv_columns(lines: List[bytes], columns: List[int], delimiter: str = ",") -> List[bytes]:
+    """Keep only the given CSV columns (zero-based), in the given order"""
+    # Rows are parsed line by line: quoted fields must not contain line breaks
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=delimiter, lineterminator="\n")
+    for row in csv.reader((line.decode("utf-8") for line in lines), delimiter=delimiter):
+        writer.writerow([row[i] if i < len(row) else "" for i in columns])
+    return [line.encode("utf-8") for line in out.getvalue().splitlines()]
+
+
+def resolve_stages(specs: List[Dict[str, Any]]) -> List[Tuple[StageFn, Dict[str, Any]]]:
+    """
+    Turn stage specs ({"name": ..., "options": {...}}) into callables.
+
+    Raises:
+        ValueError: If a stage is not registered
+    """
+    chain = []
+    for spec in specs:
+        stage = STAGES.get(spec["name"])
+        if stage is None:
+            raise ValueError(f"Unknown pipeline stage {spec['name']!r}, expected one of {sorted(STAGES)}")
+        chain.append((stage.fn, dict(spec.get("options") or {})))
+    return chain
+
+
+def run_stages(chain: List[Tuple[StageFn, Dict[str, Any]]], lines: List[bytes]) -> List[bytes]:
+    """Apply a chain of stages to one chunk of lines"""
+    for fn, options in chain:
+        lines = fn(lines, **options)
+    return lines
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Get the process pool that runs CPU-bound stages."""
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                # Spawned rather than forked: the server process runs thread pools
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=DEFAULT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Pipeline process pool started with {DEFAULT_WORKERS} workers")
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop the pipeline process pool."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=True, cancel_futures=True)
+            _process_pool = None
+            logger.info("Pipeline process pool stopped")
+
+
+class PipelineJob:
+    """Progress and throughput of one pipeline run."""
+
+    def __init__(self, input_key: str, output_key: str, stages: List[Dict[str, Any]]):
+        self.id = uuid.uuid4().hex
+        self.input_key = input_key
+        self.output_key = output_key
+        self.stages = stages
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.chunks = 0
+        self.created_at = datetime.now(timezone.utc)
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed
+        return {
+            "id": self.id,
+            "status": self.status,
+            "input_key": self.input_key,
+            "output_key": self.output_key,
+            "stages": self.stages,
+            "error": self.error,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "chunks": self.chunks,
+            "created_at": self.created_at.isoformat(),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_in / elapsed, 1) if elapsed else 0.0,
+            "bytes_per_second": round(self.bytes_in / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+async def _iter_line_chunks(response: Dict[str, Any], chunk_size: int,
+                           job: PipelineJob) -> AsyncIterator[List[bytes]]:
+    """Yield lists of complete lines from a GetObject response, roughly chunk_size bytes at a time."""
+    async def stored_chunks():
+        async for chunk in iter_object_body(response["Body"], chunk_size):
+            job.bytes_in += len(chunk)
+            yield chunk
+
+    codec = object_codec(response)
+    chunks = decompress_stream(stored_chunks(), codec) if codec else stored_chunks()
+    # Pieces of a line that has not ended yet; joined once its line break arrives
+    pending: List[bytes] = []
+    async for chunk in chunks:
+        if b"\n" not in chunk:
+            pending.append(chunk)
+            continue
+        lines = chunk.split(b"\n")
+        if pending:
+            pending.append(lines[0])
+            lines[0] = b"".join(pending)
+        pending = [lines.pop()]
+        yield lines
+    tail = b"".join(pending)
+    if tail:
+        yield [tail]
+
+
+async def run_pipeline(
+    s3_manager: S3Manager,
+    job: PipelineJob,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = DEFAULT_WORKERS,
+    part_size: int = DEFAULT_PART_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, Any]:
+    """
+    Stream job.input_key through job.stages into job.output_key.
+
+    Reading, transforming and uploading overlap: up to `workers` chunks are
+    transformed at once while earlier results are uploaded. The multipart
+    upload is aborted if anything fails.
+
+    Args:
+        s3_manager: S3Manager for the bucket
+        job: Job describing the run; its counters are updated as it goes
+        chunk_size: Bytes read from S3 per chunk
+        workers: Chunks transformed concurrently
+        part_size: Bytes per uploaded part
+        concurrency: Maximum parts uploaded at once
+
+    Returns:
+        Dict with the output key, ETag, size and number of parts
+
+    Raises:
+        ValueError: If a stage is not registered
+        ClientError: If the input cannot be read
+    """
+    chain = resolve_stages(job.stages)
+    cpu_bound = any(STAGES[spec["name"]].cpu_bound for spec in job.stages)
+    loop = asyncio.get_running_loop()
+    executor = get_process_pool() if cpu_bound else None
+
+    response = await run_in_s3_executor(s3_manager.open_object, job.input_key)
+    job.status = "running"
+    job.started = time.monotonic()
+    source = _iter_line_chunks(response, chunk_size, job)
+    uploader = MultipartUploader(
+        s3_manager, job.output_key, response.get("ContentType"), part_size, concurrency
+    )
+    in_flight: deque = deque()
+
+    async def write_oldest() -> None:
+        lines = await in_flight.popleft()
+        job.rows_out += len(lines)
+        job.chunks += 1
+        if lines:
+            data = b"\n".join(lines) + b"\n"
+            job.bytes_out += len(data)
+            await uploader.write(data)
+
+    try:
+        async for lines in source:
+            job.rows_in += len(lines)
+            in_flight.append(loop.run_in_executor(executor, run_stages, chain, lines))
+            if len(in_flight) >= max(workers, 1):
+                await write_oldest()
+        while in_flight:
+            await write_oldest()
+        result = await uploader.complete()
+    except BaseException:
+        logger.error(f"Pipeline job {job.id} failed, aborting upload of {job.output_key}")
+        for future in in_flight:
+            future.cancel()
+        await uploader.abort()
+        raise
+    finally:
+        await source.aclose()
+        job.finished = time.monotonic()
+
+    stats = job.to_dict()
+    logger.info(
+        f"Pipeline job {job.id} finished: {job.input_key} -> {job.output_key} "
+        f"({job.rows_in} rows in, {job.rows_out} rows out, "
+        f"{stats['rows_per_second']} rows/s, {stats['bytes_per_second']} bytes/s)"
+    )
+    return result
+
+
+_jobs: "OrderedDict[str, PipelineJob]" = OrderedDict()
+
+
+def start_job(
+    s3_manager: S3Manager,
+    input_key: str,
+    output_key: str,
+    stages: List[Dict[str, Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = DEFAULT_WORKERS,
+    on_success: Optional[Callable[[PipelineJob], Awaitable[None]]] = None,
+) -> PipelineJob:
+    """
+    Start a pipeline run in the background on the running event loop.
+
+    Args:
+        s3_manager: S3Manager for the bucket
+        input_key: Source object key
+        output_key: Destination object key
+        stages: Stage specs ({"name": ..., "options": {...}}), applied in order
+        chunk_size: Bytes read from S3 per chunk
+        workers: Chunks transformed concurrently
+        on_success: Awaited with the job after the output is stored
+
+    Returns:
+        PipelineJob to poll for progress
+
+    Raises:
+        ValueError: If a stage is not registered
+    """
+    resolve_stages(stages)
+    job = PipelineJob(input_key, output_key, stages)
+
+    async def run() -> None:
+        try:
+            await run_pipeline(s3_manager, job, chunk_size, workers)
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.exception(f"Pipeline job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            return
+        job.status = "succeeded"
+        if on_success is not None:
+            try:
+                await on_success(job)
+            except Exception as e:
+                logger.warning(f"Post-processing of pipeline job {job.id} failed: {e}")
+
+    job.task = asyncio.create_task(run())
+    _jobs[job.id] = job
+    _prune_jobs()
+    logger.info(f"Pipeline job {job.id} started: {input_key} -> {output_key}")
+    return job
+
+
+def get_job(job_id: str) -> Optional[PipelineJob]:
+    """Get a pipeline job by id"""
+    return _jobs.get(job_id)
+
+
+def list_jobs() -> List[PipelineJob]:
+    """Known pipeline jobs, newest first"""
+    return list(reversed(_jobs.values()))
+
+
+def cancel_jobs() -> None:
+    """Cancel every running pipeline job (on shutdown)"""
+    for job in _jobs.values():
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+
+
+def _prune_jobs() -> None:
+    finished = [job_id for job_id, job in _jobs.items() if job.task is not None and job.task.done()]
+    for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+        del _jobs[job_id]
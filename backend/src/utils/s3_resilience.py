@@ -0,0 +1,269 @@
+"""
+Keeps S3 latency bounded when S3 or the network degrades.
+
+Three layers work together:
+
+* Every registry client gets connect/read timeouts and botocore's
+  adaptive retry mode. Adaptive mode draws retries from a per-client
+  retry quota (the retry budget: once a burst of failures drains it, calls
+  fail on the first error instead of retrying) and slows the client down
+  when S3 throttles.
+* A circuit breaker per client watches every API call through botocore
+  events. After S3_BREAKER_FAILURE_THRESHOLD consecutive server errors,
+  throttles or connection failures it opens, and calls fail immediately
+  with S3UnavailableError for S3_BREAKER_RESET_SECONDS. A single trial call
+  is then let through; its outcome closes or re-opens the circuit.
+* AsyncS3Manager puts a deadline on each operation awaited from the event
+  loop (S3OperationTimeout), so a request never waits longer than that
+  even while the blocking call is still winding down on the S3 pool. A
+  timed-out operation counts as one breaker failure; whatever its calls
+  report once they finish is ignored.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .logging_manager import LoggingManager
+
+logger = LoggingManager.get_logger("s3_resilience")
+
+CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT", "20"))
+RETRY_MODE = os.getenv("S3_RETRY_MODE", "adaptive")
+# Attempts per call, including the first one
+MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "3"))
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("S3_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("S3_BREAKER_RESET_SECONDS", "30"))
+
+# Deadlines (seconds) for operations awaited through AsyncS3Manager; operations
+# not listed (transfers, bulk and prefix operations) are bounded only by the
+# client timeouts. Override with S3_OPERATION_TIMEOUTS="head_object=2,..." (0 disables).
+DEFAULT_OPERATION_TIMEOUTS = {
+    "head_object": 5.0,
+    "object_exists": 5.0,
+    "get_bucket_info": 5.0,
+    "list_objects_page": 10.0,
+    "open_object": 10.0,
+    "delete_object": 10.0,
+    "read_bytes": 15.0,
+    "select_object": 15.0,
+    "read_lines": 30.0,
+    "get_object": 30.0,
+    "get_upload_url": 5.0,
+    "get_upload_post": 5.0,
+    "get_upload_part_urls": 5.0,
+    "create_multipart_upload": 10.0,
+    "abort_multipart_upload": 10.0,
+    "complete_multipart_upload": 60.0,
+    "inventory": 300.0,
+}
+
+
+def _parse_operation_timeouts(value: str) -> Dict[str, float]:
+    timeouts = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, seconds = item.split("=", 1)
+            timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+OPERATION_TIMEOUTS = {
+    **DEFAULT_OPERATION_TIMEOUTS,
+    **_parse_operation_timeouts(os.getenv("S3_OPERATION_TIMEOUTS", "")),
+}
+
+
+def operation_timeout(operation: str) -> Optional[float]:
+    """Deadline in seconds for an AsyncS3Manager operation, or None for no deadline"""
+    timeout = OPERATION_TIMEOUTS.get(operation)
+    return timeout if timeout else None
+
+
+class OperationScope:
+    """Breaker bookkeeping for one operation running on an S3 pool thread."""
+
+    def __init__(self):
+        self.timed_out = False
+
+
+_scope = threading.local()
+
+
+def run_in_scope(scope: OperationScope, fn: Callable[..., Any], *args: Any) -> Any:
+    """Run fn with scope as the current thread's operation scope"""
+    _scope.current = scope
+    try:
+        return fn(*args)
+    finally:
+        _scope.current = None
+
+
+def _outcome_already_counted() -> bool:
+    # The operation's deadline passed and it was recorded as a failure then
+    scope = getattr(_scope, "current", None)
+    return scope is not None and scope.timed_out
+
+
+def client_config_options() -> Dict[str, Any]:
+    """Timeout and retry settings for botocore Config"""
+    return {
+        "connect_timeout": CONNECT_TIMEOUT,
+        "read_timeout": READ_TIMEOUT,
+        "retries": {"mode": RETRY_MODE, "total_max_attempts": MAX_ATTEMPTS},
+    }
+
+
+class S3UnavailableError(Exception):
+    """S3 calls are being refused because the circuit breaker is open."""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class S3OperationTimeout(S3UnavailableError):
+    """An S3 operation did not finish within its deadline."""
+
+    def __init__(self, operation: str, timeout: float):
+        super().__init__(f"S3 {operation} did not complete within {timeout:g}s", retry_after=0.0)
+        self.operation = operation
+        self.timeout = timeout
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with closed, open and half-open states.
+
+    Thread-safe; one instance is shared by every caller of a client.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_SECONDS):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Name used in logs and errors
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.rejected = 0
+        self.opened = 0
+        self._opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """closed, open or half_open"""
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> None:
+        """
+        Admit a call or refuse it.
+
+        Raises:
+            S3UnavailableError: If the circuit is open, or half-open with a trial call already running
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return
+            if state == "half_open" and (
+                self._trial_started is None or now - self._trial_started >= self.reset_timeout
+            ):
+                self._trial_started = now
+                return
+            self.rejected += 1
+            retry_after = max(self._opened_at + self.reset_timeout - now, 1.0)
+        raise S3UnavailableError(f"S3 circuit '{self.name}' is open", retry_after=retry_after)
+
+    def record_success(self) -> None:
+        """Account for a call that reached S3 and got a non-server-error answer."""
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self._opened_at is not None:
+                logger.info(f"S3 circuit '{self.name}' closed")
+            self._opened_at = None
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        """Account for a server error, throttle, timeout or connection failure."""
+        with self._lock:
+            now = time.monotonic()
+            self.failures += 1
+            self.consecutive_failures += 1
+            state = self._state(now)
+            if state == "half_open" or (state == "closed" and self.consecutive_failures >= self.failure_threshold):
+                self._opened_at = now
+                self._trial_started = None
+                self.opened += 1
+                logger.warning(
+                    f"S3 circuit '{self.name}' opened after {self.consecutive_failures} consecutive failures"
+                )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state and counters"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "failures": self.failures,
+                "successes": self.successes,
+                "rejected": self.rejected,
+                "opened": self.opened,
+                "retry_after": round(max(self._opened_at + self.reset_timeout - now, 0.0), 1)
+                if state == "open" else 0.0,
+            }
+
+
+def install_breaker(client: Any, breaker: CircuitBreaker) -> None:
+    """
+    Route every API call of a boto3 S3 client through a circuit breaker.
+
+    The outcome is taken after botocore's own retries, so a call that
+    succeeded on retry counts as a success.
+    """
+    def before_call(**kwargs: Any) -> None:
+        breaker.before_call()
+
+    def after_call(http_response: Any = None, **kwargs: Any) -> None:
+        if _outcome_already_counted():
+            return
+        if http_response is not None and http_response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def after_call_error(**kwargs: Any) -> None:
+        if not _outcome_already_counted():
+            breaker.record_failure()
+
+    events = client.meta.events
+    # Ahead of every other before-call handler, any of which may answer the call itself
+    events.register_first("before-call.*.*", before_call, unique_id=f"circuit-breaker-before-{id(breaker)}")
+    events.register("after-call.s3", after_call, unique_id=f"circuit-breaker-after-{id(breaker)}")
+    events.register("after-call-error.s3", after_call_error, unique_id=f"circuit-breaker-error-{id(breaker)}")
@@ -0,0 +1,402 @@
+"""
+Incremental sync between a local directory and an S3 prefix.
+
+A manifest stored next to the local data records, for every file that
+was in sync after the last run, its size, mtime, MD5 and the remote
+ETag. Each run lists the remote prefix once, stats the local tree, and
+compares both against the manifest, so only files that changed on either
+side are hashed or transferred. Transfers run in parallel through
+s3_transfer.
+
+Files present on both sides but missing from the manifest (on the first
+run, for example) are compared by size and ETag instead: the local MD5,
+or the multipart ETag computed with the transfer part size, is checked
+against the remote one, and identical files are recorded as in sync
+rather than transferred.
+
+Usage:
+    python -m src.utils.s3_sync up|down|both --local ../data --prefix data/ [--delete] [--dry-run]
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from .logging_manager import LoggingManager
+from .s3_manager import S3Manager, build_transfer_config
+from .s3_transfer import DEFAULT_MAX_FILES, download_many, upload_many
+
+logger = LoggingManager.get_logger("s3_sync")
+
+MANIFEST_NAME = ".s3sync-manifest.json"
+DEFAULT_EXCLUDES = ("*.tmp", "*.temp", MANIFEST_NAME)
+DIRECTIONS = ("up", "down", "both")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_md5(path: str) -> str:
+    """Hex MD5 of a file, read in chunks."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_etag(path: str, parts: int, part_size: int) -> str:
+    """
+    ETag S3 gives a file uploaded in the given number of parts.
+
+    Single-part uploads have the hex MD5 of the content; multipart uploads
+    have the MD5 of the concatenated part MD5s followed by "-<parts>".
+    """
+    if parts <= 1:
+        return file_md5(path)
+    digests = []
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(part_size), b""):
+            digests.append(hashlib.md5(chunk).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+class SyncPlan:
+    """The set of actions a sync run would take."""
+
+    def __init__(self):
+        self.upload: List[str] = []
+        self.download: List[str] = []
+        self.delete_remote: List[str] = []
+        self.delete_local: List[str] = []
+        self.conflicts: List[str] = []
+        self.unchanged = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "upload": self.upload,
+            "download": self.download,
+            "delete_remote": self.delete_remote,
+            "delete_local": self.delete_local,
+            "conflicts": self.conflicts,
+            "unchanged": self.unchanged,
+        }
+
+
+class S3SyncEngine:
+    """Manifest-based incremental sync of a local directory with an S3 prefix."""
+
+    def __init__(self, s3_manager: S3Manager, local_root: str, prefix: str,
+                 manifest_path: Optional[str] = None, excludes: Iterable[str] = DEFAULT_EXCLUDES,
+                 max_files: int = DEFAULT_MAX_FILES):
+        """
+        Initialize the sync engine.
+
+        Args:
+            s3_manager: S3Manager for the target bucket
+            local_root: Local directory to sync
+            prefix: S3 key prefix mirrored by local_root ("" for the whole bucket)
+            manifest_path: Where to keep the manifest (defaults to local_root/.s3sync-manifest.json)
+            excludes: Glob patterns (matched against relative paths and file names) to skip
+            max_files: Files transferred at once
+        """
+        self.s3 = s3_manager
+        self.local_root = os.path.abspath(local_root)
+        self.prefix = prefix if not prefix or prefix.endswith("/") else prefix + "/"
+        self.manifest_path = manifest_path or os.path.join(self.local_root, MANIFEST_NAME)
+        self.excludes = tuple(excludes)
+        self.max_files = max_files
+
+    def run(self, direction: str = "up", delete: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Sync local and remote state.
+
+        Args:
+            direction: "up" (local wins), "down" (remote wins) or "both" (newest change wins, conflicts skipped)
+            delete: Mirror deletions (remove files missing on the winning side)
+            dry_run: Only compute and return the plan
+
+        Returns:
+            Dict with the plan and, unless dry_run, transfer results
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"direction must be one of {DIRECTIONS}")
+
+        manifest = self._load_manifest()
+        local = self._scan_local(manifest)
+        remote = self._scan_remote()
+        self._seed_manifest(manifest, local, remote)
+        plan = self._plan(direction, delete, manifest, local, remote)
+
+        logger.info(
+            f"Sync plan ({direction}): {len(plan.upload)} up, {len(plan.download)} down, "
+            f"{len(plan.delete_remote)} remote deletes, {len(plan.delete_local)} local deletes, "
+            f"{len(plan.conflicts)} conflicts, {plan.unchanged} unchanged"
+        )
+        result: Dict[str, Any] = {"plan": plan.to_dict(), "dry_run": dry_run}
+        if dry_run:
+            return result
+
+        uploaded = upload_many(
+            self.s3, [(self._local_path(rel), self.prefix + rel) for rel in plan.upload], self.max_files
+        ) if plan.upload else {"succeeded": [], "failed": []}
+        downloaded = download_many(
+            self.s3, [(self.prefix + rel, self._local_path(rel)) for rel in plan.download], self.max_files,
+            total_bytes=sum(remote[rel]["size"] for rel in plan.download)
+        ) if plan.download else {"succeeded": [], "failed": []}
+
+        deleted_remote = self.s3.delete_objects(
+            keys=[self.prefix + rel for rel in plan.delete_remote]
+        ) if plan.delete_remote else {"deleted": 0, "errors": []}
+        failed_remote_deletes = {error["Key"][len(self.prefix):] for error in deleted_remote["errors"]}
+        for rel in plan.delete_local:
+            os.remove(self._local_path(rel))
+
+        self._update_manifest(
+            manifest, local, remote, plan,
+            uploaded_ok={os.path.relpath(path, self.local_root).replace(os.sep, "/") for path in uploaded["succeeded"]},
+            downloaded_ok={key[len(self.prefix):] for key in downloaded["succeeded"]},
+            remote_deleted=set(plan.delete_remote) - failed_remote_deletes,
+        )
+
+        result.update({
+            "uploaded": len(uploaded["succeeded"]),
+            "downloaded": len(downloaded["succeeded"]),
+            "deleted_remote": deleted_remote["deleted"],
+            "deleted_local": len(plan.delete_local),
+            "failed": uploaded["failed"] + downloaded["failed"] + sorted(failed_remote_deletes),
+        })
+        return result
+
+    def _plan(self, direction: str, delete: bool, manifest: Dict[str, Dict[str, Any]],
+              local: Dict[str, Dict[str, Any]], remote: Dict[str, Dict[str, Any]]) -> SyncPlan:
+        plan = SyncPlan()
+
+        def local_changed(rel: str) -> bool:
+            return local[rel]["changed"]
+
+        def remote_changed(rel: str) -> bool:
+            entry = manifest.get(rel)
+            return entry is None or entry.get("etag") != remote[rel]["etag"] or entry.get("size") != remote[rel]["size"]
+
+        for rel in sorted(set(local) | set(remote)):
+            in_local, in_remote = rel in local, rel in remote
+
+            if direction == "up":
+                if not in_local:
+                    if delete:
+                        plan.delete_remote.append(rel)
+                elif not in_remote or local_changed(rel) or remote_changed(rel):
+                    plan.upload.append(rel)
+                else:
+                    plan.unchanged += 1
+
+            elif direction == "down":
+                if not in_remote:
+                    if delete:
+                        plan.delete_local.append(rel)
+                elif not in_local or local_changed(rel) or remote_changed(rel):
+                    plan.download.append(rel)
+                else:
+                    plan.unchanged += 1
+
+            elif in_local and in_remote:
+                lc, rc = local_changed(rel), remote_changed(rel)
+                if lc and rc:
+                    plan.conflicts.append(rel)
+                elif lc:
+                    plan.upload.append(rel)
+                elif rc:
+                    plan.download.append(rel)
+                else:
+                    plan.unchanged += 1
+
+            elif in_local:
+                # Previously synced and untouched locally: it was deleted remotely
+                if rel in manifest and not local_changed(rel):
+                    if delete:
+                        plan.delete_local.append(rel)
+                else:
+                    plan.upload.append(rel)
+
+            else:
+                if rel in manifest and not remote_changed(rel):
+                    if delete:
+                        plan.delete_remote.append(rel)
+                else:
+                    plan.download.append(rel)
+
+        return plan
+
+    def _scan_local(self, manifest: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Stat the local tree, hashing only files whose size matches but mtime moved."""
+        files: Dict[str, Dict[str, Any]] = {}
+        if not os.path.isdir(self.local_root):
+            return files
+
+        for root, _, names in os.walk(self.local_root):
+            for name in names:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, self.local_root).replace(os.sep, "/")
+                if self._excluded(rel):
+                    continue
+                stat = os.stat(path)
+                entry = {"size": stat.st_size, "mtime": stat.st_mtime, "md5": None, "changed": True}
+                known = manifest.get(rel)
+                if known is not None and known["size"] == stat.st_size:
+                    if known["mtime"] == stat.st_mtime:
+                        entry.update(md5=known.get("md5"), changed=False)
+                    elif known.get("md5"):
+                        # Touched but possibly identical: settle it by content
+                        entry["md5"] = file_md5(path)
+                        entry["changed"] = entry["md5"] != known["md5"]
+                files[rel] = entry
+        return files
+
+    def _seed_manifest(self, manifest: Dict[str, Dict[str, Any]], local: Dict[str, Dict[str, Any]],
+                       remote: Dict[str, Dict[str, Any]]) -> None:
+        """Record files on both sides without a manifest entry as in sync when their content matches."""
+        unknown = [
+            rel for rel in set(local) & set(remote)
+            if rel not in manifest and local[rel]["size"] == remote[rel]["size"]
+        ]
+        if not unknown:
+            return
+        config = getattr(self.s3, "transfer_config", None) or build_transfer_config()
+        part_size = config.multipart_chunksize
+
+        def matches(rel: str) -> Optional[str]:
+            etag = remote[rel]["etag"].strip('"')
+            parts = int(etag.rsplit("-", 1)[1]) if "-" in etag else 1
+            # Multipart ETags only match when the object was uploaded with our part size
+            if parts > 1 and -(-remote[rel]["size"] // part_size) != parts:
+                return None
+            path = self._local_path(rel)
+            local_etag = file_etag(path, parts, part_size)
+            if local_etag != etag:
+                return None
+            return local_etag if parts == 1 else file_md5(path)
+
+        with ThreadPoolExecutor(max_workers=self.max_files, thread_name_prefix="s3-sync") as pool:
+            for rel, md5 in zip(unknown, pool.map(matches, unknown)):
+                if md5 is None:
+                    continue
+                local[rel].update(md5=md5, changed=False)
+                manifest[rel] = {
+                    "size": local[rel]["size"],
+                    "mtime": local[rel]["mtime"],
+                    "md5": md5,
+                    "etag": remote[rel]["etag"],
+                }
+        seeded = sum(1 for rel in unknown if rel in manifest)
+        if seeded:
+            logger.info(f"Seeded sync manifest with {seeded} files already identical on both sides")
+
+    def _scan_remote(self) -> Dict[str, Dict[str, Any]]:
+        files: Dict[str, Dict[str, Any]] = {}
+        for obj in self.s3.iter_objects(prefix=self.prefix):
+            rel = obj["Key"][len(self.prefix):]
+            if not rel or rel.endswith("/") or self._excluded(rel):
+                continue
+            files[rel] = {"size": obj["Size"], "etag": obj["ETag"]}
+        return files
+
+    def _update_manifest(self, manifest: Dict[str, Dict[str, Any]], local: Dict[str, Dict[str, Any]],
+                         remote: Dict[str, Dict[str, Any]], plan: SyncPlan, uploaded_ok: set,
+                         downloaded_ok: set, remote_deleted: set) -> None:
+        """Record the post-sync state of every file that now matches on both sides."""
+        new_manifest: Dict[str, Dict[str, Any]] = {}
+        pending = set(plan.upload) | set(plan.download) | set(plan.conflicts)
+
+        for rel in set(local) & set(remote):
+            if rel not in pending:
+                new_manifest[rel] = {
+                    "size": local[rel]["size"],
+                    "mtime": local[rel]["mtime"],
+                    "md5": local[rel]["md5"] or manifest.get(rel, {}).get("md5"),
+                    "etag": remote[rel]["etag"],
+                }
+
+        def record(rel: str, etag: Optional[str]) -> None:
+            path = self._local_path(rel)
+            stat = os.stat(path)
+            new_manifest[rel] = {"size": stat.st_size, "mtime": stat.st_mtime, "md5": file_md5(path), "etag": etag}
+
+        def record_upload(rel: str) -> None:
+            head = self.s3.head_object(self.prefix + rel)
+            if head is not None:
+                record(rel, head["ETag"])
+
+        with ThreadPoolExecutor(max_workers=self.max_files, thread_name_prefix="s3-sync") as pool:
+            list(pool.map(record_upload, uploaded_ok))
+            list(pool.map(lambda rel: record(rel, remote[rel]["etag"]), downloaded_ok))
+
+        # A failed transfer or a conflict leaves both sides as they were: keep the last known
+        # state so the next run still sees which side changed and retries instead of reporting a conflict
+        for rel in pending - uploaded_ok - downloaded_ok:
+            if rel in manifest:
+                new_manifest[rel] = manifest[rel]
+
+        for rel in remote_deleted | set(plan.delete_local):
+            new_manifest.pop(rel, None)
+
+        self._save_manifest(new_manifest)
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.manifest_path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        if data.get("bucket") != self.s3.bucket_name or data.get("prefix") != self.prefix:
+            logger.warning(f"Ignoring manifest for a different target: {self.manifest_path}")
+            return {}
+        return data.get("files", {})
+
+    def _save_manifest(self, files: Dict[str, Dict[str, Any]]) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"bucket": self.s3.bucket_name, "prefix": self.prefix, "files": files}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _local_path(self, rel: str) -> str:
+        return os.path.join(self.local_root, *rel.split("/"))
+
+    def _excluded(self, rel: str) -> bool:
+        name = rel.rsplit("/", 1)[-1]
+        return any(fnmatch.fnmatch(rel, pattern) or fnmatch.fnmatch(name, pattern) for pattern in self.excludes)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Incrementally sync a local directory with an S3 prefix")
+    parser.add_argument("direction", choices=DIRECTIONS)
+    parser.add_argument("--local", default="data", help="Local directory (default: data)")
+    parser.add_argument("--prefix", default="data/", help="S3 key prefix (default: data/)")
+    parser.add_argument("--bucket", help="Bucket name (default: S3_APP_BUCKET)")
+    parser.add_argument("--delete", action="store_true", help="Mirror deletions")
+    parser.add_argument("--dry-run", action="store_true", help="Show the plan without transferring")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_FILES, help="Files transferred at once")
+    parser.add_argument("--exclude", action="append", default=[], help="Extra glob pattern to skip")
+    args = parser.parse_args(argv)
+
+    engine = S3SyncEngine(
+        S3Manager(bucket_name=args.bucket),
+        args.local,
+        args.prefix,
+        excludes=DEFAULT_EXCLUDES + tuple(args.exclude),
+        max_files=args.workers,
+    )
+    result = engine.run(args.direction, delete=args.delete, dry_run=args.dry_run)
+    json.dump(result, sys.stdout, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 1 if result.get("failed") or result["plan"]["conflicts"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
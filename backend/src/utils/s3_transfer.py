@@ -0,0 +1,174 @@
+"""
+Concurrent multi-file transfers with progress and throughput reporting.
+
+Each file is moved with S3Manager's managed transfer (multipart and
+parallel parts according to its TransferConfig); this module adds
+file-level concurrency on top, so many small files and a few large ones
+both keep the NIC busy.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .logging_manager import LoggingManager
+from .s3_manager import S3Manager
+
+logger = LoggingManager.get_logger("s3_transfer")
+
+DEFAULT_MAX_FILES = int(os.getenv("S3_TRANSFER_MAX_FILES", "4"))
+
+
+class TransferProgress:
+    """Thread-safe byte and file counters shared by all transfers of a batch."""
+
+    def __init__(self, total_bytes: int = 0, total_files: int = 0,
+                 on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 report_interval: float = 5.0):
+        """
+        Initialize progress tracking.
+
+        Args:
+            total_bytes: Expected bytes for the whole batch (0 if unknown)
+            total_files: Number of files in the batch
+            on_update: Called with snapshot() at most every report_interval seconds
+            report_interval: Minimum seconds between on_update calls
+        """
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.bytes_transferred = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.started_at = time.monotonic()
+        self._on_update = on_update
+        self._report_interval = report_interval
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, bytes_amount: int) -> None:
+        """boto3 transfer callback: record bytes moved since the last call."""
+        with self._lock:
+            self.bytes_transferred += bytes_amount
+        self._maybe_report()
+
+    def file_finished(self, success: bool) -> None:
+        """Record the outcome of one file."""
+        with self._lock:
+            if success:
+                self.files_done += 1
+            else:
+                self.files_failed += 1
+        self._maybe_report(force=self.files_done + self.files_failed == self.total_files)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the current progress.
+
+        Returns:
+            Dict with bytes/files done, elapsed seconds and throughput in bytes per second
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.started_at
+            return {
+                "bytes_transferred": self.bytes_transferred,
+                "total_bytes": self.total_bytes,
+                "files_done": self.files_done,
+                "files_failed": self.files_failed,
+                "total_files": self.total_files,
+                "elapsed_seconds": round(elapsed, 3),
+                "throughput_bytes_per_second": self.bytes_transferred / elapsed if elapsed > 0 else 0.0,
+            }
+
+    def _maybe_report(self, force: bool = False) -> None:
+        if self._on_update is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_report < self._report_interval:
+                return
+            self._last_report = now
+        self._on_update(self.snapshot())
+
+
+def _run_batch(items: List[Tuple[str, str]], transfer: Callable[[str, str, TransferProgress], bool],
+               progress: TransferProgress, max_files: int) -> Dict[str, Any]:
+    """Run one transfer per (source, destination) pair with bounded file concurrency."""
+    succeeded: List[str] = []
+    failed: List[str] = []
+    with ThreadPoolExecutor(max_workers=max_files, thread_name_prefix="s3-transfer") as pool:
+        futures = {pool.submit(transfer, source, dest, progress): source for source, dest in items}
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                logger.error(f"Transfer failed for {source}: {e}")
+                ok = False
+            progress.file_finished(ok)
+            (succeeded if ok else failed).append(source)
+
+    result = progress.snapshot()
+    result.update({"succeeded": succeeded, "failed": failed})
+    return result
+
+
+def upload_many(s3_manager: S3Manager, files: List[Tuple[str, str]], max_files: int = DEFAULT_MAX_FILES,
+                on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Upload many local files concurrently.
+
+    Args:
+        s3_manager: S3Manager whose transfer_config governs each file
+        files: List of (local path, S3 key) pairs
+        max_files: Files transferred at once
+        on_progress: Called periodically with a progress snapshot
+
+    Returns:
+        Dict with final progress counters, throughput and 'succeeded'/'failed' local paths
+    """
+    total = sum(os.path.getsize(path) for path, _ in files if os.path.exists(path))
+    progress = TransferProgress(total, len(files), on_progress)
+
+    def transfer(path: str, s3_key: str, progress: TransferProgress) -> bool:
+        return s3_manager.upload_file(path, s3_key, callback=progress)
+
+    result = _run_batch(files, transfer, progress, max_files)
+    logger.info(
+        f"Uploaded {len(result['succeeded'])}/{len(files)} files, "
+        f"{result['bytes_transferred']} bytes at {result['throughput_bytes_per_second'] / 1e6:.1f} MB/s"
+    )
+    return result
+
+
+def download_many(s3_manager: S3Manager, objects: List[Tuple[str, str]], max_files: int = DEFAULT_MAX_FILES,
+                  on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                  total_bytes: int = 0) -> Dict[str, Any]:
+    """
+    Download many objects concurrently.
+
+    Args:
+        s3_manager: S3Manager whose transfer_config governs each file
+        objects: List of (S3 key, local path) pairs
+        max_files: Files transferred at once
+        on_progress: Called periodically with a progress snapshot
+        total_bytes: Expected total size, if known (e.g. from a listing)
+
+    Returns:
+        Dict with final progress counters, throughput and 'succeeded'/'failed' S3 keys
+    """
+    progress = TransferProgress(total_bytes, len(objects), on_progress)
+
+    def transfer(s3_key: str, local_path: str, progress: TransferProgress) -> bool:
+        directory = os.path.dirname(local_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return s3_manager.download_file(s3_key, local_path, callback=progress)
+
+    result = _run_batch(objects, transfer, progress, max_files)
+    logger.info(
+        f"Downloaded {len(result['succeeded'])}/{len(objects)} files, "
+        f"{result['bytes_transferred']} bytes at {result['throughput_bytes_per_second'] / 1e6:.1f} MB/s"
+    )
+    return result
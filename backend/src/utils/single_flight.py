@@ -0,0 +1,76 @@
+"""
+Request coalescing ("single-flight") for identical concurrent async reads.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """Raised to followers when the call they were waiting on was cancelled."""
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one backend call.
+
+    The first caller for a key (the leader) runs the call; every caller that
+    arrives while it is in flight awaits the leader's result instead of
+    issuing its own. Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn once for all concurrent callers using the same key.
+
+        Args:
+            key: Identity of the request (e.g. ("message", 42))
+            fn: Zero-argument coroutine function performing the backend call
+
+        Returns:
+            The result of fn, shared with concurrent callers; exceptions are shared too
+        """
+        while key in self._inflight:
+            self.shared += 1
+            try:
+                return await asyncio.shield(self._inflight[key])
+            except _LeaderCancelled:
+                # The leader went away; compete to become the new leader
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.calls += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            # Mark the outcome as retrieved so unused failures aren't logged by asyncio
+            if not future.cancelled():
+                future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing counters.
+
+        Returns:
+            Dict with backend calls made, calls that shared a result and calls in flight
+        """
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
@@ -1,6 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
-from src.main import app
+from src.main import app, _content_disposition
 from src.utils.logging_manager import LoggingManager
 
 # Configure logging for tests
@@ -141,3 +141,96 @@ def test_delete_message():
     # Verify it's gone
     get_response = client.get(f"/messages/{message_id}", headers=headers)
     assert get_response.status_code == 404
+
+
+def test_list_messages_pagination():
+    """Test keyset pagination of messages with limit and cursor"""
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(3):
+        client.post("/messages", json={"message": f"Page message {i}", "user_id": "test_user"}, headers=headers)
+
+    response = client.get("/messages?limit=2", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 2
+    assert data["next_cursor"] is not None
+
+    next_response = client.get(f"/messages?limit=2&cursor={data['next_cursor']}", headers=headers)
+    assert next_response.status_code == 200
+    first_ids = {msg["id"] for msg in data["messages"]}
+    assert not first_ids & {msg["id"] for msg in next_response.json()["messages"]}
+
+
+def test_list_messages_invalid_cursor():
+    """Test listing messages with a malformed cursor"""
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/messages?cursor=not-a-cursor", headers=headers)
+    assert response.status_code == 400
+
+
+def test_list_messages_stream():
+    """Test streaming messages as NDJSON"""
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/messages?stream=true", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+
+def test_create_messages_batch():
+    """Test creating messages in batch with authentication"""
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    batch = {"messages": [{"message": f"Batch message {i}", "user_id": "test_user"} for i in range(5)]}
+    response = client.post("/messages/batch", json=batch, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 5
+    ids = [msg["id"] for msg in data["messages"]]
+    assert ids == sorted(ids)
+
+
+def test_update_message():
+    """Test partially updating a message with authentication"""
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    create_response = client.post("/messages", json={"message": "Original", "user_id": "test_user"}, headers=headers)
+    message_id = create_response.json()["id"]
+
+    response = client.patch(f"/messages/{message_id}", json={"message": "Edited"}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "Edited"
+    assert data["user_id"] == "test_user"
+
+    missing_response = client.patch("/messages/999999", json={"message": "Edited"}, headers=headers)
+    assert missing_response.status_code == 404
+
+
+def test_bulk_delete_rejects_keys_outside_data():
+    """Test that bulk delete refuses keys outside data/ before touching S3"""
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.post("/s3/delete", json={"keys": ["data/input/a.csv", "users/secret.csv"]}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_content_disposition_escapes_file_names():
+    """Test that download file names cannot break out of the Content-Disposition header"""
+    header = _content_disposition('a"b\\c\r\nX-Evil: 1 – é.csv')
+    assert header.startswith('attachment; filename="a_b_c__X-Evil: 1 _ _.csv"; ')
+    assert header.endswith("filename*=UTF-8''a%22b%5Cc%0D%0AX-Evil%3A%201%20%E2%80%93%20%C3%A9.csv")
+    header.encode("latin-1")
+
+
+def test_presign_rejects_keys_outside_data():
+    """Test that presigned downloads and upload completion refuse keys outside data/"""
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/s3/presign/download?s3_key=users/secret.csv", headers=headers)
+    assert response.status_code == 400
+    response = client.post("/s3/presign/complete", json={"s3_key": "users/secret.csv"}, headers=headers)
+    assert response.status_code == 400
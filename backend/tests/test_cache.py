@@ -0,0 +1,70 @@
+import pytest
+from src.utils.cache import TTLCache
+
+
+class FakeClock:
+    """Manually advanced time source"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_and_set():
+    """Test basic hits and misses"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    """Test that entries expire after their TTL"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=20)
+
+    clock.now = 6
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidation():
+    """Test single-key and predicate invalidation"""
+    cache = TTLCache(maxsize=10, ttl=10)
+    cache.set(("data/input/", None), [])
+    cache.set(("data/output/", None), [])
+    cache.set("x", 1)
+
+    assert cache.invalidate("x") is True
+    assert cache.invalidate("x") is False
+    assert cache.invalidate_where(lambda key: isinstance(key, tuple) and key[0] == "data/input/") == 1
+    assert len(cache) == 1
+
+
+def test_invalid_maxsize():
+    """Test that a non-positive size is rejected"""
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0)
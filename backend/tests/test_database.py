@@ -1,9 +1,13 @@
 import pytest
 import asyncio
+from datetime import datetime, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.utils.database import get_db_session, init_db, close_db
-from src.repositories.message_repository import MessageRepository
+from src.repositories.message_repository import MessageRepository, encode_cursor, decode_cursor
 from src.repositories.user_repository import UserRepository
+from src.repositories.s3_object_repository import (
+    S3ObjectRepository, data_type_for_key, encode_object_cursor, decode_object_cursor
+)
 from src.models.message import Message
 from src.models.user import User
 
@@ -42,6 +46,21 @@ async def test_create_message(message_repo):
     assert message.processed is True
 
 
+@pytest.mark.asyncio
+async def test_create_many_messages(message_repo):
+    """Test bulk creating messages"""
+    created = await message_repo.create_many([
+        {"message": "Bulk message 1", "user_id": "user1"},
+        {"message": "Bulk message 2", "user_id": "user2"},
+    ])
+
+    assert len(created) == 2
+    assert created[0][0] < created[1][0]
+
+    message = await message_repo.get_by_id(created[1][0])
+    assert message.message == "Bulk message 2"
+
+
 @pytest.mark.asyncio
 async def test_get_message_by_id(message_repo):
     """Test getting a message by ID"""
@@ -75,6 +94,72 @@ async def test_get_all_messages(message_repo):
     assert messages[0].timestamp >= messages[1].timestamp
 
 
+@pytest.mark.asyncio
+async def test_list_page(message_repo):
+    """Test keyset pagination over messages"""
+    for i in range(3):
+        await message_repo.create(f"Page message {i}", "user1")
+
+    first_page, next_cursor = await message_repo.list_page(limit=2)
+    assert len(first_page) == 2
+    assert next_cursor is not None
+
+    second_page, _ = await message_repo.list_page(limit=2, cursor=next_cursor)
+    assert second_page
+    assert (first_page[-1].timestamp, first_page[-1].id) > (second_page[0].timestamp, second_page[0].id)
+
+
+def test_cursor_round_trip():
+    """Test that cursors decode back to the position they encode"""
+    timestamp = datetime(2025, 6, 24, 13, 21, 56, 207432, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_object_cursor_round_trip():
+    """Test that manifest cursors decode back to their position and reject other sorts"""
+    timestamp = datetime(2025, 6, 24, 13, 21, 56, tzinfo=timezone.utc)
+    cursor = encode_object_cursor("last_modified", timestamp, "data/output/a.csv")
+    assert decode_object_cursor(cursor, "last_modified") == (timestamp, "data/output/a.csv")
+    with pytest.raises(ValueError):
+        decode_object_cursor(cursor, "size")
+    assert data_type_for_key("data/output/a.csv") == "output"
+    assert data_type_for_key("logs/app.log") is None
+
+
+@pytest.mark.asyncio
+async def test_s3_object_manifest(db_session):
+    """Test upserting, filtering and paginating the S3 object manifest"""
+    manifest = S3ObjectRepository(db_session, "test-manifest-bucket")
+    await manifest.delete_prefix("")
+    await manifest.upsert_many([
+        {"Key": f"data/output/{i}.csv", "Size": i * 100, "ETag": f'"etag{i}"',
+         "LastModified": datetime(2025, 1, i + 1, tzinfo=timezone.utc)}
+        for i in range(5)
+    ])
+
+    objects, next_cursor = await manifest.list_page(
+        data_type="output", limit=2, sort="size", descending=True, min_size=100
+    )
+    assert [obj.size for obj in objects] == [400, 300]
+    assert objects[0].etag == "etag4"
+
+    objects, next_cursor = await manifest.list_page(
+        data_type="output", limit=2, cursor=next_cursor, sort="size", descending=True, min_size=100
+    )
+    assert [obj.size for obj in objects] == [200, 100]
+    assert next_cursor is None
+
+    recent, _ = await manifest.list_page(
+        data_type="output", modified_after=datetime(2025, 1, 3, tzinfo=timezone.utc)
+    )
+    assert [obj.key for obj in recent] == ["data/output/3.csv", "data/output/4.csv"]
+
+    assert await manifest.delete_prefix("data/output/", keep=["data/output/0.csv"]) == 4
+
+
 @pytest.mark.asyncio
 async def test_get_messages_by_user_id(message_repo):
     """Test getting messages by user ID"""
@@ -107,6 +192,19 @@ async def test_delete_message(message_repo):
     assert deleted_message is None
 
 
+@pytest.mark.asyncio
+async def test_update_message(message_repo):
+    """Test updating a message"""
+    message = await message_repo.create("Message to update", "test_user")
+
+    updated = await message_repo.update(message.id, message="Updated message", unknown_field="ignored")
+    assert updated is not None
+    assert updated.message == "Updated message"
+    assert updated.user_id == "test_user"
+
+    assert await message_repo.update(999999, message="Nope") is None
+
+
 @pytest.mark.asyncio
 async def test_create_user(user_repo):
     """Test creating a user"""
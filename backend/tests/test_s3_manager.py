@@ -0,0 +1,940 @@
+import io
+import os
+import pytest
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from src.utils.s3_manager import (
+    S3Manager, S3ClientRegistry, build_transfer_config, build_data_key, copy_part_size, key_shard
+)
+from src.utils.s3_transfer import upload_many
+from src.utils.s3_disk_cache import S3DiskCache
+from src.utils.s3_sync import S3SyncEngine, file_etag
+from src.utils.async_s3_manager import AsyncS3Manager, iter_object_body, listing_cache
+from src.utils.s3_multipart import upload_stream, MIN_PART_SIZE
+from src.utils.s3_dedup import upload_stream_dedup, build_content_key
+from src.utils.s3_pipeline import PipelineJob, run_pipeline, shutdown_process_pool
+from src.utils.s3_health import S3HealthProber, default_canary_key
+from src.utils.s3_resilience import (
+    OPERATION_TIMEOUTS, CircuitBreaker, S3OperationTimeout, S3UnavailableError, operation_timeout
+)
+from src.utils.s3_codec import (
+    CHUNK_SIZE as CODEC_CHUNK_SIZE, CompressingReader, available_codecs, codec_metadata, compress_stream, decompress_fileobj, decompress_stream
+)
+
+
+@pytest.fixture(autouse=True)
+def aws_env(monkeypatch):
+    """Provide dummy AWS settings and a clean client registry"""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("S3_APP_BUCKET", "test-bucket")
+    S3ClientRegistry.reset()
+    yield
+    S3ClientRegistry.reset()
+
+
+def test_managers_share_one_client_per_region():
+    """Test that S3Manager instances reuse the registry client"""
+    first = S3Manager()
+    second = S3Manager()
+    other_region = S3Manager(region="eu-west-1")
+
+    assert first.s3_client is second.s3_client
+    assert first.s3_client is not other_region.s3_client
+    assert S3ClientRegistry.connection_stats()["clients"] == 2
+
+
+def test_client_uses_configured_pool_size(monkeypatch):
+    """Test that the connection pool size comes from the environment"""
+    monkeypatch.setenv("S3_MAX_POOL_CONNECTIONS", "64")
+    manager = S3Manager()
+    assert manager.s3_client.meta.config.max_pool_connections == 64
+
+
+def test_open_object_forwards_range():
+    """Test that open_object passes the Range header through to GetObject"""
+    manager = S3Manager()
+    payload = b"0123456789"
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response(
+            "get_object",
+            {"Body": StreamingBody(io.BytesIO(payload[2:5]), 3), "ContentLength": 3, "ContentRange": "bytes 2-4/10"},
+            {"Bucket": "test-bucket", "Key": "data/input/file.csv", "Range": "bytes=2-4"},
+        )
+        response = manager.open_object("data/input/file.csv", byte_range="bytes=2-4")
+
+    assert response["ContentRange"] == "bytes 2-4/10"
+    assert response["Body"].read() == b"234"
+
+
+@pytest.mark.asyncio
+async def test_iter_object_body_yields_chunks():
+    """Test that a streaming body is read in bounded chunks"""
+    payload = b"x" * 10
+    body = StreamingBody(io.BytesIO(payload), len(payload))
+
+    chunks = [chunk async for chunk in iter_object_body(body, chunk_size=4)]
+
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert b"".join(chunks) == payload
+
+
+class FakeMultipartS3:
+    """In-memory stand-in for the S3Manager multipart primitives"""
+
+    bucket_name = "test-bucket"
+
+    def __init__(self):
+        self.parts = {}
+        self.objects = {}
+        self.aborted = False
+
+    def create_multipart_upload(self, s3_key, content_type=None, metadata=None):
+        return "upload-1"
+
+    def upload_part(self, s3_key, upload_id, part_number, data):
+        self.parts[part_number] = data
+        return f'"etag-{part_number}"'
+
+    def complete_multipart_upload(self, s3_key, upload_id, parts):
+        numbers = sorted(part["PartNumber"] for part in parts)
+        self.objects[s3_key] = b"".join(self.parts[n] for n in numbers)
+        return {"ETag": '"final"'}
+
+    def abort_multipart_upload(self, s3_key, upload_id):
+        self.aborted = True
+        return True
+
+    def put_object(self, s3_key, data, content_type=None, metadata=None):
+        self.objects[s3_key] = data
+        return {"ETag": '"single"'}
+
+    def head_object(self, s3_key):
+        if s3_key not in self.objects:
+            return None
+        return {"ContentLength": len(self.objects[s3_key]), "ETag": '"final"'}
+
+    def copy_object(self, source_key, dest_key):
+        self.objects[dest_key] = self.objects[source_key]
+        return True
+
+    def delete_object(self, s3_key):
+        return self.objects.pop(s3_key, None) is not None
+
+    def open_object(self, s3_key, byte_range=None):
+        data = self.objects[s3_key]
+        return {"Body": StreamingBody(io.BytesIO(data), len(data)), "ContentLength": len(data), "ETag": '"final"'}
+
+
+async def _chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_uses_multipart_for_large_payloads():
+    """Test that a stream larger than one part is uploaded in ordered parts"""
+    s3 = FakeMultipartS3()
+    payload = bytes(range(256)) * (MIN_PART_SIZE // 256 * 2 + 10)
+
+    result = await upload_stream(s3, _chunks(payload, 64 * 1024), "data/input/big.bin", part_size=MIN_PART_SIZE)
+
+    assert result["parts"] == 3
+    assert result["size"] == len(payload)
+    assert s3.objects["data/input/big.bin"] == payload
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_uses_single_put_for_small_payloads():
+    """Test that payloads under one part skip multipart entirely"""
+    s3 = FakeMultipartS3()
+
+    result = await upload_stream(s3, _chunks(b"hello world", 4), "data/input/small.txt")
+
+    assert result["parts"] == 1
+    assert s3.objects["data/input/small.txt"] == b"hello world"
+    assert not s3.parts
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_aborts_on_failure():
+    """Test that a failed part aborts the multipart upload"""
+    s3 = FakeMultipartS3()
+
+    def failing_upload_part(*args):
+        raise RuntimeError("part failed")
+
+    s3.upload_part = failing_upload_part
+
+    with pytest.raises(RuntimeError):
+        await upload_stream(s3, _chunks(b"x" * (MIN_PART_SIZE * 2), MIN_PART_SIZE), "data/input/fail.bin", part_size=MIN_PART_SIZE)
+    assert s3.aborted
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_dedup_stores_content_once():
+    """Test that identical streams map to one content-addressed object"""
+    import hashlib
+    s3 = FakeMultipartS3()
+    payload = b"y" * (MIN_PART_SIZE + 100)
+    digest = hashlib.sha256(payload).hexdigest()
+
+    first = await upload_stream_dedup(s3, _chunks(payload, 1024 * 1024), "a.csv", part_size=MIN_PART_SIZE)
+    assert first == {"key": build_content_key(digest), "sha256": digest, "size": len(payload), "deduplicated": False}
+    # The staged multipart upload was moved to the content key
+    assert list(s3.objects) == [build_content_key(digest)]
+
+    second = await upload_stream_dedup(s3, _chunks(payload, 1024 * 1024), "b.csv", part_size=MIN_PART_SIZE)
+    assert second["deduplicated"] and s3.aborted
+    assert list(s3.objects) == [build_content_key(digest)]
+
+    small = await upload_stream_dedup(s3, _chunks(b"small", 2), "c.csv")
+    assert small["key"] in s3.objects and not small["deduplicated"]
+
+    with pytest.raises(ValueError):
+        await upload_stream_dedup(s3, _chunks(b"other", 2), "d.csv", expected_sha256=digest)
+
+
+def test_presigned_part_urls():
+    """Test that one presigned URL is generated per multipart part"""
+    manager = S3Manager()
+
+    urls = manager.get_upload_part_urls("data/input/big.bin", "upload-1", 3)
+
+    assert len(urls) == 3
+    assert "partNumber=1" in urls[0]
+    assert "partNumber=3" in urls[2]
+    assert all("uploadId=upload-1" in url for url in urls)
+
+
+def _listing(keys, next_token=None):
+    response = {
+        "Contents": [{"Key": key, "Size": 1, "ETag": '"e"'} for key in keys],
+        "IsTruncated": next_token is not None,
+    }
+    if next_token:
+        response["NextContinuationToken"] = next_token
+    return response
+
+
+def test_iter_objects_follows_continuation_tokens():
+    """Test that listings past the first page are not truncated"""
+    manager = S3Manager()
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response(
+            "list_objects_v2", _listing(["data/input/a", "data/input/b"], "token-2"),
+            {"Bucket": "test-bucket", "Prefix": "data/input/", "MaxKeys": 2},
+        )
+        stubber.add_response(
+            "list_objects_v2", _listing(["data/input/c"]),
+            {"Bucket": "test-bucket", "Prefix": "data/input/", "MaxKeys": 2, "ContinuationToken": "token-2"},
+        )
+        keys = [obj["Key"] for obj in manager.iter_objects("data/input/", page_size=2)]
+
+    assert keys == ["data/input/a", "data/input/b", "data/input/c"]
+
+
+@pytest.mark.asyncio
+async def test_listing_cache_is_invalidated_by_writes():
+    """Test that cached listing pages are reused until we write under the prefix"""
+    listing_cache.clear()
+    s3 = AsyncS3Manager()
+    with Stubber(s3.sync.s3_client) as stubber:
+        params = {"Bucket": "test-bucket", "Prefix": "data/input/", "MaxKeys": 1000}
+        stubber.add_response("list_objects_v2", _listing(["data/input/a"]), params)
+        stubber.add_response("list_objects_v2", _listing(["data/input/a", "data/input/b"]), params)
+
+        first, _ = await s3.list_page_cached("data/input/")
+        cached, _ = await s3.list_page_cached("data/input/")
+        s3.invalidate_listing("data/input/b")
+        refreshed, _ = await s3.list_page_cached("data/input/")
+
+        stubber.assert_no_pending_responses()
+
+    assert cached is first
+    assert len(refreshed) == 2
+
+
+def test_delete_objects_batches_and_reports_errors():
+    """Test that keys are deleted in 1000-key batches with per-key errors"""
+    manager = S3Manager()
+    keys = [f"data/temp/{i}" for i in range(1500)]
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response(
+            "delete_objects", {"Errors": [{"Key": "data/temp/7", "Code": "AccessDenied", "Message": "denied"}]},
+            {"Bucket": "test-bucket", "Delete": {"Objects": [{"Key": k} for k in keys[:1000]], "Quiet": True}},
+        )
+        stubber.add_response(
+            "delete_objects", {},
+            {"Bucket": "test-bucket", "Delete": {"Objects": [{"Key": k} for k in keys[1000:]], "Quiet": True}},
+        )
+        result = manager.delete_objects(keys=keys, max_workers=1)
+
+    assert result["deleted"] == 1499
+    assert result["errors"] == [{"Key": "data/temp/7", "Code": "AccessDenied", "Message": "denied"}]
+
+
+def test_delete_objects_requires_a_target():
+    """Test that an empty prefix is refused rather than emptying the bucket"""
+    with pytest.raises(ValueError):
+        S3Manager().delete_objects(prefix="")
+
+
+def test_copy_object_uses_multipart_copy_for_large_objects(monkeypatch):
+    """Test that large objects are copied as parallel UploadPartCopy parts"""
+    monkeypatch.setattr("src.utils.s3_manager.COPY_MULTIPART_THRESHOLD", 10 * 1024 * 1024)
+    manager = S3Manager()
+    size = 12 * 1024 * 1024
+    part = 5 * 1024 * 1024
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response("head_object", {"ContentLength": size, "ETag": '"src"', "ContentType": "text/csv"})
+        stubber.add_response("create_multipart_upload", {"UploadId": "copy-1"})
+        for number, (first, last) in enumerate([(0, part - 1), (part, 2 * part - 1), (2 * part, size - 1)], 1):
+            stubber.add_response(
+                "upload_part_copy", {"CopyPartResult": {"ETag": f'"p{number}"'}},
+                {"Bucket": "test-bucket", "Key": "data/output/big.csv", "UploadId": "copy-1", "PartNumber": number,
+                 "CopySource": {"Bucket": "test-bucket", "Key": "data/temp/big.csv"},
+                 "CopySourceRange": f"bytes={first}-{last}", "CopySourceIfMatch": '"src"'},
+            )
+        stubber.add_response("complete_multipart_upload", {"ETag": '"final"'})
+
+        assert manager.copy_object("data/temp/big.csv", "data/output/big.csv", part_size=part, max_workers=1)
+        stubber.assert_no_pending_responses()
+
+
+def test_copy_part_size_stays_within_part_limits():
+    """Test that copy parts are clamped to 5 MiB..5 GiB and grown to fit in 10,000 parts"""
+    mib, gib = 1024 * 1024, 1024 ** 3
+    assert copy_part_size(12 * mib, 1024) == 5 * mib
+    assert copy_part_size(12 * mib, 10 * gib) == 5 * gib
+    size = 5 * 1024 * gib
+    part_size = copy_part_size(size, 64 * mib)
+    assert part_size % mib == 0
+    assert -(-size // part_size) <= 10000
+    assert copy_part_size(size + 1, 64 * mib) > 64 * mib
+
+
+def test_transfer_config_comes_from_environment(monkeypatch):
+    """Test that transfer settings are tunable through the environment"""
+    monkeypatch.setenv("S3_TRANSFER_MAX_CONCURRENCY", "20")
+    monkeypatch.setenv("S3_TRANSFER_MAX_BANDWIDTH", "1048576")
+    config = build_transfer_config(multipart_chunksize=32 * 1024 * 1024)
+
+    assert config.max_request_concurrency == 20
+    assert config.max_bandwidth == 1048576
+    assert config.multipart_chunksize == 32 * 1024 * 1024
+
+
+def test_upload_many_reports_progress(tmp_path):
+    """Test that concurrent uploads aggregate bytes and per-file outcomes"""
+    paths = []
+    for name, size in (("a.bin", 10), ("b.bin", 20), ("missing.bin", 0)):
+        path = tmp_path / name
+        if size:
+            path.write_bytes(b"x" * size)
+        paths.append(str(path))
+
+    class FakeUploader:
+        def upload_file(self, file_path, s3_key, content_type=None, callback=None):
+            with open(file_path, "rb") as f:
+                callback(len(f.read()))
+            return True
+
+    snapshots = []
+    result = upload_many(FakeUploader(), [(p, f"data/input/{i}") for i, p in enumerate(paths)],
+                         max_files=2, on_progress=snapshots.append)
+
+    assert result["bytes_transferred"] == 30
+    assert sorted(result["succeeded"]) == sorted(paths[:2])
+    assert result["failed"] == [paths[2]]
+    assert snapshots[-1]["files_done"] + snapshots[-1]["files_failed"] == 3
+
+
+def _body(data):
+    return StreamingBody(io.BytesIO(data), len(data))
+
+
+def test_disk_cache_revalidates_with_etag(tmp_path):
+    """Test that cached objects are revalidated with If-None-Match instead of re-downloaded"""
+    manager = S3Manager()
+    cache = S3DiskCache(manager, cache_dir=str(tmp_path), revalidate_after=0)
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response(
+            "get_object", {"Body": _body(b"reference"), "ETag": '"v1"', "ContentLength": 9},
+            {"Bucket": "test-bucket", "Key": "data/input/ref.csv"},
+        )
+        stubber.add_client_error(
+            "get_object", service_error_code="304", http_status_code=304,
+            expected_params={"Bucket": "test-bucket", "Key": "data/input/ref.csv", "IfNoneMatch": '"v1"'},
+        )
+        with cache.open("data/input/ref.csv") as first, cache.open("data/input/ref.csv") as second:
+            assert first.name == second.name
+            assert second.read() == b"reference"
+        stubber.assert_no_pending_responses()
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["revalidations"]) == (1, 1, 1)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    """Test that the oldest entries are evicted once the size limit is exceeded"""
+    manager = S3Manager()
+    cache = S3DiskCache(manager, cache_dir=str(tmp_path), max_bytes=15, revalidate_after=3600)
+    with Stubber(manager.s3_client) as stubber:
+        for name in ("a", "b"):
+            stubber.add_response("get_object", {"Body": _body(b"x" * 10), "ETag": f'"{name}"', "ContentLength": 10})
+        with cache.open("data/input/a") as f:
+            path_a = f.name
+        with cache.open("data/input/b") as f:
+            path_b = f.name
+
+    assert not os.path.exists(path_a)
+    assert not os.path.exists(path_a + ".lock")
+    assert os.path.exists(path_b)
+    with cache.open_mmap("data/input/b") as mapped:
+        assert mapped[:] == b"x" * 10
+
+
+def test_disk_cache_eviction_skips_pinned_and_busy_entries(tmp_path):
+    """Test that eviction keeps the entry being returned and entries another worker has locked"""
+    import fcntl
+    manager = S3Manager()
+    cache = S3DiskCache(manager, cache_dir=str(tmp_path), max_bytes=5, revalidate_after=3600)
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response("get_object", {"Body": _body(b"x" * 10), "ETag": '"a"', "ContentLength": 10})
+        with cache.open("data/input/a") as f:
+            path_a = f.name
+    # Larger than max_bytes on its own, but it is the entry just handed out
+    assert os.path.exists(path_a)
+
+    with open(path_a + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        assert cache.evict() == 0
+        assert os.path.exists(path_a)
+    with open(path_a, "rb") as f:
+        assert cache.evict() == 1
+        assert not os.path.exists(path_a)
+        # A handle opened before eviction stays readable
+        assert f.read() == b"x" * 10
+
+
+class FakeBucket:
+    """In-memory stand-in for the S3Manager calls used by the sync engine"""
+
+    def __init__(self):
+        self.bucket_name = "test-bucket"
+        self.objects = {}
+        self.uploads = []
+
+    def put(self, key, data):
+        import hashlib
+        self.objects[key] = (data, f'"{hashlib.md5(data).hexdigest()}"')
+
+    def iter_objects(self, prefix=""):
+        for key in sorted(self.objects):
+            if key.startswith(prefix):
+                data, etag = self.objects[key]
+                yield {"Key": key, "Size": len(data), "ETag": etag}
+
+    def upload_file(self, file_path, s3_key, content_type=None, callback=None):
+        with open(file_path, "rb") as f:
+            self.put(s3_key, f.read())
+        self.uploads.append(s3_key)
+        return True
+
+    def download_file(self, s3_key, local_path, callback=None):
+        with open(local_path, "wb") as f:
+            f.write(self.objects[s3_key][0])
+        return True
+
+    def head_object(self, s3_key):
+        data, etag = self.objects[s3_key]
+        return {"ETag": etag, "ContentLength": len(data)}
+
+    def delete_objects(self, keys=None, prefix=None):
+        for key in keys:
+            del self.objects[key]
+        return {"deleted": len(keys), "errors": []}
+
+
+def test_sync_up_only_transfers_changes(tmp_path):
+    """Test that a second sync skips unchanged files, even if they were touched"""
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input" / "a.csv").write_bytes(b"a")
+    (tmp_path / "b.csv").write_bytes(b"b")
+    (tmp_path / "skip.tmp").write_bytes(b"t")
+    bucket = FakeBucket()
+    engine = S3SyncEngine(bucket, str(tmp_path), "data")
+
+    first = engine.run("up")
+    assert sorted(bucket.uploads) == ["data/b.csv", "data/input/a.csv"]
+    assert first["uploaded"] == 2
+
+    os.utime(tmp_path / "b.csv", (0, 0))
+    (tmp_path / "input" / "a.csv").write_bytes(b"changed")
+    second = engine.run("up")
+    assert second["plan"]["upload"] == ["input/a.csv"]
+    assert second["plan"]["unchanged"] == 1
+
+
+def test_sync_first_run_skips_files_already_identical(tmp_path):
+    """Test that without a manifest, files whose ETag matches the local content are not transferred"""
+    bucket = FakeBucket()
+    (tmp_path / "same.csv").write_bytes(b"same")
+    (tmp_path / "differs.csv").write_bytes(b"local")
+    bucket.put("data/same.csv", b"same")
+    bucket.put("data/differs.csv", b"other")
+    engine = S3SyncEngine(bucket, str(tmp_path), "data/")
+
+    first = engine.run("up")
+    assert bucket.uploads == ["data/differs.csv"]
+    assert first["plan"]["unchanged"] == 1
+    assert engine.run("up")["plan"]["unchanged"] == 2
+
+
+def test_sync_retries_failed_upload_instead_of_reporting_conflict(tmp_path):
+    """Test that a failed upload keeps its manifest entry, so the next two-way run uploads again"""
+    bucket = FakeBucket()
+    (tmp_path / "a.csv").write_bytes(b"v1")
+    engine = S3SyncEngine(bucket, str(tmp_path), "data/")
+    engine.run("up")
+
+    (tmp_path / "a.csv").write_bytes(b"version 2")
+    upload_file = bucket.upload_file
+    bucket.upload_file = lambda *args, **kwargs: False
+    assert engine.run("both")["failed"]
+
+    bucket.upload_file = upload_file
+    retry = engine.run("both")
+    assert retry["plan"]["upload"] == ["a.csv"] and not retry["plan"]["conflicts"]
+    assert bucket.objects["data/a.csv"][0] == b"version 2"
+
+
+def test_file_etag_matches_multipart_etag(tmp_path):
+    """Test that the multipart ETag is the MD5 of the part MD5s with the part count"""
+    import hashlib
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"a" * 10 + b"b" * 10 + b"c" * 5)
+    part_md5s = b"".join(hashlib.md5(part).digest() for part in (b"a" * 10, b"b" * 10, b"c" * 5))
+    assert file_etag(str(path), 3, 10) == f"{hashlib.md5(part_md5s).hexdigest()}-3"
+    assert file_etag(str(path), 1, 10) == hashlib.md5(path.read_bytes()).hexdigest()
+
+
+def test_sync_both_directions_with_delete(tmp_path):
+    """Test two-way sync: remote edits come down, deletions are mirrored, conflicts are reported"""
+    bucket = FakeBucket()
+    for name in ("keep", "edit_remote", "delete_remote", "conflict"):
+        (tmp_path / name).write_bytes(name.encode())
+    engine = S3SyncEngine(bucket, str(tmp_path), "data/")
+    engine.run("up")
+
+    bucket.put("data/edit_remote", b"new remote")
+    bucket.put("data/conflict", b"remote side")
+    (tmp_path / "conflict").write_bytes(b"local side!")
+    del bucket.objects["data/delete_remote"]
+
+    dry = engine.run("both", delete=True, dry_run=True)
+    assert dry["plan"]["download"] == ["edit_remote"]
+    assert dry["plan"]["delete_local"] == ["delete_remote"]
+    assert dry["plan"]["conflicts"] == ["conflict"]
+    assert (tmp_path / "delete_remote").exists()
+
+    engine.run("both", delete=True)
+    assert (tmp_path / "edit_remote").read_bytes() == b"new remote"
+    assert not (tmp_path / "delete_remote").exists()
+    assert engine.run("both", delete=True, dry_run=True)["plan"]["conflicts"] == ["conflict"]
+
+
+class FakeListingClient:
+    """Minimal ListObjectsV2 over an in-memory key set (Prefix, Delimiter, StartAfter, pagination)"""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.calls = 0
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, Delimiter=None,
+                        StartAfter=None, ContinuationToken=None):
+        self.calls += 1
+        after = ContinuationToken or StartAfter or ""
+        entries = []
+        for key in sorted(self.sizes):
+            if not key.startswith(Prefix) or key <= after:
+                continue
+            rest = key[len(Prefix):]
+            if Delimiter and Delimiter in rest:
+                common = Prefix + rest.split(Delimiter, 1)[0] + Delimiter
+                if entries and entries[-1] == ("prefix", common):
+                    continue
+                entries.append(("prefix", common))
+            else:
+                entries.append(("key", key))
+        page, truncated = entries[:MaxKeys], len(entries) > MaxKeys
+        response = {
+            "Contents": [{"Key": k, "Size": self.sizes[k]} for kind, k in page if kind == "key"],
+            "CommonPrefixes": [{"Prefix": p} for kind, p in page if kind == "prefix"],
+            "IsTruncated": truncated,
+        }
+        if truncated:
+            last = page[-1][1]
+            response["NextContinuationToken"] = last if page[-1][0] == "key" else last + "\uffff"
+        return response
+
+
+def test_inventory_partitions_and_aggregates():
+    """Test that the inventory covers every key once, splitting large flat prefixes by key character"""
+    sizes = {f"data/input/file{i:05d}.csv": i for i in range(12000)}
+    sizes.update({"data/output/run/a.parquet": 2 * 1024 ** 2, "data/readme.txt": 10})
+    manager = S3Manager()
+    manager.s3_client = FakeListingClient(sizes)
+
+    snapshots = list(manager.iter_inventory("data/", max_workers=4, target_partitions=8))
+    result = snapshots[-1]
+
+    assert result["done"] and not snapshots[0]["done"]
+    assert result["partitions_total"] > 2
+    assert result["totals"]["count"] == len(sizes)
+    assert result["totals"]["bytes"] == sum(sizes.values())
+    assert result["groups"]["input"]["count"] == 12000
+    assert result["groups"]["output"]["size_histogram"]["<=16777216"] == 1
+    assert result["groups"][""]["count"] == 1
+
+
+def test_inventory_splits_on_characters_present_in_keys():
+    """Test that timestamp-named keys sharing a long common prefix are split into balanced partitions"""
+    sizes = {f"data/input/2024{i:06d}.csv": 1 for i in range(20000)}
+    manager = S3Manager()
+    manager.s3_client = FakeListingClient(sizes)
+
+    partitions, totals, _ = manager._plan_inventory("data/", target_partitions=16)
+    counts = [
+        sum(stats.count for stats in manager._scan_partition("data/", partition).values())
+        for partition in partitions
+    ]
+
+    assert len(partitions) >= 16
+    assert sum(counts) + totals.count == len(sizes)
+    assert max(counts) <= 2 * min(counts)
+
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd"])
+@pytest.mark.asyncio
+async def test_codec_round_trip(codec):
+    """Test that file and stream compression round-trip for each codec"""
+    if codec not in available_codecs():
+        pytest.skip(f"{codec} not installed")
+    payload = b"id,value\n" + b"".join(f"{i},{i * i}\n".encode() for i in range(50000))
+
+    compressed = CompressingReader(io.BytesIO(payload), codec).read()
+    assert len(compressed) < len(payload) / 2
+    restored = io.BytesIO()
+    decompress_fileobj(io.BytesIO(compressed), restored, codec)
+    assert restored.getvalue() == payload
+
+    streamed = [chunk async for chunk in compress_stream(_chunks(payload, 4096), codec)]
+    chunks = [chunk async for chunk in decompress_stream(_chunks(b"".join(streamed), 1000), codec)]
+    assert b"".join(chunks) == payload
+
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd"])
+@pytest.mark.asyncio
+async def test_decompress_stream_bounds_output_pieces(codec):
+    """Test that a stream expanding far beyond its input is decompressed in bounded pieces"""
+    if codec not in available_codecs():
+        pytest.skip(f"{codec} not installed")
+    compressed = CompressingReader(io.BytesIO(b"\0" * (64 * 1024 ** 2)), codec).read()
+
+    total = 0
+    async for piece in decompress_stream(_chunks(compressed, len(compressed)), codec):
+        assert len(piece) <= CODEC_CHUNK_SIZE
+        total += len(piece)
+    assert total == 64 * 1024 ** 2
+
+
+def test_disk_cache_decodes_compressed_objects(tmp_path):
+    """Test that cached compressed objects are decompressed on copy, legacy ones copied as is"""
+    payload = b"a,b\n1,2\n" * 100
+    compressed = CompressingReader(io.BytesIO(payload), "gzip").read()
+    manager = S3Manager()
+    cache = S3DiskCache(manager, cache_dir=str(tmp_path / "cache"), revalidate_after=3600)
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response("get_object", {
+            "Body": _body(compressed), "ETag": '"gz"', "ContentLength": len(compressed),
+            "Metadata": codec_metadata("gzip")
+        })
+        stubber.add_response("get_object", {"Body": _body(payload), "ETag": '"raw"', "ContentLength": len(payload)})
+        cache.copy_to("data/output/new.csv", str(tmp_path / "new.csv"))
+        cache.copy_to("data/output/old.csv", str(tmp_path / "old.csv"))
+
+    assert (tmp_path / "new.csv").read_bytes() == payload
+    assert (tmp_path / "old.csv").read_bytes() == payload
+
+
+def test_read_lines_fetches_growing_ranges_until_enough_lines():
+    """Test that previews stop fetching once enough lines are read and drop the partial tail"""
+    payload = b"".join(b"row %d\n" % i for i in range(2000))
+    manager = S3Manager()
+    with Stubber(manager.s3_client) as stubber:
+        for start, end, etag in ((0, 15, None), (16, 47, '"v1"')):
+            params = {"Bucket": "test-bucket", "Key": "data/input/big.csv", "Range": f"bytes={start}-{end}"}
+            if etag:
+                params["IfMatch"] = etag
+            stubber.add_response("get_object", {
+                "Body": _body(payload[start:end + 1]), "ETag": '"v1"',
+                "ContentRange": f"bytes {start}-{end}/{len(payload)}"
+            }, params)
+        result = manager.read_lines("data/input/big.csv", 6, chunk_size=16)
+        stubber.assert_no_pending_responses()
+
+    assert result["lines"] == [f"row {i}" for i in range(6)]
+    assert result["bytes_read"] == 48
+    assert result["size"] == len(payload)
+    assert not result["complete"]
+
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd"])
+def test_read_lines_caps_decompressed_output(codec):
+    """Test that a highly compressed object is only decompressed up to max_decoded_bytes"""
+    if codec not in available_codecs():
+        pytest.skip(f"{codec} not installed")
+    compressed = CompressingReader(io.BytesIO(b"x" * (64 * 1024 ** 2)), codec).read()
+    manager = S3Manager()
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response("get_object", {
+            "Body": _body(compressed), "ETag": '"v1"', "Metadata": codec_metadata(codec),
+            "ContentRange": f"bytes 0-{len(compressed) - 1}/{len(compressed)}"
+        })
+        result = manager.read_lines("data/input/bomb.csv.gz", 5, chunk_size=1024 ** 2, max_decoded_bytes=1024 ** 2)
+
+    assert result["lines"] == []
+    assert result["bytes_read"] == len(compressed)
+    assert not result["complete"]
+
+
+def test_read_lines_of_empty_object():
+    """Test that an empty object previews as no lines instead of an error"""
+    manager = S3Manager()
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_client_error("get_object", service_error_code="InvalidRange", http_status_code=416)
+        result = manager.read_lines("data/input/empty.csv", 10)
+
+    assert result == {"lines": [], "bytes_read": 0, "size": 0, "complete": True}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_streams_chunks_through_stages_in_order():
+    """Test that chunks pass through thread and process-pool stages and are written in input order"""
+    s3 = FakeMultipartS3()
+    s3.objects["data/input/rows.csv"] = b"".join(b"%d,name%d,%d\n\n" % (i, i, i * 2) for i in range(5000)) + b"5000,last,0"
+    job = PipelineJob("data/input/rows.csv", "data/output/rows.csv", [
+        {"name": "drop_blank"},
+        {"name": "csv_columns", "options": {"columns": [1, 0]}},
+    ])
+
+    try:
+        result = await run_pipeline(s3, job, chunk_size=4096, workers=3)
+    finally:
+        shutdown_process_pool()
+
+    expected = b"".join(b"name%d,%d\n" % (i, i) for i in range(5000)) + b"last,5000\n"
+    assert s3.objects["data/output/rows.csv"] == expected
+    assert result["size"] == len(expected)
+    assert job.rows_in == 10001 and job.rows_out == 5001
+    assert job.bytes_in == len(s3.objects["data/input/rows.csv"])
+    assert job.to_dict()["rows_per_second"] > 0
+
+
+@pytest.mark.asyncio
+async def test_pipeline_keeps_lines_longer_than_a_chunk_intact():
+    """Test that a line spanning many read chunks is reassembled once its line break arrives"""
+    s3 = FakeMultipartS3()
+    s3.objects["data/input/long.csv"] = b"a" * 50000 + b"\n\nb\n" + b"c" * 9000
+    job = PipelineJob("data/input/long.csv", "data/output/long.csv", [{"name": "drop_blank"}])
+
+    try:
+        await run_pipeline(s3, job, chunk_size=1024, workers=2)
+    finally:
+        shutdown_process_pool()
+
+    assert s3.objects["data/output/long.csv"] == b"a" * 50000 + b"\nb\n" + b"c" * 9000 + b"\n"
+
+
+def test_circuit_breaker_opens_on_server_errors_and_recovers():
+    """Test that consecutive 5xx answers open the circuit and a successful trial call closes it"""
+    manager = S3Manager()
+    manager.breaker.reset_timeout = 0.05
+    with Stubber(manager.s3_client) as stubber:
+        for _ in range(manager.breaker.failure_threshold):
+            stubber.add_client_error("head_object", service_error_code="SlowDown", http_status_code=503)
+        for _ in range(manager.breaker.failure_threshold):
+            assert manager.head_object("data/input/a.csv") is None
+        assert manager.breaker.state == "open"
+
+        # Refused before any request is made: the queued response is left for the trial call
+        stubber.add_response("head_object", {"ContentLength": 1, "ETag": '"e"'})
+        with pytest.raises(S3UnavailableError):
+            manager.head_object("data/input/a.csv")
+
+        import time
+        time.sleep(0.06)
+        assert manager.head_object("data/input/a.csv") is not None
+        stubber.assert_no_pending_responses()
+
+    snapshot = manager.breaker.snapshot()
+    assert snapshot["state"] == "closed" and snapshot["rejected"] == 1 and snapshot["opened"] == 1
+
+
+def test_circuit_breaker_half_open_admits_one_trial():
+    """Test that a failed trial call re-opens the circuit"""
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.opened == 2
+
+
+@pytest.mark.asyncio
+async def test_async_operations_have_deadlines(monkeypatch):
+    """Test that a slow S3 call is cut off at its deadline and counted as a failure"""
+    import time
+
+    class SlowS3:
+        bucket_name = "test-bucket"
+        region = "us-east-1"
+        breaker = CircuitBreaker("slow")
+
+        def head_object(self, s3_key):
+            time.sleep(0.3)
+            return {}
+
+    monkeypatch.setitem(OPERATION_TIMEOUTS, "head_object", 0.05)
+    s3 = AsyncS3Manager(SlowS3())
+    with pytest.raises(S3OperationTimeout):
+        await s3.head_object("data/input/slow.csv")
+    assert SlowS3.breaker.failures == 1
+
+
+def test_upload_and_inventory_operations_have_default_deadlines():
+    """Test that the presign, multipart and inventory wrappers are bounded without configuration"""
+    for operation in ("get_upload_url", "get_upload_post", "get_upload_part_urls", "create_multipart_upload",
+                      "complete_multipart_upload", "abort_multipart_upload", "inventory"):
+        assert operation_timeout(operation), operation
+
+
+@pytest.mark.asyncio
+async def test_timed_out_operation_counts_once_and_releases_late_body(monkeypatch):
+    """Test that a late GetObject is not counted again by the breaker and its body is closed"""
+    import asyncio
+    import time
+    manager = S3Manager()
+    monkeypatch.setitem(OPERATION_TIMEOUTS, "open_object", 0.05)
+    s3 = AsyncS3Manager(manager)
+    body = _body(b"late")
+
+    with Stubber(manager.s3_client) as stubber:
+        # Ahead of the stubber, which answers the call itself
+        manager.s3_client.meta.events.register_first("before-call.*.*", lambda **kwargs: time.sleep(0.2))
+        stubber.add_response("get_object", {"Body": body, "ETag": '"e"'})
+        with pytest.raises(S3OperationTimeout):
+            await s3.open_object("data/input/slow.csv")
+        await asyncio.sleep(0.4)
+        stubber.assert_no_pending_responses()
+
+    snapshot = manager.breaker.snapshot()
+    assert (snapshot["failures"], snapshot["successes"]) == (1, 0)
+    assert body._raw_stream.closed
+
+
+def test_health_prober_caches_results_and_rolls_statistics(monkeypatch):
+    """Test that probes run HeadBucket plus a verified canary and snapshots are served from memory"""
+    import uuid
+    token = uuid.UUID(int=7)
+    monkeypatch.setattr(uuid, "uuid4", lambda: token)
+    manager = S3Manager()
+    prober = S3HealthProber(manager, interval=15, canary_key=".health/canary-test")
+    assert prober.snapshot()["status"] == "unknown"
+
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response("head_bucket", {}, {"Bucket": "test-bucket"})
+        stubber.add_response("put_object", {"ETag": '"c"'}, {
+            "Bucket": "test-bucket", "Key": ".health/canary-test", "Body": token.hex.encode()
+        })
+        stubber.add_response("get_object", {"Body": _body(token.hex.encode())})
+        assert prober.probe()["ok"]
+
+        stubber.add_client_error("head_bucket", service_error_code="InternalError", http_status_code=500)
+        stubber.add_response("put_object", {"ETag": '"c"'})
+        stubber.add_response("get_object", {"Body": _body(b"stale")})
+        result = prober.probe()
+        stubber.assert_no_pending_responses()
+
+        # Served from memory: an unexpected S3 call would fail the stubber
+        snapshot = prober.snapshot()
+
+    assert not result["ok"] and not result["checks"]["head_bucket"]["ok"] and not result["checks"]["get"]["ok"]
+    assert snapshot["status"] == "unhealthy"
+    assert snapshot["stats"]["head_bucket"]["error_rate"] == 0.5
+    assert snapshot["stats"]["put"]["error_rate"] == 0.0 and snapshot["stats"]["put"]["p50_ms"] is not None
+    # Workers on one host never share a canary
+    assert default_canary_key().endswith(f"-{os.getpid()}")
+
+
+def test_build_data_key_spreads_over_hashed_shards():
+    """Test that sharded keys get a stable fixed-width shard sub-prefix and flat keys are unchanged"""
+    assert build_data_key("dir/file.csv", "input", shards=0).count("/") == 2
+    keys = [build_data_key(f"file{i}.csv", "input", shards=16) for i in range(200)]
+    shards = {key.split("/")[2] for key in keys}
+    assert all(key.startswith("data/input/") and key.count("/") == 3 for key in keys)
+    assert len(shards) > 8 and all(len(shard) == 1 for shard in shards)
+    assert key_shard("20240101_000000_a.csv", 256) == key_shard("20240101_000000_a.csv", 256)
+    assert len(key_shard("x", 256)) == 2
+
+
+def test_list_objects_sharded_merges_sub_prefix_listings():
+    """Test that the shard fan-out merges flat and sharded objects back into key order"""
+    manager = S3Manager()
+
+    def entries(*keys):
+        return [{"Key": key, "Size": 1} for key in keys]
+
+    with Stubber(manager.s3_client) as stubber:
+        stubber.add_response("list_objects_v2", {
+            "Contents": entries("data/input/20230101_legacy.csv"),
+            "CommonPrefixes": [{"Prefix": "data/input/0/"}, {"Prefix": "data/input/1/"}],
+            "IsTruncated": False,
+        }, {"Bucket": "test-bucket", "Prefix": "data/input/", "Delimiter": "/", "MaxKeys": 1000})
+        stubber.add_response("list_objects_v2", {
+            "Contents": entries("data/input/0/b.csv", "data/input/0/d.csv"), "IsTruncated": False
+        }, {"Bucket": "test-bucket", "Prefix": "data/input/0/", "MaxKeys": 1000})
+        stubber.add_response("list_objects_v2", {
+            "Contents": entries("data/input/1/a.csv"), "IsTruncated": False
+        }, {"Bucket": "test-bucket", "Prefix": "data/input/1/", "MaxKeys": 1000})
+        objects = manager.list_objects_sharded("data/input/", max_workers=1)
+        stubber.assert_no_pending_responses()
+
+    assert [obj["Key"] for obj in objects] == [
+        "data/input/0/b.csv", "data/input/0/d.csv", "data/input/1/a.csv", "data/input/20230101_legacy.csv"
+    ]
+
+
+def test_copy_prefix_rejects_nested_prefixes_and_bounds_pending_copies(monkeypatch):
+    """Test that overlapping prefixes are refused and copies are submitted in bounded windows"""
+    manager = S3Manager()
+    for source, dest in (("data/temp/", "data/temp/archive/"), ("data/temp/archive/", "data/temp/")):
+        with pytest.raises(ValueError):
+            manager.copy_prefix(source, dest)
+
+    def iter_objects(prefix=""):
+        for i in range(50):
+            yield {"Key": f"{prefix}{i:03d}.csv"}
+
+    copies = []
+    monkeypatch.setattr(manager, "iter_objects", iter_objects)
+    monkeypatch.setattr(manager, "copy_object", lambda source, dest: copies.append((source, dest)) or True)
+
+    result = manager.copy_prefix("data/temp/", "data/output/", max_workers=2)
+
+    assert sorted(result["copied"]) == [f"data/temp/{i:03d}.csv" for i in range(50)]
+    assert ("data/temp/007.csv", "data/output/007.csv") in copies
+    assert result["errors"] == []
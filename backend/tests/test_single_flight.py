@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from src.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    """Test that concurrent calls with the same key share one backend call"""
+    flight = SingleFlight()
+    backend_calls = 0
+
+    async def load():
+        nonlocal backend_calls
+        backend_calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(flight.do("key", load) for _ in range(10)))
+
+    assert results == ["value"] * 10
+    assert backend_calls == 1
+    assert flight.stats() == {"calls": 1, "shared": 9, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    """Test that distinct keys run independently"""
+    flight = SingleFlight()
+
+    async def load(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(flight.do("a", lambda: load(1)), flight.do("b", lambda: load(2)))
+    assert results == [1, 2]
+    assert flight.stats()["calls"] == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared():
+    """Test that followers receive the leader's exception"""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_when_leader_is_cancelled():
+    """Test that a cancelled leader doesn't cancel its followers"""
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return "value"
+
+    leader = asyncio.ensure_future(flight.do("key", load))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("key", load))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "value"
@@ -30,22 +30,35 @@ if [ -z "$APP_BUCKET_NAME" ] || [ -z "$LOGS_BUCKET_NAME" ]; then
     exit 1
 fi
 
+# Run the incremental sync engine (backend/src/utils/s3_sync.py).
+# Only files that changed since the last sync are hashed and transferred;
+# extra arguments (--dry-run, --delete, --workers N) are passed through.
+run_sync() {
+    (cd backend && python -m src.utils.s3_sync "$@")
+}
+
 # Function to sync data directory to S3
 sync_data_to_s3() {
     local direction=$1
+    shift
     
     if [ "$direction" = "up" ]; then
         print_status "Syncing local data to S3..."
-        aws s3 sync data/ s3://$APP_BUCKET_NAME/data/ --exclude "*.tmp" --exclude "*.temp"
+        run_sync up --local ../data --prefix data/ --bucket "$APP_BUCKET_NAME" "$@"
         print_success "Data synced to S3"
     elif [ "$direction" = "down" ]; then
         print_status "Syncing S3 data to local..."
-        aws s3 sync s3://$APP_BUCKET_NAME/data/ data/ --exclude "*.tmp" --exclude "*.temp"
+        run_sync down --local ../data --prefix data/ --bucket "$APP_BUCKET_NAME" "$@"
         print_success "Data synced from S3"
+    elif [ "$direction" = "both" ]; then
+        print_status "Syncing data in both directions..."
+        run_sync both --local ../data --prefix data/ --bucket "$APP_BUCKET_NAME" "$@"
+        print_success "Data synced"
     else
-        echo "Usage: $0 {up|down}"
+        echo "Usage: $0 {up|down|both}"
         echo "  up   - Sync local data to S3"
         echo "  down - Sync S3 data to local"
+        echo "  both - Sync changes in both directions"
         exit 1
     fi
 }
@@ -53,26 +66,28 @@ sync_data_to_s3() {
 # Function to sync logs to S3
 sync_logs_to_s3() {
     print_status "Syncing logs to S3..."
-    aws s3 sync logs/ s3://$LOGS_BUCKET_NAME/ --exclude "*.tmp" --exclude "*.temp"
+    run_sync up --local ../logs --prefix "" --bucket "$LOGS_BUCKET_NAME" "$@"
     print_success "Logs synced to S3"
 }
 
 # Main execution
 case "${1:-}" in
-    "up")
-        sync_data_to_s3 "up"
-        ;;
-    "down")
-        sync_data_to_s3 "down"
+    "up"|"down"|"both")
+        sync_data_to_s3 "$@"
         ;;
     "logs")
-        sync_logs_to_s3
+        shift
+        sync_logs_to_s3 "$@"
         ;;
     *)
-        echo "Usage: $0 {up|down|logs}"
+        echo "Usage: $0 {up|down|both|logs} [--dry-run] [--delete] [--workers N]"
         echo "  up   - Sync local data to S3"
         echo "  down - Sync S3 data to local"
+        echo "  both - Sync changes in both directions"
         echo "  logs - Sync logs to S3"
+        echo ""
+        echo "  --dry-run  Show what would be transferred"
+        echo "  --delete   Mirror deletions to the other side"
         exit 1
         ;;
 esac